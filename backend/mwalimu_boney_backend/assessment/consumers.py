@@ -0,0 +1,119 @@
+# assessment/consumers.py
+import json
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+from django.http import Http404
+from .models import UserAttempt
+from .services.answer_key_service import AnswerKeyService
+from .services.autosave_service import autosave_buffer
+from .services.grading_service import GradingService
+
+
+class AttemptAutosaveConsumer(AsyncWebsocketConsumer):
+    """
+    Streams answer changes for one open UserAttempt.
+
+    Client messages:
+      {"type": "answer", "question_id": 3, "user_answer": "B"}
+      {"type": "answers", "submissions": [{"question_id": 3, "user_answer": "B"}, ...]}
+      {"type": "submit", "submissions": [...]}   # optional final answers
+    Answers are buffered and written in batches by the shared autosave buffer.
+    """
+
+    async def connect(self):
+        # Authenticated users only
+        if not self.scope["user"].is_authenticated:
+            await self.close()
+            return
+
+        self.attempt_id = int(self.scope['url_route']['kwargs']['attempt_id'])
+        self.attempt = await self.get_open_attempt(self.scope["user"], self.attempt_id)
+        if self.attempt is None:
+            await self.close()
+            return
+
+        self.answer_key = await self.get_answer_key(self.attempt)
+        await self.accept()
+        autosave_buffer.ensure_flusher()
+
+    async def disconnect(self, close_code):
+        # Persist whatever this student typed last before the socket went away
+        if getattr(self, 'answer_key', None) is not None:
+            await database_sync_to_async(autosave_buffer.flush)(self.attempt_id)
+
+    async def receive(self, text_data):
+        try:
+            data = json.loads(text_data)
+        except ValueError:
+            await self.send_error('Malformed message.')
+            return
+
+        if self.attempt.is_past_deadline():
+            await self.send_error('Time limit exceeded.')
+            await self.close()
+            return
+
+        message_type = data.get('type')
+        if message_type == 'answer':
+            submissions = [data]
+        elif message_type in ('answers', 'submit'):
+            submissions = data.get('submissions') or []
+        else:
+            await self.send_error('Unknown message type.')
+            return
+
+        try:
+            answers = await self.collect_answers(submissions)
+        except Http404:
+            await self.send_error('No Question matches the given query.')
+            return
+
+        for question_id, user_answer in answers.items():
+            autosave_buffer.record(self.attempt_id, question_id, user_answer)
+
+        if message_type == 'submit':
+            score = await self.submit()
+            if score is None:
+                await self.send_error('This attempt has already been submitted.')
+            else:
+                await self.send(text_data=json.dumps({'type': 'submitted', 'score': score}))
+            await self.close()
+            return
+
+        await self.send(text_data=json.dumps({'type': 'ack', 'saved': sorted(answers)}))
+
+    async def collect_answers(self, submissions):
+        try:
+            return GradingService.collect_answers(self.answer_key, submissions, self.attempt)
+        except Http404:
+            # The key is from connect time; questions may have been added since
+            self.answer_key = await self.get_answer_key(self.attempt, refresh=True)
+            return GradingService.collect_answers(self.answer_key, submissions, self.attempt)
+
+    async def send_error(self, detail):
+        await self.send(text_data=json.dumps({'type': 'error', 'detail': detail}))
+
+    @database_sync_to_async
+    def get_open_attempt(self, user, attempt_id):
+        return (
+            UserAttempt.objects.select_related('exam')
+            .filter(pk=attempt_id, user=user, is_completed=False)
+            .first()
+        )
+
+    @database_sync_to_async
+    def get_answer_key(self, attempt, refresh=False):
+        if refresh:
+            attempt.exam.refresh_from_db(fields=['version'])
+        return AnswerKeyService.get_answer_key(attempt.exam)
+
+    @database_sync_to_async
+    def submit(self):
+        """
+        Flushes buffered answers (including the final ones) and grades the saved answers.
+        Returns None if the attempt was closed since the socket connected.
+        """
+        autosave_buffer.flush(self.attempt_id)
+        # Grade against the exam's current answer key, not the one seen at connect
+        self.attempt.exam.refresh_from_db(fields=['version'])
+        return GradingService.grade_submission(self.attempt, [])
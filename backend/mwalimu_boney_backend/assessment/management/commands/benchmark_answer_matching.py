@@ -0,0 +1,54 @@
+# assessment/management/commands/benchmark_answer_matching.py
+
+import random
+import re
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from assessment.services.answer_matching import AnswerMatcher
+
+
+class Command(BaseCommand):
+    help = (
+        "Micro-benchmark for TEXT answer matching: the previous strip() equality, per-answer "
+        "regex normalization at submit time, and the precompiled AnswerMatcher. No database needed."
+    )
+
+    CORRECT = "Photosynthesis"
+    SPEC = {'alternatives': ["photo synthesis"], 'numeric_tolerance': None}
+    VARIANTS = ["Photosynthesis", "photosynthesis.", "  PHOTOSYNTHESIS ", "photo-synthesis", "respiration", "Osmosis!"]
+
+    def add_arguments(self, parser):
+        parser.add_argument('--answers', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def _regex_match(self, correct, user_answer):
+        # What an ad-hoc fix would do: compile and normalize both sides on every answer
+        punctuation = re.compile(r'[^\w\s]')
+        spaces = re.compile(r'\s+')
+        normalize = lambda value: spaces.sub(' ', punctuation.sub(' ', value.casefold())).strip()
+        return normalize(user_answer) in {normalize(correct), normalize(self.SPEC['alternatives'][0])}
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        answers = [rng.choice(self.VARIANTS) for _ in range(options['answers'])]
+        correct = self.CORRECT
+        matcher = AnswerMatcher(correct, self.SPEC)
+
+        candidates = {
+            'strip equality (previous)': lambda: [a.strip() == correct for a in answers],
+            'regex per answer': lambda: [self._regex_match(correct, a) for a in answers],
+            'precompiled matcher': lambda: [matcher.matches(a) for a in answers],
+        }
+
+        baseline = None
+        for label, run in candidates.items():
+            best = min(timeit.repeat(run, number=1, repeat=options['repeat']))
+            per_answer_ns = best / len(answers) * 1e9
+            baseline = baseline or per_answer_ns
+            accepted = sum(run())
+            self.stdout.write(
+                f"{label:<28} {per_answer_ns:8.0f} ns/answer  x{per_answer_ns / baseline:5.2f}  "
+                f"accepted {accepted}/{len(answers)}"
+            )
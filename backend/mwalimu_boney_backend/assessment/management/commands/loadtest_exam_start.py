@@ -0,0 +1,147 @@
+# assessment/management/commands/loadtest_exam_start.py
+
+import statistics
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from assessment.models import Exam as AssessmentExam
+from exams.models import Exam as SecureExam, ExamRegistration
+from users.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test harness: fires N simultaneous exam starts at a running server and reports "
+        "p50/p95/p99 start latency. Queued (429) responses are retried with their ticket, so "
+        "the latency includes time spent in the admission queue."
+    )
+
+    USERNAME_PREFIX = 'loadtest_student_'
+
+    def add_arguments(self, parser):
+        parser.add_argument('exam_id', type=int)
+        parser.add_argument('--endpoint', choices=['assessment', 'exams'], default='assessment',
+                            help="assessment: StudentAssessmentView.start, exams: ExamStartView.")
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--students', type=int, default=5000)
+        parser.add_argument('--threads', type=int, default=1000,
+                            help="Client threads; all are released at the same instant.")
+        parser.add_argument('--timeout', type=float, default=60.0)
+        parser.add_argument('--cleanup', action='store_true', help="Delete the synthetic students afterwards.")
+
+    # --- Fixture setup ---
+
+    def _create_students(self, count, school_id=None):
+        """Creates (or reuses) synthetic students plus profiles in a few bulk statements."""
+        usernames = [f'{self.USERNAME_PREFIX}{i:05d}' for i in range(count)]
+        existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        User.objects.bulk_create(
+            [User(username=name, password='!') for name in usernames if name not in existing],
+            batch_size=1000,
+        )
+        users = list(User.objects.filter(username__in=usernames).order_by('username'))
+
+        UserProfile.objects.bulk_create(
+            [
+                UserProfile(
+                    user=user,
+                    role='STUDENT',
+                    school_id=school_id,
+                    assessment_number=f'AS-LT-{index:05d}',
+                )
+                for index, user in enumerate(users)
+            ],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+        return users
+
+    def _shortlist(self, users, exam_id):
+        ExamRegistration.objects.bulk_create(
+            [ExamRegistration(student=user, exam_id=exam_id, status='SHORTLISTED') for user in users],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+        ExamRegistration.objects.filter(student__in=users, exam_id=exam_id).update(status='SHORTLISTED')
+
+    # --- Load generation ---
+
+    def _start_one(self, session, url, token, body, timeout, gate):
+        headers = {'Authorization': f'Bearer {token}'}
+        gate.wait()
+        started = time.perf_counter()
+        retries = 0
+        payload = dict(body)
+        while True:
+            try:
+                response = session.post(url, json=payload, headers=headers, timeout=timeout)
+            except requests.RequestException as exc:
+                return time.perf_counter() - started, type(exc).__name__, retries
+            if response.status_code != 429:
+                return time.perf_counter() - started, response.status_code, retries
+            queued = response.json()
+            payload['queue_ticket'] = queued['queue_ticket']
+            retries += 1
+            time.sleep(queued.get('retry_after', 1))
+
+    def handle(self, *args, **options):
+        exam_id = options['exam_id']
+        count = options['students']
+
+        if options['endpoint'] == 'assessment':
+            if not AssessmentExam.objects.filter(pk=exam_id).exists():
+                raise CommandError(f"assessment.Exam {exam_id} does not exist.")
+            users = self._create_students(count)
+            url = f"{options['base_url']}/api/student/assessments/{exam_id}/start/"
+            bodies = [{} for _ in users]
+        else:
+            school_id = SecureExam.objects.filter(pk=exam_id).values_list('school_id', flat=True).first()
+            if school_id is None:
+                raise CommandError(f"exams.Exam {exam_id} does not exist.")
+            users = self._create_students(count, school_id)
+            self._shortlist(users, exam_id)
+            numbers = dict(UserProfile.objects.filter(user__in=users).values_list('user_id', 'assessment_number'))
+            url = f"{options['base_url']}/exams/start/{exam_id}/"
+            bodies = [{'assessment_number': numbers[user.id]} for user in users]
+
+        tokens = [str(RefreshToken.for_user(user).access_token) for user in users]
+        self.stdout.write(f"Prepared {len(users)} students; firing at {url} ...")
+
+        threads = min(options['threads'], len(users))
+        gate = threading.Event()
+        session = requests.Session()
+        session.mount('http://', HTTPAdapter(pool_maxsize=threads))
+
+        wall_started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            futures = [
+                pool.submit(self._start_one, session, url, token, body, options['timeout'], gate)
+                for token, body in zip(tokens, bodies)
+            ]
+            gate.set()
+            results = [future.result() for future in futures]
+        wall_seconds = time.perf_counter() - wall_started
+
+        latencies = sorted(result[0] * 1000 for result in results)
+        outcomes = Counter(result[1] for result in results)
+        queued = sum(1 for result in results if result[2])
+        percentiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(results)} starts in {wall_seconds:.1f}s ({len(results) / wall_seconds:.0f}/s)\n"
+            f"  p50={percentiles[49]:.0f}ms  p95={percentiles[94]:.0f}ms  p99={percentiles[98]:.0f}ms  "
+            f"max={latencies[-1]:.0f}ms\n"
+            f"  responses: {dict(outcomes)}\n"
+            f"  queued at least once: {queued}"
+        ))
+
+        if options['cleanup']:
+            User.objects.filter(username__startswith=self.USERNAME_PREFIX).delete()
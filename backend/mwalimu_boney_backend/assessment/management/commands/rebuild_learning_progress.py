@@ -0,0 +1,56 @@
+# assessment/management/commands/rebuild_learning_progress.py
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Sum
+from assessment.models import LearningProgress, UserAttempt
+from school.models import School
+
+
+class Command(BaseCommand):
+    help = "Rebuilds LearningProgress attempt totals for every student in a school from completed UserAttempts."
+
+    def add_arguments(self, parser):
+        parser.add_argument('school_id', type=int, help="ID of the school whose totals should be rebuilt.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        school_id = options['school_id']
+        if not School.objects.filter(pk=school_id).exists():
+            raise CommandError(f"School {school_id} does not exist.")
+
+        # One grouped aggregate for the whole school
+        totals = (
+            UserAttempt.objects.filter(is_completed=True, user__profile__school_id=school_id)
+            .values('user_id')
+            .annotate(attempt_count=Count('id'), score_sum=Sum('score'))
+        )
+
+        rows = [
+            LearningProgress(
+                user_id=row['user_id'],
+                total_assessments_taken=row['attempt_count'],
+                total_assessment_score=row['score_sum'] or 0,
+                average_assessment_score=round((row['score_sum'] or 0) / row['attempt_count'], 2),
+            )
+            for row in totals
+        ]
+
+        with transaction.atomic():
+            # Students without completed attempts fall back to zero
+            LearningProgress.objects.filter(user__profile__school_id=school_id).update(
+                total_assessments_taken=0,
+                total_assessment_score=0,
+                average_assessment_score=0,
+            )
+            LearningProgress.objects.bulk_create(
+                rows,
+                batch_size=options['batch_size'],
+                update_conflicts=True,
+                unique_fields=['user'],
+                update_fields=['total_assessments_taken', 'total_assessment_score', 'average_assessment_score'],
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt learning progress for {len(rows)} students in school {school_id}."
+        ))
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("assessment", "0006_exam_is_inter_school_exam_is_public_exam_school_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="exam",
+            name="version",
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
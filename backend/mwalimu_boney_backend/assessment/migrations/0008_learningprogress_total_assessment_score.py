@@ -0,0 +1,35 @@
+# Generated by Django 6.0 on 2026-10-18 10:03
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_total_assessment_score(apps, schema_editor):
+    LearningProgress = apps.get_model("assessment", "LearningProgress")
+    UserAttempt = apps.get_model("assessment", "UserAttempt")
+    score_sums = (
+        UserAttempt.objects.filter(user=OuterRef("user"), is_completed=True)
+        .values("user")
+        .annotate(score_sum=Sum("score"))
+        .values("score_sum")
+    )
+    LearningProgress.objects.update(
+        total_assessment_score=Coalesce(Subquery(score_sums), Value(0))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("assessment", "0007_exam_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="learningprogress",
+            name="total_assessment_score",
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_total_assessment_score, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-18 11:58
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def drop_duplicate_answers(apps, schema_editor):
+    """Keeps the most recent row when an attempt answered the same question twice."""
+    AnswerSubmission = apps.get_model("assessment", "AnswerSubmission")
+    latest_ids = (
+        AnswerSubmission.objects.values("user_attempt", "question")
+        .annotate(latest_id=Max("id"))
+        .values("latest_id")
+    )
+    AnswerSubmission.objects.exclude(id__in=latest_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("assessment", "0009_notificationoutbox"),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_answers, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="answersubmission",
+            constraint=models.UniqueConstraint(
+                fields=("user_attempt", "question"),
+                name="unique_answer_per_attempt_question",
+            ),
+        ),
+    ]
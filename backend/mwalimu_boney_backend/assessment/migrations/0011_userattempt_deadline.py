@@ -0,0 +1,47 @@
+# Generated by Django 6.0 on 2026-10-18 12:40
+
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+def backfill_deadlines(apps, schema_editor):
+    """Sets deadline = start_time + exam duration on attempts that are still open."""
+    UserAttempt = apps.get_model("assessment", "UserAttempt")
+    pending = []
+    rows = (
+        UserAttempt.objects.filter(is_completed=False)
+        .values_list("id", "start_time", "exam__duration_minutes")
+        .iterator(chunk_size=2000)
+    )
+    for attempt_id, start_time, duration in rows:
+        pending.append(UserAttempt(id=attempt_id, deadline=start_time + timedelta(minutes=duration)))
+        if len(pending) >= 2000:
+            UserAttempt.objects.bulk_update(pending, ["deadline"])
+            pending = []
+    if pending:
+        UserAttempt.objects.bulk_update(pending, ["deadline"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("assessment", "0010_answersubmission_unique_answer_per_attempt_question"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="userattempt",
+            name="deadline",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_deadlines, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="userattempt",
+            index=models.Index(
+                condition=models.Q(("is_completed", False)),
+                fields=["deadline"],
+                name="assessment_open_deadline",
+            ),
+        ),
+    ]
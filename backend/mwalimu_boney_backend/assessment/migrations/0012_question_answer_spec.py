@@ -0,0 +1,22 @@
+# Generated by Django 6.0 on 2026-10-18 13:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("assessment", "0011_userattempt_deadline"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="question",
+            name="answer_spec",
+            field=models.JSONField(
+                blank=True,
+                help_text="TEXT only: case_sensitive, ignore_punctuation, collapse_whitespace, alternatives, numeric_tolerance.",
+                null=True,
+            ),
+        ),
+    ]
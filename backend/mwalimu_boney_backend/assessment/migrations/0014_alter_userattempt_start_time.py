@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-18 18:15
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("assessment", "0013_notificationoutbox_claimed_at"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="userattempt",
+            name="start_time",
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 6.0 on 2026-10-18 19:05
+
+from datetime import timedelta
+
+from django.db import migrations
+from django.utils import timezone
+
+
+def clear_historical_deadlines(apps, schema_editor):
+    """
+    0011 gave every open attempt a deadline, including ones abandoned long ago. Those
+    would all be auto-submitted at once, each notifying the teacher; clear their
+    deadline instead so the sweeper only closes attempts that expire from now on.
+    """
+    UserAttempt = apps.get_model("assessment", "UserAttempt")
+    UserAttempt.objects.filter(
+        is_completed=False, deadline__lt=timezone.now() - timedelta(days=1)
+    ).update(deadline=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("assessment", "0014_alter_userattempt_start_time"),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_historical_deadlines, migrations.RunPython.noop),
+    ]
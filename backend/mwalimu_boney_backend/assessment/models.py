@@ -1,8 +1,11 @@
 # assessment/models.py
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import User
 from courses.models import Course, Resource # Link assessments to courses
 from django.core.exceptions import ValidationError
+from django.utils import timezone
+from datetime import timedelta
 from school.models import School
 
 QUESTION_TYPES = [
@@ -33,10 +36,56 @@ class Exam(models.Model):
     # Rules
     is_realtime = models.BooleanField(default=True, help_text="If false, it's a practice test.")
     show_score_immediately = models.BooleanField(default=False)
+
+    # Bumped whenever a Question is saved or deleted; keys the cached answer key
+    version = models.PositiveIntegerField(default=1, editable=False)
     
+    def save(self, *args, **kwargs):
+        # 'version' only moves forward through F() updates; never write back a stale in-memory value
+        if not self._state.adding and 'update_fields' not in kwargs:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name != 'version'
+            ]
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f'{self.title} for {self.course.title}'
 
+class QuestionQuerySet(models.QuerySet):
+    """
+    Bulk writes skip the post_save signal that bumps Exam.version, so they bump the
+    version of every exam they touch themselves; otherwise cached answer keys and
+    papers would outlive the change.
+    """
+
+    @staticmethod
+    def _bump_versions(exam_ids):
+        if exam_ids:
+            Exam.objects.filter(pk__in=exam_ids).update(version=models.F('version') + 1)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        created = super().bulk_create(objs, *args, **kwargs)
+        self._bump_versions({question.exam_id for question in created})
+        return created
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        updated = super().bulk_update(objs, fields, *args, **kwargs)
+        self._bump_versions({question.exam_id for question in objs})
+        return updated
+
+    def update(self, **kwargs):
+        exam_ids = set(self.values_list('exam_id', flat=True))
+        # Questions moved to another exam change that exam's paper too
+        target = kwargs.get('exam_id', kwargs.get('exam'))
+        if target is not None:
+            exam_ids.add(getattr(target, 'pk', target))
+        updated = super().update(**kwargs)
+        self._bump_versions(exam_ids)
+        return updated
+
+
 class Question(models.Model):
     """Stores individual questions for an exam."""
     exam = models.ForeignKey(Exam, on_delete=models.CASCADE, related_name='questions')
@@ -48,8 +97,15 @@ class Question(models.Model):
     
     # Correct Answer
     correct_answer = models.TextField(help_text="The correct answer (e.g., 'A' for MCQ, or text for TEXT type).")
+    # TEXT matching rules, e.g. {"alternatives": ["CO2"], "numeric_tolerance": 0.01, "case_sensitive": false}
+    answer_spec = models.JSONField(
+        null=True, blank=True,
+        help_text="TEXT only: case_sensitive, ignore_punctuation, collapse_whitespace, alternatives, numeric_tolerance."
+    )
     points = models.IntegerField(default=1)
 
+    objects = QuestionQuerySet.as_manager()
+
     def __str__(self):
         return f'Q{self.id}: {self.text[:50]}...'
 # assessment/models.py
@@ -61,8 +117,11 @@ class UserAttempt(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='attempts')
     exam = models.ForeignKey(Exam, on_delete=models.CASCADE, related_name='attempts')
     
-    start_time = models.DateTimeField(auto_now_add=True)
+    # A default rather than auto_now_add, which would overwrite the value save() derives the deadline from
+    start_time = models.DateTimeField(default=timezone.now, editable=False)
     end_time = models.DateTimeField(null=True, blank=True)
+    # start_time + exam.duration_minutes; open attempts past it are closed by the sweeper
+    deadline = models.DateTimeField(null=True, blank=True)
     
     # Final score data
     score = models.IntegerField(default=0)
@@ -76,6 +135,14 @@ class UserAttempt(models.Model):
     # The clean method and save method are kept as application-level checks, 
     # but the database constraint is modified to use the local field.
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored completion state so signals can detect the transition to completed
+        if 'is_completed' in field_names:
+            instance._was_completed = instance.is_completed
+        return instance
+
     def save(self, *args, **kwargs):
         # Ensure the local field matches the related exam's status before saving/validating
         if self.exam_id is not None:
@@ -83,11 +150,33 @@ class UserAttempt(models.Model):
             if not hasattr(self, '_cached_exam_is_realtime'):
                  # Avoid database hits if possible, but load if necessary
                  self.is_practice_mode = not self.exam.is_realtime
+
+            if self.deadline is None:
+                # Fix start_time here so the deadline matches it exactly
+                self.start_time = self.start_time or timezone.now()
+                self.deadline = self.start_time + timedelta(minutes=self.exam.duration_minutes)
             
+        # Claim the transition to completed with a conditional UPDATE: of several concurrent
+        # closers (REST submit, socket submit, sweeper) exactly one sees a row change, and
+        # only that save counts as the completion in the signals.
+        self._completed_now = False
+        if self.is_completed and not getattr(self, '_was_completed', False):
+            self._completed_now = self._state.adding or bool(
+                UserAttempt.objects.filter(pk=self.pk, is_completed=False).update(is_completed=True)
+            )
+
         # Note: Calling full_clean() in save() works well with forms 
         # but can cause issues with bulk operations or signals. 
         # It's better practice to let the database handle integrity if possible.
         super().save(*args, **kwargs)
+        self._was_completed = self.is_completed
+
+    def is_past_deadline(self):
+        """True once the deadline plus the submission grace period has passed."""
+        if self.deadline is None:
+            return False
+        grace = timedelta(seconds=getattr(settings, 'ATTEMPT_DEADLINE_GRACE_SECONDS', 30))
+        return timezone.now() > self.deadline + grace
 
     class Meta:
         # Prevents a user from starting a practice exam (is_practice_mode=True) more than once
@@ -100,6 +189,14 @@ class UserAttempt(models.Model):
                 name='unique_practice_attempt' # Renamed for clarity
             )
         ]
+        indexes = [
+            # Range scan for the expiry sweeper: only open attempts are indexed
+            models.Index(
+                fields=['deadline'],
+                condition=models.Q(is_completed=False),
+                name='assessment_open_deadline',
+            ),
+        ]
         # To strictly prevent duplicate entries if somehow the save() method logic is bypassed 
         # (e.g., via bulk_create), the database constraint provides the final safety net.
 
@@ -114,6 +211,12 @@ class AnswerSubmission(models.Model):
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
     user_answer = models.TextField(blank=True, null=True)
     is_correct = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            # One answer per question per attempt; autosave and final submit upsert on this key
+            models.UniqueConstraint(fields=['user_attempt', 'question'], name='unique_answer_per_attempt_question')
+        ]
     
     def __str__(self):
         return f'{self.user_attempt.user.username} - Q{self.question.id}'
@@ -137,6 +240,8 @@ class LearningProgress(models.Model):
     total_resources_read = models.PositiveIntegerField(default=0)
     total_assessments_taken = models.PositiveIntegerField(default=0)
     average_assessment_score = models.DecimalField(max_digits=5, decimal_places=2, default=0.00)
+    # Running total behind the average; maintained with F() as attempts complete
+    total_assessment_score = models.BigIntegerField(default=0)
     
     # Optional: Last time the progress was updated
     last_updated = models.DateTimeField(auto_now=True)
@@ -162,3 +267,35 @@ class ManualGrade(models.Model):
     def __str__(self):
         return f'{self.assignment_name} - {self.student.username}: {self.score}/{self.max_score}'
     
+
+
+
+OUTBOX_EVENT_CHOICES = [
+    ('ATTEMPT_STARTED', 'Attempt Started'),
+    ('ATTEMPT_COMPLETED', 'Attempt Completed'),
+]
+
+class NotificationOutbox(models.Model):
+    """
+    Teacher notifications about exam attempts, written in the same transaction as the
+    UserAttempt change and drained into per-teacher digests by a Celery worker.
+    """
+    recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='assessment_outbox')
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    exam = models.ForeignKey(Exam, on_delete=models.CASCADE, related_name='outbox_events')
+    event_type = models.CharField(max_length=20, choices=OUTBOX_EVENT_CHOICES)
+    score = models.IntegerField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Set while a drain worker is sending the digest; processed_at once it was sent
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The drain task scans unprocessed events oldest first
+            models.Index(fields=['processed_at', 'created_at'], name='assessment_outbox_pending'),
+        ]
+
+    def __str__(self):
+        return f'{self.event_type}: {self.student_id} on exam {self.exam_id} -> {self.recipient_id}'
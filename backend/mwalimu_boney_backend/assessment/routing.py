@@ -0,0 +1,9 @@
+# assessment/routing.py
+from django.urls import re_path
+
+from . import consumers
+
+websocket_urlpatterns = [
+    # Streams answer changes for an open attempt; see AttemptAutosaveConsumer
+    re_path(r'ws/assessment/attempts/(?P<attempt_id>\d+)/autosave/$', consumers.AttemptAutosaveConsumer.as_asgi()),
+]
@@ -0,0 +1,125 @@
+# assessment/services/admission_service.py
+
+import math
+from collections import namedtuple
+from contextlib import contextmanager
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+
+# Outcome of an admission request; position/retry_after are 0 when admitted
+Admission = namedtuple('Admission', ['admitted', 'ticket', 'position', 'retry_after'])
+
+
+class AdmissionController:
+    """
+    Per-exam concurrency budget with a FIFO waiting room for exam start storms.
+
+    Every caller draws a ticket from a shared counter. `serving` counts the starts that
+    have finished, so a ticket may enter once it is inside the window
+    [0, serving + budget] and fewer than `budget` starts are in flight; otherwise the
+    caller receives its queue position and a retry-after hint and retries with the same
+    ticket. Only release() moves the window, one atomic increment per finished start,
+    so retries never reorder the queue. Tickets that were let into the window but never
+    came back would hold it still; when nothing was admitted or released for
+    `stall_seconds`, one waiting caller moves the window past them by the idle capacity.
+
+    All state lives in the default cache (the shared Redis cache configured in
+    settings.CACHES, so every worker sees the same queue) and expires after `ttl`
+    seconds, so counters leaked by crashed workers heal themselves.
+
+    Tickets handed to clients are signed and bound to the user and exam, so a client
+    cannot jump the queue by inventing a low ticket number or reusing someone else's.
+    """
+
+    def __init__(self, namespace, budget=None, ttl=None, service_seconds=None, stall_seconds=None):
+        self.namespace = namespace
+        self.budget = budget or getattr(settings, 'EXAM_START_CONCURRENCY', 50)
+        self.ttl = ttl or getattr(settings, 'EXAM_START_QUEUE_TTL', 15 * 60)
+        # Rough time one start takes; turns queue positions into retry hints
+        self.service_seconds = service_seconds or getattr(settings, 'EXAM_START_SERVICE_SECONDS', 0.25)
+        self.stall_seconds = stall_seconds or getattr(settings, 'EXAM_START_QUEUE_STALL_SECONDS', 30)
+
+    def _keys(self, exam_id):
+        prefix = f'admission:{self.namespace}:{exam_id}'
+        return f'{prefix}:active', f'{prefix}:tickets', f'{prefix}:serving', f'{prefix}:progress'
+
+    def _incr(self, key, delta=1):
+        # cache.incr() fails on missing keys; add() is a no-op when the key exists
+        cache.add(key, 0, self.ttl)
+        return cache.incr(key, delta)
+
+    def acquire(self, exam_id, ticket=None):
+        active_key, tickets_key, serving_key, progress_key = self._keys(exam_id)
+
+        if ticket is None:
+            # Create the counters together so they expire together
+            cache.add(active_key, 0, self.ttl)
+            cache.add(serving_key, 0, self.ttl)
+            ticket = self._incr(tickets_key)
+
+        serving = cache.get(serving_key, 0)
+        if ticket > serving + self.budget:
+            free = self.budget - cache.get(active_key, 0)
+            # add() succeeds for one caller once the queue has made no progress for a while
+            if free > 0 and cache.add(progress_key, 1, self.stall_seconds):
+                serving = self._incr(serving_key, free)
+
+        if ticket <= serving + self.budget:
+            if self._incr(active_key) <= self.budget:
+                cache.set(progress_key, 1, self.stall_seconds)
+                return Admission(True, ticket, 0, 0)
+            cache.decr(active_key)
+
+        position = max(1, ticket - serving - self.budget)
+        retry_after = max(1, math.ceil(position * self.service_seconds / self.budget))
+        return Admission(False, ticket, position, retry_after)
+
+    def release(self, exam_id):
+        active_key, _, serving_key, progress_key = self._keys(exam_id)
+        try:
+            if cache.decr(active_key) < 0:
+                cache.set(active_key, 0, self.ttl)
+        except ValueError:
+            # The counter already expired
+            return
+        self._incr(serving_key)
+        cache.set(progress_key, 1, self.stall_seconds)
+
+    @contextmanager
+    def admit(self, exam_id, ticket=None):
+        """Yields an Admission and frees the slot on exit if one was taken."""
+        admission = self.acquire(exam_id, ticket)
+        try:
+            yield admission
+        finally:
+            if admission.admitted:
+                self.release(exam_id)
+
+    def _salt(self, exam_id):
+        return f'admission:{self.namespace}:{exam_id}'
+
+    def sign_ticket(self, ticket, user_id, exam_id):
+        return signing.dumps([ticket, user_id], salt=self._salt(exam_id), compress=True)
+
+    def parse_ticket(self, request, exam_id):
+        """
+        Reads the signed queue ticket a retrying client sends back (body or X-Queue-Ticket
+        header). Tampered, expired or foreign tickets are ignored: the caller draws a new one.
+        """
+        raw = request.data.get('queue_ticket') or request.headers.get('X-Queue-Ticket')
+        if not raw:
+            return None
+        try:
+            ticket, user_id = signing.loads(str(raw), salt=self._salt(exam_id), max_age=self.ttl)
+        except (signing.BadSignature, TypeError, ValueError):
+            return None
+        return ticket if user_id == request.user.pk else None
+
+    def queued_response_data(self, admission, request, exam_id):
+        return {
+            'detail': 'The exam is starting for many candidates. You are in the queue; please retry.',
+            'queue_ticket': self.sign_ticket(admission.ticket, request.user.pk, exam_id),
+            'queue_position': admission.position,
+            'retry_after': admission.retry_after,
+        }
@@ -0,0 +1,113 @@
+# assessment/services/answer_key_service.py
+
+import threading
+from collections import OrderedDict, namedtuple
+from django.conf import settings
+from django.core.cache import cache
+from assessment.models import Question
+from assessment.services.answer_matching import AnswerMatcher
+
+
+class AnswerKeyEntry(namedtuple('AnswerKeyEntry', ['question_type', 'correct_answer', 'points', 'matcher', 'option_count'])):
+    """One compiled row of an exam's answer key. TEXT questions carry a precompiled matcher."""
+    __slots__ = ()
+
+    def is_correct(self, user_answer):
+        if self.matcher is None:
+            return user_answer == self.correct_answer
+        return self.matcher.matches(user_answer)
+
+
+class LocalLRUCache:
+    """Small thread-safe, process-local LRU map used in front of the shared Django cache."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class AnswerKeyService:
+    """
+    Serves the compiled answer key of an Exam without touching the question table.
+
+    Keys are versioned by Exam.version, which is bumped whenever a Question is saved (or bulk-written)
+    or deleted, so stale entries are never read and simply age out of both caches.
+    Lookup order: process-local LRU -> Django cache -> a single database query.
+    """
+
+    CACHE_TIMEOUT = getattr(settings, 'ANSWER_KEY_CACHE_TIMEOUT', 60 * 60 * 6)
+    _local = LocalLRUCache(getattr(settings, 'ANSWER_KEY_LOCAL_CACHE_SIZE', 256))
+
+    @staticmethod
+    def cache_key(exam_id, version):
+        # Bump the "rowsN" prefix whenever the row shape changes so old entries are never read
+        return f'assessment:answer_key:rows3:{exam_id}:v{version}'
+
+    @staticmethod
+    def _load_rows(exam_id):
+        """Raw, picklable answer-key rows as stored in the shared cache."""
+        return list(
+            Question.objects.filter(exam_id=exam_id)
+            .values_list('id', 'question_type', 'correct_answer', 'points', 'answer_spec', 'options')
+        )
+
+    @staticmethod
+    def compile(rows):
+        """
+        Normalizes the raw rows into {question_id: AnswerKeyEntry}. Only the raw specs
+        are shared through the cache; matchers are compiled here, once per process.
+        """
+        answer_key = {}
+        for question_id, question_type, correct_answer, points, answer_spec, options in rows:
+            correct_answer = correct_answer.strip()
+            matcher = AnswerMatcher(correct_answer, answer_spec) if question_type == 'TEXT' else None
+            option_count = len(options) if isinstance(options, list) else 0
+            answer_key[question_id] = AnswerKeyEntry(question_type, correct_answer, points, matcher, option_count)
+        return answer_key
+
+    @classmethod
+    def get_answer_key(cls, exam):
+        """Returns the compiled answer key for the exam's current version."""
+        return cls.get_versioned_answer_key(exam.id, exam.version)
+
+    @classmethod
+    def get_versioned_answer_key(cls, exam_id, version):
+        """Same as get_answer_key() for callers that only read (exam_id, version)."""
+        key = cls.cache_key(exam_id, version)
+
+        answer_key = cls._local.get(key)
+        if answer_key is not None:
+            return answer_key
+
+        rows = cache.get(key)
+        if rows is None:
+            rows = cls._load_rows(exam_id)
+            cache.set(key, rows, cls.CACHE_TIMEOUT)
+
+        answer_key = cls.compile(rows)
+        cls._local.set(key, answer_key)
+        return answer_key
+
+    @classmethod
+    def clear_local(cls):
+        """Drops the process-local copies (the shared cache entries expire on their own)."""
+        cls._local.clear()
@@ -0,0 +1,73 @@
+# assessment/services/answer_matching.py
+
+import string
+
+# Punctuation becomes a space, so "carbon-dioxide" and "carbon dioxide" compare equal
+_PUNCTUATION_TABLE = str.maketrans({char: ' ' for char in string.punctuation})
+
+# Applied to TEXT questions without an explicit answer_spec
+DEFAULT_TEXT_SPEC = {
+    'case_sensitive': False,
+    'ignore_punctuation': True,
+    'collapse_whitespace': True,
+    'alternatives': [],
+    'numeric_tolerance': None,
+}
+
+
+class AnswerMatcher:
+    """
+    Compiled form of a Question.answer_spec.
+
+    All accepted answers are normalized once when the answer key is compiled, so
+    matching a student answer is one normalization pass plus a set lookup (and a
+    float comparison when a numeric tolerance is configured).
+
+    Spec keys (all optional): case_sensitive, ignore_punctuation,
+    collapse_whitespace, alternatives (list of extra accepted answers) and
+    numeric_tolerance (absolute tolerance for numeric answers).
+    """
+
+    __slots__ = ('case_sensitive', 'ignore_punctuation', 'collapse_whitespace', 'accepted', 'numbers', 'tolerance')
+
+    def __init__(self, correct_answer, spec=None):
+        spec = {**DEFAULT_TEXT_SPEC, **(spec or {})}
+        self.case_sensitive = bool(spec['case_sensitive'])
+        self.ignore_punctuation = bool(spec['ignore_punctuation'])
+        self.collapse_whitespace = bool(spec['collapse_whitespace'])
+
+        answers = [correct_answer] + [str(alt) for alt in spec['alternatives'] or []]
+        self.accepted = frozenset(self.normalize(answer) for answer in answers)
+
+        self.tolerance = spec['numeric_tolerance']
+        if self.tolerance is not None:
+            self.tolerance = abs(float(self.tolerance))
+            self.numbers = tuple(n for n in map(self._to_number, answers) if n is not None)
+        else:
+            self.numbers = ()
+
+    @staticmethod
+    def _to_number(value):
+        try:
+            return float(value.strip().replace(',', ''))
+        except (AttributeError, ValueError):
+            return None
+
+    def normalize(self, value):
+        value = value or ''
+        if not self.case_sensitive:
+            value = value.casefold()
+        if self.ignore_punctuation:
+            value = value.translate(_PUNCTUATION_TABLE)
+        if self.collapse_whitespace:
+            return ' '.join(value.split())
+        return value.strip()
+
+    def matches(self, user_answer):
+        if self.normalize(user_answer) in self.accepted:
+            return True
+        if self.numbers:
+            number = self._to_number(user_answer)
+            if number is not None:
+                return any(abs(number - target) <= self.tolerance for target in self.numbers)
+        return False
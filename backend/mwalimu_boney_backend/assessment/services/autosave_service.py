@@ -0,0 +1,193 @@
+# assessment/services/autosave_service.py
+
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from channels.db import database_sync_to_async
+from django.conf import settings
+from assessment.models import AnswerSubmission, UserAttempt
+from assessment.services.answer_key_service import AnswerKeyService
+from assessment.services.grading_service import GradingService
+
+try:
+    import redis
+except ImportError:  # Optional: answers are then buffered in process memory
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+
+class LocalAutosaveStore:
+    """In-process stand-in for RedisAutosaveStore (development, tests, single-process deploys)."""
+
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def record(self, attempt_id, question_id, user_answer):
+        with self._lock:
+            self._pending[(attempt_id, question_id)] = user_answer
+
+    def drain(self, attempt_id=None):
+        with self._lock:
+            if attempt_id is None:
+                drained, self._pending = self._pending, {}
+            else:
+                keys = [key for key in self._pending if key[0] == attempt_id]
+                drained = {key: self._pending.pop(key) for key in keys}
+        return drained
+
+    def restore(self, pending):
+        # Keep answers the student changed again meanwhile
+        with self._lock:
+            for key, answer in pending.items():
+                self._pending.setdefault(key, answer)
+
+
+class RedisAutosaveStore:
+    """
+    Latest answers in one Redis hash per attempt plus a set of attempts with unsaved
+    answers, shared by every web and websocket process: a REST submit handled by any
+    worker drains what the student's socket buffered elsewhere.
+    """
+
+    PREFIX = 'assessment:autosave'
+    DIRTY_KEY = f'{PREFIX}:dirty'
+
+    def __init__(self, url):
+        self.client = redis.Redis.from_url(url)
+
+    def _key(self, attempt_id):
+        return f'{self.PREFIX}:{attempt_id}'
+
+    def record(self, attempt_id, question_id, user_answer):
+        pipeline = self.client.pipeline()
+        pipeline.hset(self._key(attempt_id), question_id, user_answer)
+        pipeline.sadd(self.DIRTY_KEY, attempt_id)
+        pipeline.execute()
+
+    def drain(self, attempt_id=None):
+        if attempt_id is None:
+            attempt_ids = [int(raw) for raw in self.client.smembers(self.DIRTY_KEY)]
+        else:
+            attempt_ids = [attempt_id]
+
+        drained = {}
+        for a_id in attempt_ids:
+            # Un-mark first: a record() racing the drain marks the attempt again.
+            # RENAME is atomic, so answers arriving during the flush go to a fresh hash.
+            self.client.srem(self.DIRTY_KEY, a_id)
+            flushing = f'{self._key(a_id)}:flushing:{uuid.uuid4().hex}'
+            try:
+                self.client.rename(self._key(a_id), flushing)
+            except redis.ResponseError:
+                continue  # Nothing buffered
+            raw = self.client.hgetall(flushing)
+            self.client.delete(flushing)
+            for question_id, answer in raw.items():
+                drained[(a_id, int(question_id))] = answer.decode()
+        return drained
+
+    def restore(self, pending):
+        pipeline = self.client.pipeline()
+        for (attempt_id, question_id), answer in pending.items():
+            pipeline.hsetnx(self._key(attempt_id), question_id, answer)
+            pipeline.sadd(self.DIRTY_KEY, attempt_id)
+        pipeline.execute()
+
+
+class AutosaveBuffer:
+    """
+    Write-behind buffer for streamed answers.
+
+    Consumers record the latest answer per (attempt, question), in Redis when
+    AUTOSAVE_REDIS_URL is set and in process memory otherwise; a background loop in
+    each websocket process flushes everything that changed with one batched upsert
+    every few seconds, so keystroke-level autosave costs the database one statement
+    per interval instead of one per change. With the Redis store any process (e.g. the
+    one handling a REST submit) can flush an attempt's answers. Flush batch size and
+    latency are kept in `stats` and logged for metrics collection.
+    """
+
+    def __init__(self, store=None, flush_seconds=None, max_batch=None):
+        self.flush_seconds = flush_seconds or getattr(settings, 'AUTOSAVE_FLUSH_SECONDS', 3)
+        self.max_batch = max_batch or getattr(settings, 'AUTOSAVE_MAX_BATCH', 2000)
+        self._store = store
+        self._flusher = None
+        self.stats = {'flushes': 0, 'answers_flushed': 0, 'last_batch_size': 0, 'last_flush_ms': 0.0}
+
+    @property
+    def store(self):
+        if self._store is None:
+            url = getattr(settings, 'AUTOSAVE_REDIS_URL', None)
+            if url and redis is None:
+                logger.warning("AUTOSAVE_REDIS_URL is set but redis is not installed; buffering in process.")
+            self._store = RedisAutosaveStore(url) if url and redis is not None else LocalAutosaveStore()
+        return self._store
+
+    def record(self, attempt_id, question_id, user_answer):
+        self.store.record(attempt_id, question_id, user_answer)
+
+    def flush(self, attempt_id=None):
+        """Writes pending answers (all, or one attempt's) in batched upserts. Returns the row count."""
+        pending = self.store.drain(attempt_id)
+        if not pending:
+            return 0
+
+        started = time.perf_counter()
+
+        try:
+            # Never overwrite answers of attempts that were graded in the meantime
+            open_attempts = {
+                a_id: (exam_id, version)
+                for a_id, exam_id, version in UserAttempt.objects.filter(
+                    id__in={key[0] for key in pending}, is_completed=False
+                ).values_list('id', 'exam_id', 'exam__version')
+            }
+            # Sockets validated answers against the key they connected with; drop answers
+            # to questions the exam's current version no longer has
+            answer_keys = {
+                exam_id: AnswerKeyService.get_versioned_answer_key(exam_id, version)
+                for exam_id, version in set(open_attempts.values())
+            }
+            rows = [
+                AnswerSubmission(user_attempt_id=a_id, question_id=q_id, user_answer=answer)
+                for (a_id, q_id), answer in pending.items()
+                if a_id in open_attempts and q_id in answer_keys[open_attempts[a_id][0]]
+            ]
+            for start in range(0, len(rows), self.max_batch):
+                GradingService.upsert_answers(rows[start:start + self.max_batch], update_fields=['user_answer'])
+        except Exception:
+            # Put the answers back unless the student changed them again meanwhile
+            self.store.restore(pending)
+            raise
+
+        latency_ms = (time.perf_counter() - started) * 1000
+        self.stats['flushes'] += 1
+        self.stats['answers_flushed'] += len(rows)
+        self.stats['last_batch_size'] = len(rows)
+        self.stats['last_flush_ms'] = latency_ms
+        logger.info(
+            "Autosave flush: batch_size=%d latency_ms=%.1f", len(rows), latency_ms,
+            extra={'autosave_batch_size': len(rows), 'autosave_flush_latency_ms': latency_ms},
+        )
+        return len(rows)
+
+    def ensure_flusher(self):
+        """Starts the periodic flush loop on the running event loop (once per process)."""
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.get_running_loop().create_task(self._flush_forever())
+
+    async def _flush_forever(self):
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            try:
+                await database_sync_to_async(self.flush)()
+            except Exception:
+                logger.exception("Autosave flush failed; answers stay buffered until the next flush.")
+
+
+# Buffer shared by every autosave connection (across processes with AUTOSAVE_REDIS_URL)
+autosave_buffer = AutosaveBuffer()
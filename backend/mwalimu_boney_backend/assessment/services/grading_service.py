@@ -0,0 +1,163 @@
+# assessment/services/grading_service.py
+
+from collections import defaultdict
+from django.db import transaction
+from django.http import Http404
+from django.utils import timezone
+from assessment.models import AnswerSubmission, UserAttempt
+from assessment.services.answer_key_service import AnswerKeyService
+from assessment.services.shuffle_service import PaperShuffleService
+
+
+class GradingService:
+    """
+    Set-based grading engine for exam submissions.
+
+    A submission is graded with a fixed number of queries regardless of how many
+    questions the exam has: the answer key comes from AnswerKeyService (cached per
+    exam version), one query locks the open attempt row, one reads any autosaved
+    answers, one bulk upsert writes every AnswerSubmission and one update finalizes
+    the UserAttempt.
+    """
+
+    @staticmethod
+    def _parse_question_id(raw_id):
+        try:
+            return int(raw_id)
+        except (TypeError, ValueError):
+            raise Http404("No Question matches the given query.")
+
+    @staticmethod
+    def collect_answers(answer_key, submission_data, attempt=None):
+        """
+        Validates a list of {'question_id', 'user_answer'} dicts against the answer key.
+        Returns {question_id: stripped_answer}; the last answer for a question wins.
+        When the attempt saw a shuffled paper, MCQ letters are mapped back to the
+        canonical options so stored answers never depend on the attempt's view.
+        """
+        seed = None
+        if attempt is not None and PaperShuffleService.applies_to(attempt.exam):
+            seed = PaperShuffleService.seed(attempt.exam_id, attempt.id)
+
+        answers = {}
+        for sub in submission_data:
+            question_id = GradingService._parse_question_id(sub.get('question_id'))
+            entry = answer_key.get(question_id)
+            if entry is None:
+                raise Http404("No Question matches the given query.")
+            user_answer = (sub.get('user_answer') or '').strip()
+            if seed is not None:
+                user_answer = PaperShuffleService.unshuffle_answer(seed, question_id, entry, user_answer)
+            answers[question_id] = user_answer
+        return answers
+
+    @staticmethod
+    def upsert_answers(submissions, update_fields):
+        """Writes AnswerSubmission rows in one statement, updating rows that already exist."""
+        return AnswerSubmission.objects.bulk_create(
+            submissions,
+            update_conflicts=True,
+            unique_fields=['user_attempt', 'question'],
+            update_fields=update_fields,
+        )
+
+    @staticmethod
+    def score_answers(attempt, answer_key, answers):
+        """Scores {question_id: answer} in memory. Returns (total_score, AnswerSubmission rows)."""
+        total_score = 0
+        submissions = []
+
+        for question_id, user_answer in answers.items():
+            entry = answer_key.get(question_id)
+            if entry is None:
+                # Saved against a question that has since been deleted
+                continue
+
+            user_answer = (user_answer or '').strip()
+
+            # MCQ: exact match; TEXT: the question's precompiled matcher
+            is_correct = entry.is_correct(user_answer)
+            if is_correct:
+                total_score += entry.points
+
+            submissions.append(AnswerSubmission(
+                user_attempt=attempt,
+                question_id=question_id,
+                user_answer=user_answer,
+                is_correct=is_correct,
+            ))
+        return total_score, submissions
+
+    @staticmethod
+    def grade_submission(attempt, submission_data):
+        """
+        Scores every answer in memory, upserts them in one statement and closes the attempt.
+        Answers already autosaved for the attempt are graded too, overridden by the payload.
+        Returns the total score, or None when the attempt was closed meanwhile (a second
+        submit, the other transport or the sweeper). Unknown question IDs abort the whole
+        submission with a 404, mirroring the previous per-answer get_object_or_404 behaviour.
+        """
+        answer_key = AnswerKeyService.get_answer_key(attempt.exam)
+        submitted = GradingService.collect_answers(answer_key, submission_data, attempt)
+
+        with transaction.atomic():
+            # The caller's instance may be stale (e.g. loaded when a socket connected):
+            # lock the row and grade only if it is still open
+            locked = (
+                UserAttempt.objects.select_for_update()
+                .filter(pk=attempt.pk, is_completed=False)
+                .first()
+            )
+            if locked is None:
+                return None
+            locked.exam = attempt.exam
+            attempt = locked
+
+            answers = dict(
+                AnswerSubmission.objects.filter(user_attempt=attempt)
+                .values_list('question_id', 'user_answer')
+            )
+            answers.update(submitted)
+
+            total_score, submissions = GradingService.score_answers(attempt, answer_key, answers)
+            GradingService.upsert_answers(submissions, update_fields=['user_answer', 'is_correct'])
+
+            # Finalize attempt
+            attempt.score = total_score
+            attempt.is_completed = True
+            attempt.end_time = timezone.now()
+            attempt.save()
+
+        return total_score
+
+    @staticmethod
+    def grade_saved_attempts(attempts):
+        """
+        Closes a batch of attempts using only their saved answers (e.g. expired attempts).
+        Saved answers for the whole batch are read in one query and written back in one
+        upsert; each attempt is then saved individually so completion signals still fire.
+        The attempt's end_time is its deadline. Call inside a transaction.
+        """
+        if not attempts:
+            return 0
+
+        saved = defaultdict(dict)
+        rows = (
+            AnswerSubmission.objects.filter(user_attempt__in=attempts)
+            .values_list('user_attempt_id', 'question_id', 'user_answer')
+        )
+        for attempt_id, question_id, user_answer in rows:
+            saved[attempt_id][question_id] = user_answer
+
+        submissions = []
+        for attempt in attempts:
+            answer_key = AnswerKeyService.get_answer_key(attempt.exam)
+            attempt.score, graded = GradingService.score_answers(attempt, answer_key, saved[attempt.id])
+            submissions.extend(graded)
+        GradingService.upsert_answers(submissions, update_fields=['user_answer', 'is_correct'])
+
+        for attempt in attempts:
+            attempt.is_completed = True
+            attempt.end_time = attempt.deadline or timezone.now()
+            attempt.save()
+        return len(attempts)
@@ -0,0 +1,114 @@
+# assessment/services/item_analysis_service.py
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from assessment.models import AnswerSubmission, UserAttempt
+from assessment.services.answer_key_service import AnswerKeyService
+
+
+class ItemAnalysisService:
+    """
+    Classical item analysis for an exam: difficulty, discrimination index,
+    distractor frequencies and KR-20 reliability.
+
+    Completed answers are streamed out of the database in a single query into
+    NumPy arrays, scattered into a candidates x questions response matrix and
+    every statistic is computed with vectorized operations. Results are cached per
+    exam version and number of completed attempts, so new submissions or edited
+    questions produce a fresh report.
+    """
+
+    CACHE_TIMEOUT = getattr(settings, 'ITEM_ANALYSIS_CACHE_TIMEOUT', 60 * 15)
+    CHUNK_SIZE = 5000
+    # Share of candidates in each of the upper and lower groups (Kelley's 27%)
+    GROUP_FRACTION = 0.27
+
+    @staticmethod
+    def cache_key(exam_id, version, candidates):
+        return f'assessment:item_analysis:{exam_id}:v{version}:n{candidates}'
+
+    @classmethod
+    def _load_columns(cls, exam):
+        """Streams (attempt, question, is_correct, answer) for completed attempts into arrays."""
+        rows = (
+            AnswerSubmission.objects
+            .filter(user_attempt__exam=exam, user_attempt__is_completed=True)
+            .values_list('user_attempt_id', 'question_id', 'is_correct', 'user_answer')
+            .iterator(chunk_size=cls.CHUNK_SIZE)
+        )
+        attempt_ids, question_ids, correct, answers = [], [], [], []
+        for attempt_id, question_id, is_correct, user_answer in rows:
+            attempt_ids.append(attempt_id)
+            question_ids.append(question_id)
+            correct.append(is_correct)
+            answers.append((user_answer or '').strip().upper())
+        return (
+            np.asarray(attempt_ids, dtype=np.int64),
+            np.asarray(question_ids, dtype=np.int64),
+            np.asarray(correct, dtype=bool),
+            np.asarray(answers, dtype=object),
+        )
+
+    @classmethod
+    def analyze(cls, exam, answer_key, attempt_ids, question_ids, correct, answers):
+        """Computes the report from column arrays. Unanswered questions count as incorrect."""
+        item_ids = np.asarray(sorted(answer_key), dtype=np.int64)
+        candidates, row = np.unique(attempt_ids, return_inverse=True)
+        n, k = len(candidates), len(item_ids)
+
+        report = {'exam': exam.id, 'version': exam.version, 'candidates': int(n), 'kr20': None, 'items': []}
+        if n == 0 or k == 0:
+            return report
+
+        # Drop answers to questions that are no longer part of the exam
+        col = np.minimum(np.searchsorted(item_ids, question_ids), k - 1)
+        known = item_ids[col] == question_ids
+        row, col, correct, answers = row[known], col[known], correct[known], answers[known]
+
+        scores = np.zeros((n, k), dtype=np.int8)
+        scores[row, col] = correct
+
+        totals = scores.sum(axis=1)
+        difficulty = scores.mean(axis=0)
+
+        group = max(1, int(round(n * cls.GROUP_FRACTION)))
+        ranked = np.argsort(totals, kind='stable')
+        discrimination = scores[ranked[-group:]].mean(axis=0) - scores[ranked[:group]].mean(axis=0)
+
+        variance = totals.var()
+        if k > 1 and variance > 0:
+            report['kr20'] = round(float(k / (k - 1) * (1 - (difficulty * (1 - difficulty)).sum() / variance)), 4)
+
+        # Distractor frequencies: one bincount over (question, answer) codes
+        options, codes = np.unique(answers, return_inverse=True)
+        counts = np.bincount(col * len(options) + codes, minlength=k * len(options)).reshape(k, len(options))
+        answered = counts.sum(axis=1) - counts[:, options == ''].sum(axis=1)
+
+        for index, question_id in enumerate(item_ids.tolist()):
+            entry = answer_key[question_id]
+            item = {
+                'question_id': question_id,
+                'question_type': entry.question_type,
+                'difficulty': round(float(difficulty[index]), 4),
+                'discrimination': round(float(discrimination[index]), 4),
+                'omitted': int(n - answered[index]),
+            }
+            if entry.question_type == 'MCQ':
+                nonzero = np.flatnonzero(counts[index])
+                item['distractors'] = {
+                    options[code]: int(counts[index, code]) for code in nonzero if options[code]
+                }
+            report['items'].append(item)
+        return report
+
+    @classmethod
+    def get_report(cls, exam):
+        candidates = UserAttempt.objects.filter(exam=exam, is_completed=True).count()
+        key = cls.cache_key(exam.id, exam.version, candidates)
+        report = cache.get(key)
+        if report is None:
+            answer_key = AnswerKeyService.get_answer_key(exam)
+            report = cls.analyze(exam, answer_key, *cls._load_columns(exam))
+            cache.set(key, report, cls.CACHE_TIMEOUT)
+        return report
@@ -0,0 +1,169 @@
+# assessment/services/manual_grade_import.py
+
+import csv
+import io
+from django.contrib.auth.models import User
+from django.db import transaction
+from courses.models import Course
+from assessment.models import ManualGrade
+
+
+class ManualGradeImportService:
+    """
+    Bulk import of manual grades from a CSV upload or a JSON list of rows.
+
+    Rows (student, course, assignment_name, score[, max_score]) are read lazily and
+    validated in chunks: the students, the importer's courses and existing grades
+    referenced by a chunk are loaded with one query each, and valid rows are upserted
+    in one statement on the (student, course, assignment_name) unique key. Teachers may
+    only grade their own courses and never overwrite another teacher's grade; students
+    must belong to the course's school. Invalid rows are reported with their row
+    number and never abort the rest of the import.
+    """
+
+    CHUNK_SIZE = 500
+
+    @staticmethod
+    def iter_rows(request):
+        """Yields row dicts from an uploaded CSV file ('file') or a JSON list ('rows' or the body)."""
+        upload = request.FILES.get('file')
+        if upload is not None:
+            yield from csv.DictReader(io.TextIOWrapper(upload.file, encoding='utf-8-sig'))
+            return
+
+        rows = request.data.get('rows', []) if isinstance(request.data, dict) else request.data
+        for row in rows:
+            yield row if isinstance(row, dict) else {}
+
+    @staticmethod
+    def allowed_courses(teacher):
+        """Courses the importer may grade: a teacher's own courses, an administrator's school."""
+        profile = getattr(teacher, 'profile', None)
+        if profile is not None and profile.role == 'TEACHER':
+            return Course.objects.filter(teacher=teacher)
+        if profile is not None and profile.school_id is not None:
+            return Course.objects.filter(school_id=profile.school_id)
+        return Course.objects.all()
+
+    @staticmethod
+    def _parse_int(value):
+        try:
+            return int(str(value).strip())
+        except (TypeError, ValueError):
+            return None
+
+    @classmethod
+    def _clean(cls, row):
+        """Returns (values, errors) for one raw row, checking everything that needs no query."""
+        errors = {}
+        values = {}
+        for field in ('student', 'course', 'score'):
+            values[field] = cls._parse_int(row.get(field))
+            if values[field] is None:
+                errors[field] = 'A valid integer is required.'
+
+        raw_max = row.get('max_score')
+        values['max_score'] = 100 if raw_max in (None, '') else cls._parse_int(raw_max)
+        if values['max_score'] is None or values['max_score'] <= 0:
+            errors['max_score'] = 'Must be a positive integer.'
+
+        name = (row.get('assignment_name') or '').strip()
+        if not name:
+            errors['assignment_name'] = 'This field is required.'
+        elif len(name) > ManualGrade._meta.get_field('assignment_name').max_length:
+            errors['assignment_name'] = 'Ensure this field has no more than 100 characters.'
+        values['assignment_name'] = name
+
+        if not errors and not 0 <= values['score'] <= values['max_score']:
+            errors['score'] = 'Must be between 0 and max_score.'
+        return values, errors
+
+    @classmethod
+    def _import_chunk(cls, teacher, chunk, errors):
+        cleaned = {}
+        for row_number, row in chunk:
+            values, row_errors = cls._clean(row)
+            if row_errors:
+                errors.append({'row': row_number, 'errors': row_errors})
+            else:
+                cleaned[row_number] = values
+        if not cleaned:
+            return 0
+
+        courses = dict(
+            cls.allowed_courses(teacher)
+            .filter(id__in={v['course'] for v in cleaned.values()}).values_list('id', 'school_id')
+        )
+        student_schools = dict(
+            User.objects.filter(id__in={v['student'] for v in cleaned.values()})
+            .values_list('id', 'profile__school_id')
+        )
+        existing = {
+            (student_id, course_id, name): (owner_id, editable)
+            for student_id, course_id, name, owner_id, editable in ManualGrade.objects.filter(
+                student_id__in=student_schools.keys(), course_id__in=courses.keys(),
+                assignment_name__in={v['assignment_name'] for v in cleaned.values()},
+            ).values_list('student_id', 'course_id', 'assignment_name', 'teacher_id', 'editable_by_teacher')
+        }
+        # Administrators may correct any grade they can see; teachers only their own
+        is_teacher = getattr(getattr(teacher, 'profile', None), 'role', None) == 'TEACHER'
+
+        # Later rows for the same key win; one statement cannot update a row twice
+        grades = {}
+        for row_number, values in cleaned.items():
+            key = (values['student'], values['course'], values['assignment_name'])
+            row_errors = {}
+            if values['student'] not in student_schools:
+                row_errors['student'] = 'Student does not exist.'
+            if values['course'] not in courses:
+                row_errors['course'] = 'Course does not exist or is not one of your courses.'
+            elif values['student'] in student_schools and courses[values['course']] not in (
+                None, student_schools[values['student']]
+            ):
+                row_errors['student'] = "Student does not belong to the course's school."
+            owner_id, editable = existing.get(key, (None, True))
+            if not editable:
+                row_errors['score'] = 'This grade is locked and cannot be edited.'
+            elif is_teacher and owner_id not in (None, teacher.id):
+                row_errors['score'] = 'This grade was recorded by another teacher.'
+            if row_errors:
+                errors.append({'row': row_number, 'errors': row_errors})
+                continue
+            grades[key] = ManualGrade(
+                teacher=teacher,
+                student_id=values['student'],
+                course_id=values['course'],
+                assignment_name=values['assignment_name'],
+                score=values['score'],
+                max_score=values['max_score'],
+            )
+
+        if grades:
+            with transaction.atomic():
+                ManualGrade.objects.bulk_create(
+                    list(grades.values()),
+                    update_conflicts=True,
+                    unique_fields=['student', 'course', 'assignment_name'],
+                    # The teacher who first recorded a grade keeps it
+                    update_fields=['score', 'max_score'],
+                )
+        return len(grades)
+
+    @classmethod
+    def import_rows(cls, teacher, rows):
+        """Imports an iterable of row dicts. Returns the summary sent back to the client."""
+        errors = []
+        imported = 0
+        total = 0
+        chunk = []
+        for row_number, row in enumerate(rows, start=1):
+            total = row_number
+            chunk.append((row_number, row))
+            if len(chunk) >= cls.CHUNK_SIZE:
+                imported += cls._import_chunk(teacher, chunk, errors)
+                chunk = []
+        if chunk:
+            imported += cls._import_chunk(teacher, chunk, errors)
+
+        errors.sort(key=lambda error: error['row'])
+        return {'rows': total, 'imported': imported, 'failed': len(errors), 'errors': errors}
@@ -0,0 +1,104 @@
+# assessment/services/paper_service.py
+
+import os
+import time
+from pathlib import Path
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.renderers import JSONRenderer
+from assessment.serializers import QuestionSerializer
+from assessment.services.answer_key_service import LocalLRUCache
+
+
+class QuestionPaperService:
+    """
+    Frozen, pre-serialized question papers for exam start storms.
+
+    A paper is the JSON array of an exam's questions (without answers) rendered once
+    per Exam.version. It is kept in a process-local LRU, the Django cache and on disk,
+    so starting an exam only splices the attempt id in front of ready-made bytes.
+    """
+
+    CACHE_TIMEOUT = getattr(settings, 'PAPER_SNAPSHOT_CACHE_TIMEOUT', 60 * 60 * 6)
+    BUILD_LOCK_TIMEOUT = 30
+    _local = LocalLRUCache(getattr(settings, 'PAPER_SNAPSHOT_LOCAL_CACHE_SIZE', 64))
+
+    @staticmethod
+    def cache_key(exam_id, version):
+        return f'assessment:paper:{exam_id}:v{version}'
+
+    @staticmethod
+    def snapshot_path(exam_id, version):
+        return Path(settings.PAPER_SNAPSHOT_ROOT) / str(exam_id) / f'v{version}.json'
+
+    @staticmethod
+    def render(exam):
+        """Serializes the exam's questions exactly as the start endpoint always has."""
+        questions = exam.questions.all().order_by('id')
+        return JSONRenderer().render(QuestionSerializer(questions, many=True).data)
+
+    @classmethod
+    def _write_snapshot(cls, path, paper):
+        # Write to a temp file and rename so readers never see a half-written paper
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f'.{os.getpid()}.tmp')
+        tmp_path.write_bytes(paper)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def build(cls, exam):
+        """Renders the paper for the exam's current version and stores it in every tier."""
+        key = cls.cache_key(exam.id, exam.version)
+        paper = cls.render(exam)
+        cls._write_snapshot(cls.snapshot_path(exam.id, exam.version), paper)
+        cache.set(key, paper, cls.CACHE_TIMEOUT)
+        cls._local.set(key, paper)
+        return paper
+
+    @classmethod
+    def _read_stored(cls, exam):
+        key = cls.cache_key(exam.id, exam.version)
+
+        paper = cls._local.get(key)
+        if paper is not None:
+            return paper
+
+        paper = cache.get(key)
+        if paper is None:
+            path = cls.snapshot_path(exam.id, exam.version)
+            if path.exists():
+                paper = path.read_bytes()
+                cache.set(key, paper, cls.CACHE_TIMEOUT)
+
+        if paper is not None:
+            cls._local.set(key, paper)
+        return paper
+
+    @classmethod
+    def get_paper(cls, exam):
+        """Returns the paper bytes, building them once if no tier has this version yet."""
+        paper = cls._read_stored(exam)
+        if paper is not None:
+            return paper
+
+        # Only one process renders a missing paper; the others wait briefly for it
+        lock_key = f'{cls.cache_key(exam.id, exam.version)}:lock'
+        if not cache.add(lock_key, 1, cls.BUILD_LOCK_TIMEOUT):
+            for _ in range(20):
+                time.sleep(0.1)
+                paper = cls._read_stored(exam)
+                if paper is not None:
+                    return paper
+        try:
+            return cls.build(exam)
+        finally:
+            cache.delete(lock_key)
+
+    @classmethod
+    def is_built(cls, exam):
+        return cls._read_stored(exam) is not None
+
+    @staticmethod
+    def render_start_response(attempt_id, exam_duration, paper):
+        """Splices the per-student fields in front of the shared paper bytes."""
+        return b'{"attempt_id":%d,"exam_duration":%d,"questions":%b}' % (attempt_id, exam_duration, paper)
@@ -0,0 +1,77 @@
+# assessment/services/shuffle_service.py
+
+import hashlib
+import hmac
+import json
+import random
+from django.conf import settings
+from assessment.services.answer_key_service import LocalLRUCache
+from assessment.services.paper_service import QuestionPaperService
+
+
+class PaperShuffleService:
+    """
+    Deterministic per-attempt shuffling of question order and MCQ options.
+
+    Nothing is stored: the permutation is re-derived from a seed built from the attempt
+    id and a per-exam secret (an HMAC of SECRET_KEY), so the start endpoint applies it
+    on top of the shared cached paper and grading maps displayed option letters back to
+    the canonical ones. Each permutation is a single Fisher-Yates pass (O(n)).
+    """
+
+    _parsed = LocalLRUCache(getattr(settings, 'PAPER_SNAPSHOT_LOCAL_CACHE_SIZE', 64))
+
+    @staticmethod
+    def applies_to(exam):
+        return exam.is_inter_school
+
+    @staticmethod
+    def _exam_secret(exam_id):
+        return hmac.new(settings.SECRET_KEY.encode(), f'exam-shuffle:{exam_id}'.encode(), hashlib.sha256).digest()
+
+    @classmethod
+    def seed(cls, exam_id, attempt_id):
+        digest = hmac.new(cls._exam_secret(exam_id), str(attempt_id).encode(), hashlib.sha256).digest()
+        return int.from_bytes(digest[:16], 'big')
+
+    @staticmethod
+    def permutation(seed, size):
+        """order[displayed_position] = canonical_position."""
+        order = list(range(size))
+        random.Random(seed).shuffle(order)
+        return order
+
+    @classmethod
+    def option_order(cls, seed, question_id, size):
+        return cls.permutation(f'{seed}:{question_id}', size)
+
+    @classmethod
+    def shuffle_paper(cls, exam, attempt_id, paper):
+        """Returns the attempt's view of the cached paper bytes."""
+        key = QuestionPaperService.cache_key(exam.id, exam.version)
+        questions = cls._parsed.get(key)
+        if questions is None:
+            questions = json.loads(paper)
+            cls._parsed.set(key, questions)
+
+        seed = cls.seed(exam.id, attempt_id)
+        shuffled = []
+        for position in cls.permutation(seed, len(questions)):
+            question = questions[position]
+            options = question.get('options')
+            if question.get('question_type') == 'MCQ' and isinstance(options, list):
+                order = cls.option_order(seed, question['id'], len(options))
+                question = {**question, 'options': [options[index] for index in order]}
+            shuffled.append(question)
+        return json.dumps(shuffled, separators=(',', ':'), ensure_ascii=False).encode()
+
+    @classmethod
+    def unshuffle_answer(cls, seed, question_id, entry, user_answer):
+        """Maps a displayed MCQ letter back to the canonical one; other answers pass through."""
+        if entry.question_type != 'MCQ' or not entry.option_count:
+            return user_answer
+        letter = (user_answer or '').strip().upper()
+        displayed = ord(letter) - ord('A') if len(letter) == 1 else -1
+        if not 0 <= displayed < entry.option_count:
+            return user_answer
+        return chr(ord('A') + cls.option_order(seed, question_id, entry.option_count)[displayed])
@@ -1,51 +1,65 @@
 # assessment/signals.py
-from django.db.models.signals import post_save
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
+from django.utils import timezone
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from notifications.services import CommunicationService # Assuming you create this service
 #from .models import UserAttempt, LearningProgress
-from assessment.models import UserAttempt, LearningProgress
+from assessment.models import Exam, Question, UserAttempt, LearningProgress, NotificationOutbox
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def bump_exam_version(sender, instance, **kwargs):
+    """Invalidates the exam's cached answer key by moving it to a new version."""
+    Exam.objects.filter(pk=instance.exam_id).update(version=F('version') + 1)
 
 @receiver(post_save, sender=UserAttempt)
 def update_learning_progress(sender, instance, created, **kwargs):
-    """Updates the user's aggregated progress metrics upon successful attempt completion."""
-    if instance.is_completed:
-        user = instance.user
-        progress, _ = LearningProgress.objects.get_or_create(user=user)
-        
-        # Calculate updated metrics
-        completed_attempts = UserAttempt.objects.filter(user=user, is_completed=True)
-        total_score = sum(a.score for a in completed_attempts)
-        count = completed_attempts.count()
+    """
+    Adds a newly completed attempt to the user's running totals.
+    Only fires on the save that claimed the transition to completed (see UserAttempt.save),
+    so re-saving a finished attempt or a concurrent second close is a no-op.
+    """
+    if not getattr(instance, '_completed_now', False):
+        return
 
-        progress.total_assessments_taken = count
-        
-        if count > 0:
-            # Calculate average score
-            progress.average_assessment_score = total_score / count
-        
-        # Note: total_resources_read needs a signal from the ResourceView model
-        
-        progress.save()
+    LearningProgress.objects.get_or_create(user_id=instance.user_id)
 
+    # Atomic increments: the right-hand side is evaluated against the stored row
+    new_total = F('total_assessment_score') + instance.score
+    new_count = F('total_assessments_taken') + 1
+    LearningProgress.objects.filter(user_id=instance.user_id).update(
+        total_assessments_taken=new_count,
+        total_assessment_score=new_total,
+        average_assessment_score=Cast(new_total, FloatField()) / new_count,
+        last_updated=timezone.now(),
+    )
 
+    # Note: total_resources_read needs a signal from the ResourceView model
 
 
 @receiver(post_save, sender=UserAttempt)
-def handle_assessment_notifications(sender, instance, created, **kwargs):
-    # Determine the associated teacher (Requires linking Exam to Instructor)
-    # ASSUMPTION: The Course model has an 'instructor' FK to User
-    teacher = instance.exam.course.instructor
-    student = instance.user
-
+def queue_assessment_notifications(sender, instance, created, **kwargs):
+    """
+    Records start/finish events for the course teacher in the outbox. The row joins the
+    attempt's transaction; assessment.tasks.drain_notification_outbox sends the digests.
+    """
     if created:
-        # Student just STARTED the exam (UserAttempt created)
-        subject = f"ACTION REQUIRED: {student.username} started {instance.exam.title}"
-        content = f"Student {student.username} has just begun the exam '{instance.exam.title}'. Start time: {instance.start_time.strftime('%H:%M')}."
-        # Trigger communication service to notify the teacher
-        CommunicationService.notify(teacher, subject, content, channels=['WA', 'EMAIL'])
-
-    elif not created and instance.is_completed and instance.score is not None:
-        # Student just FINISHED the exam (UserAttempt updated and completed)
-        subject = f"ASSESSMENT COMPLETE: {student.username} finished {instance.exam.title}"
-        content = f"Student {student.username} completed '{instance.exam.title}'. Score: {instance.score} points."
-        CommunicationService.notify(teacher, subject, content, channels=['WA', 'EMAIL'])
\ No newline at end of file
+        event_type = 'ATTEMPT_STARTED'
+    elif getattr(instance, '_completed_now', False):
+        event_type = 'ATTEMPT_COMPLETED'
+    else:
+        return
+
+    teacher_id = instance.exam.course.teacher_id
+    if teacher_id is None:
+        return
+
+    NotificationOutbox.objects.create(
+        recipient_id=teacher_id,
+        student_id=instance.user_id,
+        exam_id=instance.exam_id,
+        event_type=event_type,
+        score=instance.score if event_type == 'ATTEMPT_COMPLETED' else None,
+    )
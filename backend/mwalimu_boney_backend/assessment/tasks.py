@@ -0,0 +1,145 @@
+# assessment/tasks.py
+
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from assessment.models import Exam, NotificationOutbox, UserAttempt
+from assessment.services.grading_service import GradingService
+from assessment.services.paper_service import QuestionPaperService
+from notifications.services import CommunicationService
+
+logger = logging.getLogger(__name__)
+
+# How many student names a digest lists before summarising the rest
+DIGEST_NAME_LIMIT = 10
+
+
+def _format_digest(event_type, exam, students, scores):
+    """Builds (subject, content) for one teacher/exam/event group."""
+    count = len(students)
+    names = ', '.join(students[:DIGEST_NAME_LIMIT])
+    if count > DIGEST_NAME_LIMIT:
+        names += f" and {count - DIGEST_NAME_LIMIT} more"
+
+    if event_type == 'ATTEMPT_STARTED':
+        if count == 1:
+            subject = f"ACTION REQUIRED: {students[0]} started {exam.title}"
+        else:
+            subject = f"ACTION REQUIRED: {count} students started {exam.title}"
+        content = f"Started '{exam.title}': {names}."
+    else:
+        if count == 1:
+            subject = f"ASSESSMENT COMPLETE: {students[0]} finished {exam.title}"
+        else:
+            subject = f"ASSESSMENT COMPLETE: {count} students finished {exam.title}"
+        average = sum(scores) / len(scores) if scores else 0
+        content = f"Completed '{exam.title}': {names}. Average score: {average:.1f} points."
+
+    return subject, content
+
+
+@shared_task
+def drain_notification_outbox(batch_size=1000):
+    """
+    Sends pending assessment notifications as one digest per (teacher, exam, event type)
+    instead of one message per student.
+
+    Rows are claimed in a short SKIP LOCKED transaction (claimed_at), so no lock is held
+    while messages go out and several workers can drain concurrently. Each digest is
+    then sent on its own and only its rows are marked processed; a failed digest is
+    released for the next run. Claims left behind by a crashed worker expire after
+    OUTBOX_CLAIM_SECONDS.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=getattr(settings, 'OUTBOX_CLAIM_SECONDS', 10 * 60))
+
+    with transaction.atomic():
+        events = list(
+            NotificationOutbox.objects.select_for_update(skip_locked=True, of=('self',))
+            .filter(processed_at__isnull=True)
+            .filter(Q(claimed_at__isnull=True) | Q(claimed_at__lt=stale))
+            .select_related('recipient', 'student', 'exam')
+            .order_by('created_at')[:batch_size]
+        )
+        if not events:
+            return 0
+        NotificationOutbox.objects.filter(pk__in=[e.pk for e in events]).update(claimed_at=now)
+
+    groups = defaultdict(list)
+    for event in events:
+        groups[(event.recipient_id, event.exam_id, event.event_type)].append(event)
+
+    sent = 0
+    for (_, _, event_type), group in groups.items():
+        first = group[0]
+        students = [e.student.username for e in group]
+        scores = [e.score for e in group if e.score is not None]
+        subject, content = _format_digest(event_type, first.exam, students, scores)
+        ids = [e.pk for e in group]
+        try:
+            CommunicationService.notify(first.recipient, subject, content, channels=['WA', 'EMAIL'])
+        except Exception:
+            logger.exception("Sending an outbox digest to user %s failed; it is retried next run.", first.recipient_id)
+            NotificationOutbox.objects.filter(pk__in=ids).update(claimed_at=None)
+            continue
+        NotificationOutbox.objects.filter(pk__in=ids).update(processed_at=timezone.now())
+        sent += len(group)
+
+    logger.info("Drained %d of %d claimed outbox events into %d digests.", sent, len(events), len(groups))
+    return sent
+
+
+@shared_task
+def prebuild_question_papers(lead_minutes=30):
+    """
+    Freezes the question paper of every exam starting within the next `lead_minutes`
+    (or started in the last hour) so the start storm never renders questions.
+    """
+    now = timezone.now()
+    upcoming = Exam.objects.filter(
+        start_time__gte=now - timedelta(hours=1),
+        start_time__lte=now + timedelta(minutes=lead_minutes),
+    )
+
+    built = 0
+    for exam in upcoming.iterator():
+        if not QuestionPaperService.is_built(exam):
+            QuestionPaperService.build(exam)
+            built += 1
+
+    logger.info("Prebuilt %d question papers.", built)
+    return built
+
+
+@shared_task
+def sweep_expired_attempts(batch_size=500, max_batches=20):
+    """
+    Grades and closes open exam attempts whose deadline (plus the submit grace period)
+    has passed, using whatever answers were autosaved. Practice attempts and attempts
+    without a deadline (abandoned before deadlines were stored) are left alone.
+    Expired attempts are found by a range scan on the partial (deadline) index and
+    processed in SKIP LOCKED batches.
+    """
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'ATTEMPT_DEADLINE_GRACE_SECONDS', 30))
+
+    closed = 0
+    for _ in range(max_batches):
+        with transaction.atomic():
+            attempts = list(
+                UserAttempt.objects.select_for_update(skip_locked=True, of=('self',))
+                .filter(is_completed=False, is_practice_mode=False, deadline__isnull=False, deadline__lt=cutoff)
+                .select_related('exam')
+                .order_by('deadline')[:batch_size]
+            )
+            GradingService.grade_saved_attempts(attempts)
+        closed += len(attempts)
+        if len(attempts) < batch_size:
+            break
+
+    logger.info("Auto-submitted %d expired attempts.", closed)
+    return closed
@@ -1,3 +1,644 @@
-from django.test import TestCase
+# assessment/tests.py (Grading Engine and Exam Start)
 
-# Create your tests here.
+import io
+import json
+import os
+import tempfile
+import unittest
+from datetime import timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import patch
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from courses.models import Course
+from assessment.models import Exam, Question, UserAttempt, AnswerSubmission, LearningProgress, ManualGrade, NotificationOutbox
+from assessment.routing import websocket_urlpatterns
+from assessment.services.admission_service import Admission, AdmissionController
+from assessment.services.answer_key_service import AnswerKeyService
+from assessment.services.autosave_service import AutosaveBuffer, LocalAutosaveStore, RedisAutosaveStore, redis
+from assessment.services.grading_service import GradingService
+from assessment.tasks import drain_notification_outbox, sweep_expired_attempts
+from school.models import School
+from users.models import UserProfile
+
+
+class GradingEngineTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        AnswerKeyService.clear_local()
+        self.student = User.objects.create_user(username="candidate", password="password")
+        self.course = Course.objects.create(title="Biology", description="")
+        self.client.force_authenticate(user=self.student)
+
+    def _build_exam(self, num_questions):
+        exam = Exam.objects.create(title=f"Paper {num_questions}", course=self.course, start_time=timezone.now())
+        Question.objects.bulk_create([
+            Question(exam=exam, text=f"Q{i}", correct_answer=" A ", points=2)
+            for i in range(num_questions)
+        ])
+        return exam
+
+    def _submit(self, exam, answer='A'):
+        attempt = UserAttempt.objects.create(user=self.student, exam=exam)
+        payload = {
+            'submissions': [
+                {'question_id': q_id, 'user_answer': answer}
+                for q_id in exam.questions.values_list('id', flat=True)
+            ]
+        }
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(
+                f'/api/student/assessments/{attempt.id}/submit/', payload, format='json'
+            )
+        return attempt, response, len(ctx.captured_queries)
+
+    def test_score_matches_per_question_comparison(self):
+        """Scores are unchanged: stripped exact match, summed points."""
+        exam = self._build_exam(10)
+        attempt, response, _ = self._submit(exam)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['score'], 20)
+        self.assertEqual(AnswerSubmission.objects.filter(user_attempt=attempt, is_correct=True).count(), 10)
+
+        attempt.refresh_from_db()
+        self.assertTrue(attempt.is_completed)
+        self.assertEqual(attempt.score, 20)
+
+    def test_unknown_question_rejects_whole_submission(self):
+        exam = self._build_exam(3)
+        attempt = UserAttempt.objects.create(user=self.student, exam=exam)
+        response = self.client.post(
+            f'/api/student/assessments/{attempt.id}/submit/',
+            {'submissions': [{'question_id': 999999, 'user_answer': 'A'}]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(AnswerSubmission.objects.filter(user_attempt=attempt).exists())
+
+    def test_query_count_is_constant_per_submission(self):
+        """Benchmark: a 100-question submission costs the same number of queries as a 5-question one."""
+        small_exam, large_exam = self._build_exam(5), self._build_exam(100)
+        # Warm up: the first submit creates LearningProgress and caches each answer key
+        self._submit(small_exam)
+        self._submit(large_exam)
+
+        _, small_response, small_queries = self._submit(small_exam)
+        _, large_response, large_queries = self._submit(large_exam)
+
+        self.assertEqual(small_response.status_code, 200)
+        self.assertEqual(large_response.status_code, 200)
+        self.assertEqual(small_queries, large_queries)
+
+    def test_live_exam_grades_without_reading_questions(self):
+        """Once the answer key is cached, submissions never touch assessment_question."""
+        exam = self._build_exam(10)
+        self._submit(exam)
+
+        attempt = UserAttempt.objects.create(user=self.student, exam=exam)
+        question_ids = list(exam.questions.values_list('id', flat=True))
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post(
+                f'/api/student/assessments/{attempt.id}/submit/',
+                {'submissions': [{'question_id': q_id, 'user_answer': 'A'} for q_id in question_ids]},
+                format='json'
+            )
+        self.assertFalse(any('"assessment_question"' in q['sql'] for q in ctx.captured_queries))
+
+    def test_question_change_invalidates_answer_key(self):
+        exam = self._build_exam(1)
+        self._submit(exam)
+
+        question = exam.questions.get()
+        question.correct_answer = 'B'
+        question.save()
+
+        _, response, _ = self._submit(exam, answer='B')
+        self.assertEqual(response.data['score'], 2)
+
+    def test_bulk_question_writes_invalidate_answer_key(self):
+        exam = self._build_exam(2)
+        self._submit(exam)
+
+        exam.questions.update(correct_answer='B')
+        _, response, _ = self._submit(exam, answer='B')
+        self.assertEqual(response.data['score'], 4)
+
+        Question.objects.bulk_create([Question(exam=exam, text="Q2", correct_answer="B", points=2)])
+        _, response, _ = self._submit(exam, answer='B')
+        self.assertEqual(response.data['score'], 6)
+
+    def test_stale_attempt_is_not_graded_twice(self):
+        """A socket holding the attempt from before a REST submit cannot close it again."""
+        exam = self._build_exam(2)
+        attempt = UserAttempt.objects.create(user=self.student, exam=exam)
+        stale = UserAttempt.objects.select_related('exam').get(pk=attempt.pk)
+
+        self.assertEqual(GradingService.grade_submission(attempt, []), 0)
+        self.assertIsNone(GradingService.grade_submission(stale, []))
+        self.assertEqual(LearningProgress.objects.get(user=self.student).total_assessments_taken, 1)
+
+    def test_text_answers_use_normalization_spec(self):
+        exam = Exam.objects.create(title="Science", course=self.course, start_time=timezone.now())
+        term = Question.objects.create(exam=exam, text="Process?", question_type='TEXT', correct_answer="Photosynthesis")
+        value = Question.objects.create(
+            exam=exam, text="Pi?", question_type='TEXT', correct_answer="3.14",
+            answer_spec={'numeric_tolerance': 0.01, 'alternatives': ["pi"]},
+        )
+        attempt = UserAttempt.objects.create(user=self.student, exam=exam)
+        response = self.client.post(
+            f'/api/student/assessments/{attempt.id}/submit/',
+            {'submissions': [
+                {'question_id': term.id, 'user_answer': " photosynthesis. "},
+                {'question_id': value.id, 'user_answer': "3.141"},
+            ]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['score'], 2)
+
+    def test_sweeper_grades_expired_attempts_from_saved_answers(self):
+        exam = self._build_exam(3)
+        expired = UserAttempt.objects.create(user=self.student, exam=exam)
+        self.assertEqual(expired.deadline, expired.start_time + timedelta(minutes=exam.duration_minutes))
+        question_ids = list(exam.questions.values_list('id', flat=True))
+        AnswerSubmission.objects.bulk_create([
+            AnswerSubmission(user_attempt=expired, question_id=question_ids[0], user_answer='A'),
+            AnswerSubmission(user_attempt=expired, question_id=question_ids[1], user_answer='B'),
+        ])
+        UserAttempt.objects.filter(pk=expired.pk).update(deadline=timezone.now() - timedelta(minutes=5))
+        running = UserAttempt.objects.create(user=User.objects.create_user(username="late"), exam=exam)
+
+        self.assertEqual(sweep_expired_attempts(), 1)
+
+        expired.refresh_from_db()
+        running.refresh_from_db()
+        self.assertTrue(expired.is_completed)
+        self.assertEqual(expired.score, 2)
+        self.assertEqual(expired.end_time, expired.deadline)
+        self.assertFalse(running.is_completed)
+
+    def test_sweeper_skips_practice_attempts_and_attempts_without_deadline(self):
+        practice_exam = Exam.objects.create(
+            title="Drill", course=self.course, start_time=timezone.now(), is_realtime=False
+        )
+        practice = UserAttempt.objects.create(user=self.student, exam=practice_exam)
+        historical = UserAttempt.objects.create(user=User.objects.create_user(username="gone"), exam=self._build_exam(1))
+        UserAttempt.objects.filter(pk=practice.pk).update(deadline=timezone.now() - timedelta(minutes=5))
+        UserAttempt.objects.filter(pk=historical.pk).update(deadline=None)
+
+        self.assertEqual(sweep_expired_attempts(), 0)
+        self.assertFalse(UserAttempt.objects.filter(is_completed=True).exists())
+
+
+class QuestionPaperTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.snapshot_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.snapshot_dir.cleanup)
+        self.course = Course.objects.create(title="Chemistry", description="")
+        self.exam = Exam.objects.create(title="Paper 1", course=self.course, start_time=timezone.now())
+        Question.objects.create(exam=self.exam, text="H2O is?", options=["Water", "Salt"], correct_answer="A")
+
+    def test_start_serves_frozen_paper_with_attempt_id(self):
+        with override_settings(PAPER_SNAPSHOT_ROOT=self.snapshot_dir.name):
+            for username in ("first", "second"):
+                student = User.objects.create_user(username=username, password="password")
+                self.client.force_authenticate(user=student)
+                response = self.client.post(f'/api/student/assessments/{self.exam.id}/start/')
+
+                self.assertEqual(response.status_code, 200)
+                data = json.loads(response.content)
+                attempt = UserAttempt.objects.get(user=student, exam=self.exam)
+                self.assertEqual(data['attempt_id'], attempt.id)
+                self.assertEqual(data['exam_duration'], self.exam.duration_minutes)
+                self.assertEqual(data['questions'][0]['options'], ["Water", "Salt"])
+                self.assertNotIn('correct_answer', data['questions'][0])
+
+
+    def test_shuffled_paper_grades_like_canonical_order(self):
+        """Inter-school papers are permuted per attempt; answering by displayed letter scores the same."""
+        exam = Exam.objects.create(title="Inter-school", course=self.course, start_time=timezone.now(), is_inter_school=True)
+        options = ["North", "South", "East", "West"]
+        for index in range(8):
+            Question.objects.create(exam=exam, text=f"Q{index}", options=options, correct_answer="ABCD"[index % 4])
+        correct_text = {q.id: options["ABCD".index(q.correct_answer)] for q in exam.questions.all()}
+
+        student = User.objects.create_user(username="candidate", password="password")
+        self.client.force_authenticate(user=student)
+        with override_settings(PAPER_SNAPSHOT_ROOT=self.snapshot_dir.name):
+            response = self.client.post(f'/api/student/assessments/{exam.id}/start/')
+        data = json.loads(response.content)
+        displayed = data['questions']
+        self.assertCountEqual([q['id'] for q in displayed], correct_text)
+
+        # The displayed letter of the correct option, as a student would pick it
+        submissions = [
+            {'question_id': q['id'], 'user_answer': "ABCD"[q['options'].index(correct_text[q['id']])]}
+            for q in displayed
+        ]
+        response = self.client.post(
+            f"/api/student/assessments/{data['attempt_id']}/submit/", {'submissions': submissions}, format='json'
+        )
+        self.assertEqual(response.data['score'], 8)
+        stored = dict(AnswerSubmission.objects.values_list('question_id', 'user_answer'))
+        self.assertEqual(stored, {q.id: q.correct_answer for q in exam.questions.all()})
+
+class ItemAnalysisTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        AnswerKeyService.clear_local()
+        teacher = User.objects.create_user(username="examiner", password="password")
+        UserProfile.objects.create(user=teacher, role='TEACHER')
+        self.client.force_authenticate(user=teacher)
+
+        course = Course.objects.create(title="Physics", description="")
+        self.exam = Exam.objects.create(title="Mock", course=course, start_time=timezone.now())
+        q1 = Question.objects.create(exam=self.exam, text="Q1", correct_answer="A")
+        q2 = Question.objects.create(exam=self.exam, text="Q2", correct_answer="B")
+        self.q1, self.q2 = q1.id, q2.id
+
+        # Candidate totals 2, 1, 0: q1 answered A/A/C, q2 answered B/C/(omitted)
+        answers = [[(q1, 'A', True), (q2, 'B', True)], [(q1, 'A', True), (q2, 'C', False)], [(q1, 'C', False)]]
+        for index, rows in enumerate(answers):
+            student = User.objects.create_user(username=f"candidate{index}", password="password")
+            attempt = UserAttempt.objects.create(user=student, exam=self.exam, is_completed=True)
+            AnswerSubmission.objects.bulk_create([
+                AnswerSubmission(user_attempt=attempt, question=q, user_answer=a, is_correct=c)
+                for q, a, c in rows
+            ])
+
+    def test_report_statistics(self):
+        response = self.client.get(f'/api/exams/{self.exam.id}/item-analysis/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['candidates'], 3)
+        items = {item['question_id']: item for item in response.data['items']}
+        self.assertAlmostEqual(items[self.q1]['difficulty'], 0.6667)
+        self.assertAlmostEqual(items[self.q2]['difficulty'], 0.3333)
+        self.assertEqual(items[self.q1]['discrimination'], 1.0)
+        self.assertEqual(items[self.q1]['distractors'], {'A': 2, 'C': 1})
+        self.assertEqual(items[self.q2]['omitted'], 1)
+        # KR-20 = 2/1 * (1 - (2/9 + 2/9) / (2/3))
+        self.assertAlmostEqual(response.data['kr20'], 0.6667)
+
+
+class LearningProgressTests(APITestCase):
+
+    def setUp(self):
+        self.school = School.objects.create(name="Maseno")
+        self.student = User.objects.create_user(username="steady", password="password")
+        UserProfile.objects.create(user=self.student, role='STUDENT', school=self.school)
+        course = Course.objects.create(title="Maths", description="", school=self.school)
+        self.exam = Exam.objects.create(title="CAT", course=course, start_time=timezone.now())
+
+    def _complete(self, score):
+        attempt = UserAttempt.objects.create(user=self.student, exam=self.exam)
+        attempt.score, attempt.is_completed = score, True
+        attempt.save()
+        return attempt
+
+    def _totals(self):
+        return LearningProgress.objects.filter(user=self.student).values_list(
+            'total_assessments_taken', 'total_assessment_score', 'average_assessment_score'
+        ).get()
+
+    def test_completed_attempts_are_added_once(self):
+        first = self._complete(3)
+        self._complete(6)
+        # Re-saving a finished attempt is not another completion
+        first.save()
+
+        self.assertEqual(self._totals(), (2, 9, Decimal('4.50')))
+
+    def test_rebuild_command_restores_corrupted_totals(self):
+        self._complete(3)
+        self._complete(6)
+        LearningProgress.objects.filter(user=self.student).update(
+            total_assessments_taken=40, total_assessment_score=7, average_assessment_score=99
+        )
+
+        call_command('rebuild_learning_progress', self.school.id, stdout=io.StringIO())
+        self.assertEqual(self._totals(), (2, 9, Decimal('4.50')))
+
+
+class ManualGradeBulkImportTests(APITestCase):
+
+    def setUp(self):
+        self.teacher = User.objects.create_user(username="teacher", password="password")
+        UserProfile.objects.create(user=self.teacher, role='TEACHER')
+        self.client.force_authenticate(user=self.teacher)
+        self.course = Course.objects.create(title="History", description="", teacher=self.teacher)
+        self.students = [User.objects.create_user(username=f"pupil{i}") for i in range(3)]
+
+    def test_json_rows_upsert_and_report_errors(self):
+        ManualGrade.objects.create(
+            teacher=self.teacher, student=self.students[0], course=self.course, assignment_name="Term 1", score=10
+        )
+        rows = [
+            {'student': s.id, 'course': self.course.id, 'assignment_name': "Term 1", 'score': 70 + i}
+            for i, s in enumerate(self.students)
+        ] + [
+            {'student': 999999, 'course': self.course.id, 'assignment_name': "Term 1", 'score': 50},
+            {'student': self.students[0].id, 'course': self.course.id, 'assignment_name': "Term 1", 'score': 'x'},
+        ]
+        response = self.client.post('/api/grades/bulk-import/', {'rows': rows}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['imported'], 3)
+        self.assertEqual([e['row'] for e in response.data['errors']], [4, 5])
+        self.assertEqual(ManualGrade.objects.count(), 3)
+        self.assertEqual(ManualGrade.objects.get(student=self.students[0]).score, 70)
+
+    def test_csv_upload(self):
+        content = "student,course,assignment_name,score,max_score\n" + "".join(
+            f"{s.id},{self.course.id},Exam,{40 + i},50\n" for i, s in enumerate(self.students)
+        )
+        upload = SimpleUploadedFile("marks.csv", content.encode(), content_type="text/csv")
+        response = self.client.post('/api/grades/bulk-import/', {'file': upload}, format='multipart')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['imported'], 3)
+        self.assertEqual(response.data['errors'], [])
+        self.assertEqual(ManualGrade.objects.get(student=self.students[2]).max_score, 50)
+
+    def test_other_teachers_grades_and_courses_are_rejected(self):
+        colleague = User.objects.create_user(username="colleague", password="password")
+        UserProfile.objects.create(user=colleague, role='TEACHER')
+        foreign_course = Course.objects.create(title="Geography", description="", teacher=colleague)
+        ManualGrade.objects.create(
+            teacher=colleague, student=self.students[0], course=self.course, assignment_name="Term 1", score=10
+        )
+        rows = [
+            {'student': self.students[0].id, 'course': self.course.id, 'assignment_name': "Term 1", 'score': 90},
+            {'student': self.students[1].id, 'course': foreign_course.id, 'assignment_name': "Term 1", 'score': 90},
+            {'student': self.students[2].id, 'course': self.course.id, 'assignment_name': "Term 1", 'score': 60},
+        ]
+        response = self.client.post('/api/grades/bulk-import/', {'rows': rows}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['imported'], 1)
+        self.assertEqual(response.data['errors'], [
+            {'row': 1, 'errors': {'score': 'This grade was recorded by another teacher.'}},
+            {'row': 2, 'errors': {'course': 'Course does not exist or is not one of your courses.'}},
+        ])
+        kept = ManualGrade.objects.get(student=self.students[0])
+        self.assertEqual((kept.teacher, kept.score), (colleague, 10))
+        self.assertFalse(ManualGrade.objects.filter(course=foreign_course).exists())
+
+    def test_non_utf8_csv_is_a_validation_error(self):
+        content = f"student,course,assignment_name,score\n{self.students[0].id},{self.course.id},Épreuve,40\n"
+        upload = SimpleUploadedFile("marks.csv", content.encode('latin-1'), content_type="text/csv")
+        response = self.client.post('/api/grades/bulk-import/', {'file': upload}, format='multipart')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('detail', response.data)
+        self.assertFalse(ManualGrade.objects.exists())
+
+
+class NotificationOutboxTests(APITestCase):
+
+    def setUp(self):
+        teacher = User.objects.create_user(username="teacher", password="password", email="teacher@example.com")
+        course = Course.objects.create(title="History", description="", teacher=teacher)
+        self.exam = Exam.objects.create(title="Mock", course=course, start_time=timezone.now())
+        for index in range(3):
+            student = User.objects.create_user(username=f"writer{index}", password="password")
+            UserAttempt.objects.create(user=student, exam=self.exam)
+
+    def test_digest_is_sent_once_and_failures_are_retried(self):
+        with patch('assessment.tasks.CommunicationService.notify', side_effect=ConnectionError):
+            self.assertEqual(drain_notification_outbox(), 0)
+        self.assertEqual(NotificationOutbox.objects.filter(processed_at__isnull=True, claimed_at__isnull=True).count(), 3)
+
+        self.assertEqual(drain_notification_outbox(), 3)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn("3 students started Mock", mail.outbox[0].subject)
+        self.assertEqual(drain_notification_outbox(), 0)
+
+
+
+class AdmissionQueueTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.controller = AdmissionController('queue-test', budget=2, service_seconds=1)
+
+    def test_waiting_tickets_get_positions_and_retry_hints(self):
+        self.assertTrue(self.controller.acquire(1).admitted)
+        self.assertTrue(self.controller.acquire(1).admitted)
+
+        queued = [self.controller.acquire(1) for _ in range(3)]
+        self.assertEqual([a.ticket for a in queued], [3, 4, 5])
+        self.assertEqual([a.position for a in queued], [1, 2, 3])
+        self.assertEqual([a.retry_after for a in queued], [1, 1, 2])
+
+    def test_retries_do_not_move_the_window_and_order_is_kept(self):
+        self.controller.acquire(1)
+        self.controller.acquire(1)
+        third, fourth = self.controller.acquire(1), self.controller.acquire(1)
+
+        # Hammering the queue from behind never overtakes or slides the window
+        for _ in range(5):
+            self.assertFalse(self.controller.acquire(1, fourth.ticket).admitted)
+        self.assertEqual(self.controller.acquire(1, third.ticket).position, 1)
+
+        self.controller.release(1)
+        self.assertFalse(self.controller.acquire(1, fourth.ticket).admitted)
+        self.assertTrue(self.controller.acquire(1, third.ticket).admitted)
+
+        self.controller.release(1)
+        self.assertTrue(self.controller.acquire(1, fourth.ticket).admitted)
+
+    def test_a_stalled_queue_skips_abandoned_tickets(self):
+        self.controller.acquire(1)
+        self.controller.acquire(1)
+        self.controller.acquire(1)
+        self.controller.acquire(1)
+        self.controller.release(1)
+        self.controller.release(1)
+        # Tickets 3 and 4 are now inside the window but their clients never come back
+        late = self.controller.acquire(1)
+        self.assertFalse(late.admitted)
+
+        cache.delete(self.controller._keys(1)[3])  # the stall period elapses
+        self.assertTrue(self.controller.acquire(1, late.ticket).admitted)
+
+
+class AdmissionTicketTests(APITestCase):
+
+    def setUp(self):
+        self.controller = AdmissionController('assessment')
+        self.student = User.objects.create_user(username="queued", password="password")
+        self.other = User.objects.create_user(username="other", password="password")
+
+    def _parse(self, raw, user, exam_id=1):
+        request = SimpleNamespace(data={'queue_ticket': raw}, headers={}, user=user)
+        return self.controller.parse_ticket(request, exam_id)
+
+    def test_queue_ticket_is_signed_and_bound_to_student_and_exam(self):
+        queued = Admission(False, 7, 3, 1)
+        signed = self.controller.queued_response_data(queued, SimpleNamespace(user=self.student), 1)['queue_ticket']
+
+        self.assertEqual(self._parse(signed, self.student), 7)
+        self.assertIsNone(self._parse(signed, self.other))
+        self.assertIsNone(self._parse(signed, self.student, exam_id=2))
+        self.assertIsNone(self._parse('1', self.student))
+
+
+def _redis_available(url):
+    if redis is None:
+        return False
+    try:
+        return redis.Redis.from_url(url, socket_connect_timeout=0.2).ping()
+    except redis.RedisError:
+        return False
+
+
+# Redis-backed autosave tests run against this database when a server is reachable
+AUTOSAVE_TEST_REDIS_URL = os.environ.get('AUTOSAVE_TEST_REDIS_URL', 'redis://127.0.0.1:6379/15')
+
+
+class AutosaveFlushTestsMixin:
+
+    def make_store(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        AnswerKeyService.clear_local()
+        cache.clear()
+        student = User.objects.create_user(username="typist", password="password")
+        course = Course.objects.create(title="Physics", description="")
+        self.exam = Exam.objects.create(title="Waves", course=course, start_time=timezone.now())
+        self.questions = Question.objects.bulk_create([
+            Question(exam=self.exam, text=f"Q{i}", correct_answer="A") for i in range(3)
+        ])
+        self.attempt = UserAttempt.objects.create(user=student, exam=self.exam)
+        self.closed = UserAttempt.objects.create(user=student, exam=self.exam, is_completed=True)
+        self.buffer = AutosaveBuffer(store=self.make_store())
+
+    def test_flush_upserts_latest_answers_and_records_stats(self):
+        first, second, _ = self.questions
+        self.buffer.record(self.attempt.id, first.id, 'A')
+        self.buffer.record(self.attempt.id, first.id, 'C')
+        self.buffer.record(self.attempt.id, second.id, 'B')
+        self.buffer.record(self.closed.id, first.id, 'B')
+
+        self.assertEqual(self.buffer.flush(), 2)
+        self.assertEqual(
+            dict(AnswerSubmission.objects.filter(user_attempt=self.attempt).values_list('question_id', 'user_answer')),
+            {first.id: 'C', second.id: 'B'},
+        )
+        self.assertFalse(AnswerSubmission.objects.filter(user_attempt=self.closed).exists())
+        self.assertEqual(self.buffer.stats['flushes'], 1)
+        self.assertEqual(self.buffer.stats['last_batch_size'], 2)
+        self.assertEqual(self.buffer.flush(), 0)
+
+    def test_flush_drops_answers_to_questions_removed_since_connect(self):
+        first, second, third = self.questions
+        self.buffer.record(self.attempt.id, first.id, 'A')
+        self.buffer.record(self.attempt.id, third.id, 'B')
+        third.delete()
+
+        self.assertEqual(self.buffer.flush(self.attempt.id), 1)
+        self.assertEqual(
+            list(AnswerSubmission.objects.filter(user_attempt=self.attempt).values_list('question_id', flat=True)),
+            [first.id],
+        )
+
+
+class LocalAutosaveFlushTests(AutosaveFlushTestsMixin, APITestCase):
+
+    def make_store(self):
+        return LocalAutosaveStore()
+
+
+@unittest.skipUnless(_redis_available(AUTOSAVE_TEST_REDIS_URL), "Redis server not reachable")
+class RedisAutosaveFlushTests(AutosaveFlushTestsMixin, APITestCase):
+
+    def make_store(self):
+        store = RedisAutosaveStore(AUTOSAVE_TEST_REDIS_URL)
+        store.client.flushdb()
+        self.addCleanup(store.client.flushdb)
+        return store
+
+
+class AttemptAutosaveConsumerTests(TransactionTestCase):
+    """The consumer runs its queries on other threads, so data must be committed."""
+
+    def setUp(self):
+        AnswerKeyService.clear_local()
+        cache.clear()
+        self.student = User.objects.create_user(username="streamer", password="password")
+        self.other = User.objects.create_user(username="lurker", password="password")
+        course = Course.objects.create(title="Chemistry", description="")
+        self.exam = Exam.objects.create(title="Acids", course=course, start_time=timezone.now())
+        self.question = Question.objects.create(exam=self.exam, text="Q", correct_answer="A")
+        self.attempt = UserAttempt.objects.create(user=self.student, exam=self.exam)
+
+        self.buffer = AutosaveBuffer(store=LocalAutosaveStore(), flush_seconds=3600)
+        patcher = patch('assessment.consumers.autosave_buffer', self.buffer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def _connect(self, user, attempt_id):
+        communicator = WebsocketCommunicator(
+            URLRouter(websocket_urlpatterns), f'/ws/assessment/attempts/{attempt_id}/autosave/'
+        )
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        return communicator, connected
+
+    async def _disconnect(self, communicator):
+        await communicator.disconnect()
+        if self.buffer._flusher is not None:
+            self.buffer._flusher.cancel()
+
+    async def test_answers_are_acknowledged_and_flushed_on_disconnect(self):
+        communicator, connected = await self._connect(self.student, self.attempt.id)
+        self.assertTrue(connected)
+
+        await communicator.send_json_to({'type': 'answer', 'question_id': self.question.id, 'user_answer': ' B '})
+        self.assertEqual(await communicator.receive_json_from(), {'type': 'ack', 'saved': [self.question.id]})
+
+        # A question added after connect is accepted against the exam's new version
+        added = await database_sync_to_async(Question.objects.create)(exam=self.exam, text="Q2", correct_answer="A")
+        await communicator.send_json_to({'type': 'answer', 'question_id': added.id, 'user_answer': 'A'})
+        self.assertEqual(await communicator.receive_json_from(), {'type': 'ack', 'saved': [added.id]})
+
+        await self._disconnect(communicator)
+        saved = await database_sync_to_async(lambda: dict(
+            AnswerSubmission.objects.filter(user_attempt=self.attempt).values_list('question_id', 'user_answer')
+        ))()
+        self.assertEqual(saved, {self.question.id: 'B', added.id: 'A'})
+
+    async def test_submit_grades_the_attempt(self):
+        communicator, _ = await self._connect(self.student, self.attempt.id)
+        await communicator.send_json_to({
+            'type': 'submit', 'submissions': [{'question_id': self.question.id, 'user_answer': 'A'}],
+        })
+        self.assertEqual(await communicator.receive_json_from(), {'type': 'submitted', 'score': 1})
+        await self._disconnect(communicator)
+
+        attempt = await database_sync_to_async(UserAttempt.objects.get)(pk=self.attempt.pk)
+        self.assertTrue(attempt.is_completed)
+
+    async def test_another_students_attempt_is_rejected(self):
+        communicator, connected = await self._connect(self.other, self.attempt.id)
+        self.assertFalse(connected)
+        await self._disconnect(communicator)
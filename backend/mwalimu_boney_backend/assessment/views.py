@@ -8,9 +8,22 @@ from .models import Exam, Question, UserAttempt, AnswerSubmission, LearningProgr
 from .serializers import ExamSerializer, LearningProgressSerializer, QuestionSerializer, UserAttemptSerializer, ManualGradeSerializer
 from django.utils import timezone
 from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.http import HttpResponse
 from datetime import timedelta
+import csv
 import json
 from gamification.services import XPService
+from .services.grading_service import GradingService
+from .services.paper_service import QuestionPaperService
+from .services.shuffle_service import PaperShuffleService
+from .services.admission_service import AdmissionController
+from .services.autosave_service import autosave_buffer
+from .services.item_analysis_service import ItemAnalysisService
+from .services.manual_grade_import import ManualGradeImportService
+
+# Shared per-exam concurrency budget for StudentAssessmentView.start
+exam_start_admission = AdmissionController('assessment')
 
 class ExamManagerViewSet(viewsets.ModelViewSet):
     """
@@ -28,6 +41,12 @@ class ExamManagerViewSet(viewsets.ModelViewSet):
         exam = self.get_object()
         serializer = QuestionSerializer(exam.questions.all(), many=True)
         return Response(serializer.data)
+
+    @action(detail=True, methods=['get'], url_path='item-analysis')
+    def item_analysis(self, request, pk=None):
+        """Per-question difficulty, discrimination, distractor counts and KR-20 for an exam."""
+        exam = self.get_object()
+        return Response(ItemAnalysisService.get_report(exam))
     
     
 
@@ -40,59 +59,55 @@ class StudentAssessmentView(viewsets.GenericViewSet):
     @action(detail=True, methods=['post'])
     def start(self, request, pk=None):
         """Start an exam, creating a new UserAttempt."""
-        exam = get_object_or_404(Exam, pk=pk)
-        user = request.user
-        
-        # Check if attempt is valid (e.g., within start time window, not already taken if realtime)
-        if exam.is_realtime and UserAttempt.objects.filter(user=user, exam=exam).exists():
-            return Response({'detail': 'You have already completed this real-time exam.'}, 
-                            status=status.HTTP_400_BAD_REQUEST)
+        # Admission control: a bounded number of starts run at once, the rest queue FIFO
+        ticket = exam_start_admission.parse_ticket(request, pk)
+        with exam_start_admission.admit(pk, ticket) as admission:
+            if not admission.admitted:
+                return Response(exam_start_admission.queued_response_data(admission, request, pk),
+                                status=status.HTTP_429_TOO_MANY_REQUESTS,
+                                headers={'Retry-After': str(admission.retry_after)})
 
-        attempt = UserAttempt.objects.create(user=user, exam=exam, start_time=timezone.now())
+            exam = get_object_or_404(Exam, pk=pk)
+            user = request.user
         
-        # Send questions (without correct answers)
-        questions_serializer = QuestionSerializer(exam.questions.all(), many=True)
+            # Check if attempt is valid (e.g., within start time window, not already taken if realtime)
+            if exam.is_realtime and UserAttempt.objects.filter(user=user, exam=exam).exists():
+                return Response({'detail': 'You have already completed this real-time exam.'}, 
+                                status=status.HTTP_400_BAD_REQUEST)
+
+            # The teacher notification is queued in the outbox inside the same transaction
+            with transaction.atomic():
+                attempt = UserAttempt.objects.create(user=user, exam=exam, start_time=timezone.now())
         
-        return Response({
-            'attempt_id': attempt.id,
-            'exam_duration': exam.duration_minutes,
-            'questions': questions_serializer.data,
-        })
+            # Send questions (without correct answers) from the pre-serialized paper
+            paper = QuestionPaperService.get_paper(exam)
+            if PaperShuffleService.applies_to(exam):
+                # Inter-school candidates each get their own question and option order
+                paper = PaperShuffleService.shuffle_paper(exam, attempt.id, paper)
+            body = QuestionPaperService.render_start_response(attempt.id, exam.duration_minutes, paper)
+            return HttpResponse(body, content_type='application/json')
 
     @action(detail=True, methods=['post'])
     def submit(self, request, pk=None):
         """Submit all answers for an attempt and calculate the score."""
-        attempt = get_object_or_404(UserAttempt, pk=pk, user=request.user, is_completed=False)
+        attempt = get_object_or_404(
+            UserAttempt.objects.select_related('exam'),
+            pk=pk, user=request.user, is_completed=False
+        )
         submission_data = request.data.get('submissions', [])
         
-        if attempt.end_time and attempt.end_time < timezone.now():
+        if attempt.is_past_deadline():
              return Response({'detail': 'Submission failed: Time limit exceeded.'}, 
                             status=status.HTTP_400_BAD_REQUEST)
 
-        total_score = 0
-        
-        for sub in submission_data:
-            question = get_object_or_404(Question, pk=sub.get('question_id'))
-            user_answer = sub.get('user_answer', '').strip()
-            
-            # Simple scoring logic: compare user_answer to correct_answer
-            is_correct = (user_answer == question.correct_answer.strip())
-            
-            AnswerSubmission.objects.create(
-                user_attempt=attempt,
-                question=question,
-                user_answer=user_answer,
-                is_correct=is_correct
-            )
-            
-            if is_correct:
-                total_score += question.points
-
-        # Finalize attempt
-        attempt.score = total_score
-        attempt.is_completed = True
-        attempt.end_time = timezone.now()
-        attempt.save()
+        # Answers streamed over the autosave socket may still be buffered
+        autosave_buffer.flush(attempt.id)
+
+        # Load the answer key once, score in memory and bulk-write all answers
+        total_score = GradingService.grade_submission(attempt, submission_data)
+        if total_score is None:
+            return Response({'detail': 'This attempt has already been submitted.'},
+                            status=status.HTTP_409_CONFLICT)
         
         # NOTE: This is where you would trigger the update to LearningProgress
         
@@ -128,6 +143,22 @@ class ManualGradeViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         # Automatically set the teacher to the logged-in user
         serializer.save(teacher=self.request.user)
+
+    @action(detail=False, methods=['post'], url_path='bulk-import')
+    def bulk_import(self, request):
+        """
+        Upserts many grades at once from a CSV upload ('file' with columns student, course,
+        assignment_name, score, max_score) or JSON ({'rows': [...]}). Returns per-row errors.
+        """
+        rows = ManualGradeImportService.iter_rows(request)
+        try:
+            # All or nothing when the file itself cannot be read
+            with transaction.atomic():
+                summary = ManualGradeImportService.import_rows(request.user, rows)
+        except (UnicodeDecodeError, csv.Error) as exc:
+            return Response({'detail': f'The file could not be parsed as a UTF-8 CSV: {exc}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response(summary)
     
     def get_queryset(self):
         # Teachers only see grades for their own courses/students
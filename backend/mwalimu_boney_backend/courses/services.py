@@ -1,77 +1,144 @@
 # FILE: courses/services.py
 
-from django.db.models import Count, Q
-from courses.models import Course, Lesson, Quiz # Assuming Lesson is related to Course
-from progress.models import LessonCompletion, QuizAttempt # To check progress
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, DecimalField, F, FloatField, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Cast, Coalesce, Least, Round
+from django.utils import timezone
+from courses.models import Course
+from progress.models import CourseProgress, LessonCompletion # To check progress
 
 class CourseService:
     """
     Service layer containing business logic related to course state and progress calculation.
+
+    Completion percentage is counter based: CourseProgress.lessons_completed is bumped
+    with F() when a lesson is newly completed and divided by the course's lesson count,
+    which is cached per course (with the other completion requirement counts). When
+    lessons are added or removed, courses.signals drops that count and, once the change
+    commits, recomputes the stored percentages of the course. The
+    reconcile_course_progress command repairs any drift in bulk.
     """
 
+    CONTENT_COUNT_TIMEOUT = getattr(settings, 'COURSE_CONTENT_COUNT_CACHE_TIMEOUT', 60 * 60 * 24)
+
     @staticmethod
-    def is_course_complete(user, course_id):
+    def requirements_key(course_id):
+        return f'courses:requirements:{course_id}'
+
+    @classmethod
+    def requirement_counts(cls, course_id):
+        """{'lessons': n} for the course (cached), or None if the course does not exist."""
+        key = cls.requirements_key(course_id)
+        counts = cache.get(key)
+        if counts is None:
+            lessons = (
+                Course.objects.filter(pk=course_id)
+                .annotate(n_lessons=Count('lessons')).values_list('n_lessons', flat=True).first()
+            )
+            # Cache a missing course as an empty dict so it is not re-queried
+            counts = {} if lessons is None else {'lessons': lessons}
+            cache.set(key, counts, cls.CONTENT_COUNT_TIMEOUT)
+        return counts or None
+
+    @classmethod
+    def lesson_count(cls, course_id):
+        """Number of lessons in the course (cached)."""
+        counts = cls.requirement_counts(course_id)
+        return counts['lessons'] if counts else 0
+
+    @classmethod
+    def invalidate_content_counts(cls, course_id):
+        cache.delete(cls.requirements_key(course_id))
+
+    @staticmethod
+    def percentage(completed, total):
+        """O(1) completion percentage, capped at 100 in case the counter ran ahead of a deletion."""
+        if not total:
+            return Decimal('0.00')
+        return min(Decimal(100), Decimal(completed) * 100 / total).quantize(Decimal('0.01'))
+
+    @staticmethod
+    def percentage_expression(completed, total):
+        """SQL counterpart of percentage() for UPDATE statements; completed is an expression."""
+        output_field = DecimalField(max_digits=5, decimal_places=2)
+        if not total:
+            return Value(Decimal('0.00'), output_field=output_field)
+        # Integer columns divide as integers on SQLite (and PostgreSQL); cast first.
+        # FloatField, because CAST(... AS decimal) keeps integer affinity on SQLite.
+        return Least(
+            Round(Cast(completed, FloatField()) * 100 / total, 2),
+            Value(Decimal(100)),
+            output_field=output_field,
+        )
+
+    @classmethod
+    def record_lesson_completed(cls, course_progress):
         """
-        Determines if a student has met all completion requirements for a given course.
-        
-        A typical completion requirement includes:
-        1. Completion of all required lessons.
-        2. Passing all mandatory quizzes.
+        Counts one newly completed lesson against the progress row in a single UPDATE and
+        refreshes the stored percentage from the cached lesson count.
         """
-        try:
-            course = Course.objects.get(id=course_id)
-        except Course.DoesNotExist:
+        cls.record_lessons_completed(course_progress.pk, course_progress.course_id, 1)
+
+    @classmethod
+    def record_lessons_completed(cls, course_progress_id, course_id, count):
+        completed = F('lessons_completed') + count
+        CourseProgress.objects.filter(pk=course_progress_id).update(
+            lessons_completed=completed,
+            completion_percentage=cls.percentage_expression(completed, cls.lesson_count(course_id)),
+            last_activity=timezone.now(),
+        )
+
+    @classmethod
+    def refresh_course_percentages(cls, course_id, recount=False):
+        """
+        Recomputes completion_percentage of every progress row in the course with one
+        UPDATE after its lesson count changed. recount=True first recounts
+        lessons_completed, for deletions that took completed lessons with them.
+        """
+        cls.invalidate_content_counts(course_id)
+        progresses = CourseProgress.objects.filter(course_id=course_id)
+        if recount:
+            completed = (
+                LessonCompletion.objects
+                .filter(student_id=OuterRef('student_id'), lesson__course_id=course_id, is_completed=True)
+                .order_by().values('student_id')
+                .annotate(n=Count('id')).values('n')
+            )
+            progresses.update(lessons_completed=Coalesce(Subquery(completed, output_field=IntegerField()), 0))
+        progresses.update(
+            completion_percentage=cls.percentage_expression(F('lessons_completed'), cls.lesson_count(course_id))
+        )
+
+    @classmethod
+    def is_course_complete(cls, user, course_id):
+        """
+        Determines if a student has met all completion requirements for a given course:
+        every lesson of the course completed.
+
+        Requirement counts come from the cache, so this is a single conditional-count
+        query however large the course is. (Course quizzes are not linked to
+        progress.QuizAttempt, which records attempts on assessment questions, so they
+        are not a requirement yet.)
+        """
+        requirements = cls.requirement_counts(course_id)
+        if requirements is None:
             return False
 
-        # --- 1. Check Mandatory Lesson Completion ---
-        # Assuming lessons are defined under the course
-        required_lessons = Lesson.objects.filter(course=course)
-        total_lessons = required_lessons.count()
-        
-        if total_lessons == 0:
-            # If a course has no lessons, completion depends on quizzes/exams
-            pass
-        else:
-            completed_lessons_count = LessonCompletion.objects.filter(
-                student=user,
-                lesson__in=required_lessons,
-                is_completed=True
-            ).count()
-
-            # If the student hasn't completed every lesson, the course is NOT complete
-            if completed_lessons_count < total_lessons:
-                return False
-
-        # --- 2. Check Mandatory Quiz Completion (Example) ---
-        # NOTE: You need to define which quizzes are 'mandatory' in your 'quizzes' app.
-        # This example assumes mandatory quizzes are linked to the course and must be passed.
-        mandatory_quizzes = Quiz.objects.filter(
-            course=course,
-            is_mandatory=True # Assumes this field exists on the Quiz model
+        completed = LessonCompletion.objects.filter(student=user, lesson__course_id=course_id).aggregate(
+            lessons=Count('id', filter=Q(is_completed=True)),
         )
-        
-        for quiz in mandatory_quizzes:
-            # Check for at least one passing attempt
-            passed_attempts = QuizAttempt.objects.filter(
-                student=user,
-                quiz=quiz,
-                is_passed=True
-            ).exists()
-            
-            if not passed_attempts:
-                return False
-
-        # If all lesson and quiz checks passed, the course is complete
-        return True
+        return completed['lessons'] >= requirements['lessons']
 
     @staticmethod
     def calculate_completion_percentage(user, course_id):
         """
-        Calculates the percentage of course content completed (e.g., lessons + quizzes).
+        Percentage of the course's lessons the student has completed, from the
+        progress counter and the cached lesson count.
         """
-        # NOTE: Implementation depends heavily on how content is weighted.
-        # Simple example: (Completed Lessons + Passed Quizzes) / (Total Lessons + Total Quizzes)
-        
-        # Placeholder for complex calculation service:
-        # Should update CourseProgress.completion_percentage
-        return 0.00 # Placeholder
\ No newline at end of file
+        completed = (
+            CourseProgress.objects.filter(student=user, course_id=course_id)
+            .values_list('lessons_completed', flat=True).first()
+        )
+        return CourseService.percentage(completed or 0, CourseService.lesson_count(course_id))
@@ -0,0 +1,24 @@
+# courses/signals.py
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import Lesson
+from .services import CourseService
+
+
+@receiver(post_save, sender=Lesson)
+def invalidate_counts_on_lesson_created(sender, instance, created, **kwargs):
+    """A new lesson changes the denominator of every progress percentage in the course."""
+    if created:
+        course_id = instance.course_id
+        CourseService.invalidate_content_counts(course_id)
+        transaction.on_commit(lambda: CourseService.refresh_course_percentages(course_id))
+
+
+@receiver(post_delete, sender=Lesson)
+def invalidate_counts_on_lesson_deleted(sender, instance, **kwargs):
+    # Completions of the lesson are deleted with it, so the counters are recounted too
+    course_id = instance.course_id
+    CourseService.invalidate_content_counts(course_id)
+    transaction.on_commit(lambda: CourseService.refresh_course_percentages(course_id, recount=True))
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class ExamsConfig(AppConfig):
     name = "exams"
+
+    def ready(self):
+        # Registers the eligibility cache invalidation receivers
+        import exams.signals
@@ -0,0 +1,84 @@
+# FILE: exams/consumers.py
+import asyncio
+import json
+import logging
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+from .models import Exam
+from .services import ProctoringDashboardService
+
+logger = logging.getLogger(__name__)
+
+
+class ProctoringDashboardConsumer(AsyncWebsocketConsumer):
+    """
+    Read-only live view of one exam for invigilators: active and disqualified attempts,
+    violations per type and attempts close to the violation limit. Connections join the
+    exam's channel-layer group, which ProctoringDashboardService notifies from any
+    process; a frame is pushed at most once per tick and only when the aggregates changed.
+    """
+
+    async def connect(self):
+        user = self.scope["user"]
+        if not user.is_authenticated:
+            await self.close()
+            return
+
+        self.exam_id = int(self.scope['url_route']['kwargs']['exam_id'])
+        if not await self.can_watch(user, self.exam_id):
+            await self.close()
+            return
+
+        self.group_name = ProctoringDashboardService.group_name(self.exam_id)
+        self.sent_revision = None
+        self.pusher = None
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        await database_sync_to_async(ProctoringDashboardService.ensure_seeded)(self.exam_id)
+        await self.push_frame(force=True)
+
+    async def disconnect(self, close_code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+        if getattr(self, 'pusher', None) is not None:
+            self.pusher.cancel()
+
+    async def dashboard_update(self, event):
+        # While a push loop runs it picks this change up on its next check
+        if self.pusher is None or self.pusher.done():
+            self.pusher = asyncio.get_running_loop().create_task(self.push_while_changing())
+
+    async def push_while_changing(self):
+        """Sends a frame now and again every tick for as long as the revision keeps moving."""
+        try:
+            while await self.push_frame():
+                await asyncio.sleep(ProctoringDashboardService.TICK_SECONDS)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Proctoring dashboard push failed; retrying on the next update.")
+
+    async def push_frame(self, force=False):
+        """Sends the exam's frame if its revision moved since the last one. Returns whether it sent."""
+        if not force:
+            revision = await database_sync_to_async(ProctoringDashboardService.revision)(self.exam_id)
+            if revision == self.sent_revision:
+                return False
+        frame = await database_sync_to_async(ProctoringDashboardService.snapshot)(self.exam_id)
+        self.sent_revision = frame['revision']
+        await self.send(text_data=json.dumps(frame))
+        return True
+
+    async def receive(self, text_data=None, bytes_data=None):
+        # Nothing to receive; the dashboard is push-only
+        pass
+
+    @database_sync_to_async
+    def can_watch(self, user, exam_id):
+        """Staff of the exam's school; students never see the dashboard."""
+        if user.is_superuser:
+            return Exam.objects.filter(pk=exam_id).exists()
+        profile = getattr(user, 'profile', None)
+        if profile is None or profile.role == 'STUDENT' or profile.school_id is None:
+            return False
+        return Exam.objects.filter(pk=exam_id, school_id=profile.school_id).exists()
@@ -0,0 +1,31 @@
+# Generated by Django 6.0 on 2026-10-18 14:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("exams", "0001_initial"),
+        ("school", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AssessmentNumberSequence",
+            fields=[
+                (
+                    "school",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="assessment_sequence",
+                        serialize=False,
+                        to="school.school",
+                    ),
+                ),
+                ("next_value", models.PositiveBigIntegerField(default=1)),
+            ],
+        ),
+    ]
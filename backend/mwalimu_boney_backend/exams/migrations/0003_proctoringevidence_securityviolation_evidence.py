@@ -0,0 +1,38 @@
+# Generated by Django 6.0 on 2026-10-18 15:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("exams", "0002_assessmentnumbersequence"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProctoringEvidence",
+            fields=[
+                ("sha256", models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ("raw_upload", models.FileField(blank=True, null=True, upload_to="proctoring_evidence/incoming/")),
+                ("image", models.ImageField(blank=True, null=True, upload_to="proctoring_evidence/full/")),
+                ("thumbnail", models.ImageField(blank=True, null=True, upload_to="proctoring_evidence/thumbs/")),
+                ("width", models.PositiveIntegerField(blank=True, null=True)),
+                ("height", models.PositiveIntegerField(blank=True, null=True)),
+                ("is_processed", models.BooleanField(default=False)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="securityviolation",
+            name="evidence",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="violations",
+                to="exams.proctoringevidence",
+            ),
+        ),
+    ]
@@ -42,6 +42,19 @@ class Exam(models.Model):
         return f"{self.title} ({self.school.name})"
 
 
+class AssessmentNumberSequence(models.Model):
+    """
+    Per-school counter behind assessment numbers. Worker processes reserve blocks of
+    values from it (see exams.services.AssessmentNumberAllocator), so the row is
+    touched once per block rather than once per registration.
+    """
+    school = models.OneToOneField(School, on_delete=models.CASCADE, primary_key=True, related_name='assessment_sequence')
+    next_value = models.PositiveBigIntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.school_id}: next {self.next_value}"
+
+
 # (Continuation)
 
 REGISTRATION_STATUS_CHOICES = (
@@ -118,6 +131,18 @@ class ExamAttempt(models.Model):
         # if the exam is configured to allow it (e.g., practice quizzes)
         ordering = ['-start_time']
         
+    def save(self, *args, **kwargs):
+        # Claim the close (submit, expiry, disqualification) with a conditional UPDATE: of
+        # several concurrent closers exactly one sees a row change, and only that save
+        # takes the attempt off the proctoring dashboard in the signals.
+        self._closed_now = False
+        if self.status != 'IN_PROGRESS' and not getattr(self, '_was_closed', False):
+            self._closed_now = self._state.adding or bool(
+                ExamAttempt.objects.filter(pk=self.pk, status='IN_PROGRESS').update(status=self.status)
+            )
+        super().save(*args, **kwargs)
+        self._was_closed = self.status != 'IN_PROGRESS'
+
     def __str__(self):
         return f"{self.student.username}'s attempt on {self.exam.title}"
     
@@ -130,6 +155,25 @@ VIOLATION_TYPE_CHOICES = (
     ('THIRD_PARTY_ACCESS', 'Unauthorized Third Party Access'),
 )
 
+class ProctoringEvidence(models.Model):
+    """
+    Content-addressed proctoring capture. Identical frames share one row (keyed by the
+    SHA-256 of the uploaded bytes); a worker turns the raw upload into a downscaled
+    WebP plus a small thumbnail and then deletes the original.
+    """
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    raw_upload = models.FileField(upload_to='proctoring_evidence/incoming/', null=True, blank=True)
+    image = models.ImageField(upload_to='proctoring_evidence/full/', null=True, blank=True)
+    thumbnail = models.ImageField(upload_to='proctoring_evidence/thumbs/', null=True, blank=True)
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    is_processed = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.sha256[:12]
+
+
 class SecurityViolation(models.Model):
     """Logs details of a security violation during an exam attempt."""
     
@@ -144,6 +188,10 @@ class SecurityViolation(models.Model):
     
     # Stores image captured during the facial mismatch/proctoring violation
     proctoring_photo = models.ImageField(upload_to='proctoring_evidence/', null=True, blank=True)
+    # Deduplicated, downscaled capture (preferred over proctoring_photo for new violations)
+    evidence = models.ForeignKey(
+        ProctoringEvidence, on_delete=models.SET_NULL, null=True, blank=True, related_name='violations'
+    )
     
     is_reviewed = models.BooleanField(default=False)
 
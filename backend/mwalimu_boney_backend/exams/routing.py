@@ -0,0 +1,9 @@
+# FILE: exams/routing.py
+from django.urls import re_path
+
+from . import consumers
+
+websocket_urlpatterns = [
+    # Live proctoring aggregates for invigilators; see ProctoringDashboardConsumer
+    re_path(r'ws/exams/(?P<exam_id>\d+)/dashboard/$', consumers.ProctoringDashboardConsumer.as_asgi()),
+]
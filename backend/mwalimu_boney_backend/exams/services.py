@@ -0,0 +1,696 @@
+# FILE: exams/services.py
+
+import csv
+import hashlib
+import io
+import logging
+import threading
+import time
+from collections import Counter, namedtuple
+from datetime import timedelta
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from PIL import Image, ImageOps
+from school.services.geofence import GeofenceService
+from users.models import UserProfile
+from .models import (
+    AssessmentNumberSequence, Exam, ExamAttempt, ExamRegistration, ProctoringEvidence, SecurityViolation,
+    VIOLATION_TYPE_CHOICES,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class EligibilityService:
+    """
+    Eligibility snapshot used by ExamStartView.
+
+    Profile (assessment number, whitelist), registration status and exam window are
+    read with one query and cached per (student, exam). Cache keys embed a student and
+    an exam generation counter; signals bump the counters whenever a registration,
+    profile or exam changes, so stale snapshots are simply never read again.
+
+    The student's latest attempt (id and status) is cached next to the snapshot so a
+    repeated start resumes it without a query; it is dropped whenever the attempt is
+    submitted, disqualified or deleted.
+    """
+
+    CACHE_TIMEOUT = getattr(settings, 'EXAM_ELIGIBILITY_CACHE_TIMEOUT', 60 * 10)
+
+    @staticmethod
+    def _generation_key(kind, object_id):
+        return f'exams:eligibility:gen:{kind}:{object_id}'
+
+    @classmethod
+    def bump_generation(cls, kind, object_id):
+        """Invalidates every snapshot of a student ('student') or an exam ('exam')."""
+        key = cls._generation_key(kind, object_id)
+        # Seeded with the clock so a counter lost from the cache never repeats an old value
+        if not cache.add(key, time.time_ns(), None):
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, time.time_ns(), None)
+
+    @classmethod
+    def _cache_key(cls, student_id, exam_id):
+        keys = [cls._generation_key('student', student_id), cls._generation_key('exam', exam_id)]
+        generations = cache.get_many(keys)
+        for key in keys:
+            if key not in generations:
+                cache.add(key, time.time_ns(), None)
+                generations[key] = cache.get(key)
+        return f'exams:eligibility:{exam_id}:{student_id}:g{generations[keys[0]]}.{generations[keys[1]]}'
+
+    @staticmethod
+    def _load(student_id, exam_id):
+        """Single query: the profile row annotated with registration status and exam window."""
+        exam = Exam.objects.filter(pk=exam_id)
+        row = (
+            UserProfile.objects.filter(user_id=student_id)
+            .annotate(
+                registration_status=Subquery(
+                    ExamRegistration.objects.filter(student_id=OuterRef('user_id'), exam_id=exam_id).values('status')[:1]
+                ),
+                exam_title=Subquery(exam.values('title')[:1]),
+                exam_start=Subquery(exam.values('start_time')[:1]),
+                exam_end=Subquery(exam.values('end_time')[:1]),
+            )
+            .values('assessment_number', 'is_whitelisted', 'registration_status', 'exam_title', 'exam_start', 'exam_end')
+            .first()
+        )
+        # Students without a profile can never start an exam
+        return row or {
+            'assessment_number': None, 'is_whitelisted': False, 'registration_status': None,
+            'exam_title': None, 'exam_start': None, 'exam_end': None,
+        }
+
+    @classmethod
+    def get_snapshot(cls, student_id, exam_id):
+        key = cls._cache_key(student_id, exam_id)
+        snapshot = cache.get(key)
+        if snapshot is None:
+            snapshot = cls._load(student_id, exam_id)
+            cache.set(key, snapshot, cls.CACHE_TIMEOUT)
+        return snapshot
+
+    @staticmethod
+    def _attempt_key(student_id, exam_id):
+        return f'exams:eligibility:attempt:{exam_id}:{student_id}'
+
+    @classmethod
+    def get_latest_attempt(cls, student_id, exam_id):
+        """{'id', 'status'} of the student's latest attempt on the exam, or None."""
+        key = cls._attempt_key(student_id, exam_id)
+        latest = cache.get(key)
+        if latest is None:
+            latest = ExamAttempt.objects.filter(student_id=student_id, exam_id=exam_id).values('id', 'status').first()
+            if latest is not None:
+                cache.set(key, latest, cls.CACHE_TIMEOUT)
+        return latest
+
+    @classmethod
+    def remember_attempt(cls, student_id, exam_id, attempt_id, attempt_status='IN_PROGRESS'):
+        cache.set(cls._attempt_key(student_id, exam_id), {'id': attempt_id, 'status': attempt_status}, cls.CACHE_TIMEOUT)
+
+    @classmethod
+    def forget_attempt(cls, student_id, exam_id):
+        cache.delete(cls._attempt_key(student_id, exam_id))
+
+
+def luhn_check_digit(digits):
+    """Luhn (mod 10) check digit for a string of digits."""
+    total = 0
+    for position, char in enumerate(reversed(digits)):
+        value = int(char)
+        if position % 2 == 0:
+            value *= 2
+            if value > 9:
+                value -= 9
+        total += value
+    return str((10 - total % 10) % 10)
+
+
+class AssessmentNumberAllocator:
+    """
+    Collision-free assessment numbers: AS-{school}-{sequence}{check digit}.
+
+    Each worker process reserves a block of BLOCK_SIZE values from the school's
+    AssessmentNumberSequence row in one short transaction and hands them out from
+    memory, so uniqueness comes from the sequence (no retry loop) and the database
+    sees one write per block instead of one per registration. Allocate outside any
+    outer transaction: a rolled-back reservation would hand the same block out twice.
+    """
+
+    BLOCK_SIZE = getattr(settings, 'ASSESSMENT_NUMBER_BLOCK_SIZE', 100)
+    _blocks = {}  # school_id -> [next_value, end_value)
+    _lock = threading.Lock()
+
+    @classmethod
+    def _reserve_block(cls, school_id):
+        AssessmentNumberSequence.objects.bulk_create(
+            [AssessmentNumberSequence(school_id=school_id)], ignore_conflicts=True
+        )
+        with transaction.atomic():
+            # Increment first: the UPDATE takes the row's write lock on every backend
+            # (SQLite ignores SELECT ... FOR UPDATE), so the read-back below sees only
+            # this worker's reservation
+            AssessmentNumberSequence.objects.filter(school_id=school_id).update(
+                next_value=F('next_value') + cls.BLOCK_SIZE
+            )
+            end = (
+                AssessmentNumberSequence.objects
+                .values_list('next_value', flat=True).get(school_id=school_id)
+            )
+        return [end - cls.BLOCK_SIZE, end]
+
+    @staticmethod
+    def format(school_id, value):
+        body = f'{school_id}{value:06d}'
+        return f'AS-{school_id}-{value:06d}{luhn_check_digit(body)}'
+
+    @staticmethod
+    def is_valid(number):
+        """Verifies the check digit of an assessment number."""
+        try:
+            _, school_id, sequence = number.split('-')
+        except (AttributeError, ValueError):
+            return False
+        if not (school_id + sequence).isdigit() or len(sequence) < 2:
+            return False
+        return luhn_check_digit(school_id + sequence[:-1]) == sequence[-1]
+
+    @classmethod
+    def allocate(cls, school_id):
+        with cls._lock:
+            block = cls._blocks.get(school_id)
+            if block is None or block[0] >= block[1]:
+                block = cls._blocks[school_id] = cls._reserve_block(school_id)
+            value = block[0]
+            block[0] += 1
+        return cls.format(school_id, value)
+
+    @classmethod
+    def assign(cls, profile):
+        """
+        Gives the profile an assessment number unless it already has one. The write is
+        conditional, so concurrent registrations by the same student keep the first
+        number (the other one is simply skipped). Returns the profile's number.
+        """
+        number = cls.allocate(profile.school_id)
+        updated = UserProfile.objects.filter(pk=profile.pk, assessment_number__isnull=True).update(
+            assessment_number=number
+        )
+        if not updated:
+            number = UserProfile.objects.values_list('assessment_number', flat=True).get(pk=profile.pk)
+        profile.assessment_number = number
+        # update() skips post_save, so invalidate the eligibility snapshots here
+        EligibilityService.bump_generation('student', profile.user_id)
+        return number
+
+
+class ShortlistService:
+    """
+    Bulk shortlisting/rejection of ExamRegistration rows for one exam.
+
+    Candidates are selected by registration id, by assessment number (e.g. from an
+    uploaded CSV) or by a filter such as status and class. The change is one UPDATE
+    statement scoped to the exam, and the exam's eligibility snapshots are invalidated
+    once since queryset updates do not send post_save.
+    """
+
+    STATUSES = ('SHORTLISTED', 'REJECTED', 'REGISTERED')
+
+    @staticmethod
+    def read_csv(upload):
+        """Returns (registration_ids, assessment_numbers) from a CSV with either column."""
+        registration_ids, assessment_numbers = [], []
+        for row in csv.DictReader(io.TextIOWrapper(upload.file, encoding='utf-8-sig')):
+            if (row.get('registration_id') or '').strip().isdigit():
+                registration_ids.append(int(row['registration_id']))
+            elif (row.get('assessment_number') or '').strip():
+                assessment_numbers.append(row['assessment_number'].strip())
+        return registration_ids, assessment_numbers
+
+    @classmethod
+    def update_status(cls, exam_id, new_status, reason='', registration_ids=None,
+                      assessment_numbers=None, filters=None):
+        """Applies the status to the selected registrations. Returns the counts sent to the client."""
+        registrations = ExamRegistration.objects.filter(exam_id=exam_id)
+        requested = None
+
+        if registration_ids is not None or assessment_numbers is not None:
+            selector = Q()
+            if registration_ids:
+                selector |= Q(pk__in=registration_ids)
+            if assessment_numbers:
+                selector |= Q(student__profile__assessment_number__in=assessment_numbers)
+            registrations = registrations.filter(selector) if selector else registrations.none()
+            requested = len(set(registration_ids or [])) + len(set(assessment_numbers or []))
+        else:
+            filters = filters or {}
+            if filters.get('status'):
+                registrations = registrations.filter(status=filters['status'])
+            if filters.get('class_id'):
+                registrations = registrations.filter(student__profile__current_class_id=filters['class_id'])
+
+        matched = registrations.count()
+        updated = registrations.exclude(status=new_status).update(status=new_status, shortlist_reason=reason)
+        if updated:
+            EligibilityService.bump_generation('exam', exam_id)
+
+        counts = {'status': new_status, 'matched': matched, 'updated': updated, 'unchanged': matched - updated}
+        if requested is not None:
+            counts['not_found'] = max(0, requested - matched)
+        return counts
+
+
+# Cached facts about an ExamAttempt needed on every telemetry batch
+AttemptMeta = namedtuple('AttemptMeta', ['student_id', 'exam_id', 'max_allowed', 'school_id', 'enforce_location'])
+
+
+class ViolationIngestService:
+    """
+    Batched proctoring telemetry for one ExamAttempt.
+
+    Bursts of the same violation type within DEDUPE_SECONDS collapse into one row
+    (also across batches, via the last accepted time per type in the cache). Accepted
+    events are inserted with one bulk_create, total_violations is bumped with F() and
+    the attempt is disqualified by a conditional UPDATE once it exceeds the exam's
+    max_allowed_violations, so the attempt row is never read back per event. On exams
+    that enforce location checks, reported positions are tested against the school's
+    geofence in one vectorized call and positions outside it add a LOCATION_DRIFT event.
+    """
+
+    DEDUPE_SECONDS = getattr(settings, 'VIOLATION_DEDUPE_SECONDS', 5)
+    META_TIMEOUT = 60 * 60 * 6
+    VIOLATION_TYPES = {choice for choice, _ in VIOLATION_TYPE_CHOICES}
+
+    @staticmethod
+    def _last_seen_key(attempt_id, violation_type):
+        return f'exams:violations:last:{attempt_id}:{violation_type}'
+
+    @classmethod
+    def attempt_meta(cls, attempt_id):
+        """AttemptMeta (student, exam, violation limit, fence) of the attempt, cached; None if missing."""
+        key = f'exams:violations:meta:v2:{attempt_id}'
+        meta = cache.get(key)
+        if meta is None:
+            row = (
+                ExamAttempt.objects.filter(pk=attempt_id)
+                .values_list('student_id', 'exam_id', 'exam__max_allowed_violations',
+                             'exam__school_id', 'exam__enforce_location_check').first()
+            )
+            if row is None:
+                return None
+            meta = AttemptMeta(*row)
+            cache.set(key, meta, cls.META_TIMEOUT)
+        return meta
+
+    @classmethod
+    def parse_events(cls, raw_events):
+        """Validates raw event dicts. Returns (events, errors) with events sorted by time."""
+        now = timezone.now()
+        events, errors = [], []
+        for index, raw in enumerate(raw_events):
+            raw = raw if isinstance(raw, dict) else {}
+            violation_type = raw.get('violation_type')
+            if violation_type not in cls.VIOLATION_TYPES:
+                errors.append({'index': index, 'detail': 'Unknown violation_type.'})
+                continue
+            try:
+                occurred_at = parse_datetime(str(raw.get('occurred_at') or '')) or now
+                latitude, longitude = (
+                    None if raw.get(field) is None else round(float(raw[field]), 6)
+                    for field in ('latitude', 'longitude')
+                )
+            except (TypeError, ValueError):
+                errors.append({'index': index, 'detail': 'Invalid occurred_at or coordinates.'})
+                continue
+            if timezone.is_naive(occurred_at):
+                occurred_at = timezone.make_aware(occurred_at)
+            events.append({
+                'violation_type': violation_type,
+                # Client clocks may run ahead; never accept timestamps from the future
+                'occurred_at': min(occurred_at, now),
+                'latitude': latitude,
+                'longitude': longitude,
+            })
+        events.sort(key=lambda event: event['occurred_at'])
+        return events, errors
+
+    @classmethod
+    def dedupe(cls, attempt_id, events):
+        """Drops events that follow an accepted event of the same type within the window."""
+        window = timedelta(seconds=cls.DEDUPE_SECONDS)
+        types = {event['violation_type'] for event in events}
+        keys = {t: cls._last_seen_key(attempt_id, t) for t in types}
+        stored = cache.get_many(keys.values())
+        last_seen = {t: stored.get(key) for t, key in keys.items()}
+
+        accepted = []
+        for event in events:
+            previous = last_seen[event['violation_type']]
+            if previous is not None and event['occurred_at'] - previous < window:
+                continue
+            last_seen[event['violation_type']] = event['occurred_at']
+            accepted.append(event)
+
+        cache.set_many(
+            {keys[t]: seen for t, seen in last_seen.items() if seen is not None},
+            cls.DEDUPE_SECONDS * 10,
+        )
+        return accepted
+
+    @staticmethod
+    def flag_fence_breaches(meta, events):
+        """
+        Adds a LOCATION_DRIFT event for every positioned event reported outside the
+        school's geofence. Returns (events, breaches); unchanged when the exam does not
+        enforce location checks.
+        """
+        positioned = [
+            event for event in events
+            if event['latitude'] is not None and event['longitude'] is not None
+        ]
+        if not meta.enforce_location or not positioned:
+            return events, 0
+
+        inside, _ = GeofenceService.check_many(
+            meta.school_id, [event['latitude'] for event in positioned], [event['longitude'] for event in positioned]
+        )
+        outside = [event for event, flag in zip(positioned, inside) if not flag]
+        drift = [{**event, 'violation_type': 'LOCATION_DRIFT'} for event in outside if event['violation_type'] != 'LOCATION_DRIFT']
+        if drift:
+            events = sorted(events + drift, key=lambda event: event['occurred_at'])
+        return events, len(outside)
+
+    @classmethod
+    def ingest(cls, attempt_id, meta, events):
+        """
+        Stores a batch for an attempt known to belong to the caller. Returns a summary,
+        or None when the attempt is no longer in progress.
+        """
+        received = len(events)
+        events, breaches = cls.flag_fence_breaches(meta, events)
+        accepted = cls.dedupe(attempt_id, events)
+        summary = {'received': received, 'accepted': len(accepted), 'duplicates': len(events) - len(accepted),
+                   'outside_fence': breaches, 'disqualified': False}
+        if not accepted:
+            return summary
+
+        with transaction.atomic():
+            in_progress = ExamAttempt.objects.filter(pk=attempt_id, status='IN_PROGRESS').update(
+                total_violations=F('total_violations') + len(accepted)
+            )
+            if not in_progress:
+                return None
+
+            SecurityViolation.objects.bulk_create([
+                SecurityViolation(
+                    attempt_id=attempt_id,
+                    violation_type=event['violation_type'],
+                    latitude=event['latitude'],
+                    longitude=event['longitude'],
+                    evidence_id=event.get('evidence_id'),
+                )
+                for event in accepted
+            ])
+
+            summary['disqualified'] = bool(
+                ExamAttempt.objects.filter(
+                    pk=attempt_id, status='IN_PROGRESS', total_violations__gt=meta.max_allowed
+                ).update(status='DISQUALIFIED', end_time=timezone.now())
+            )
+
+        counts = Counter(event['violation_type'] for event in accepted)
+        transaction.on_commit(lambda: ProctoringDashboardService.record_violations(
+            meta.exam_id, attempt_id, meta.max_allowed, counts, summary['disqualified']
+        ))
+        if summary['disqualified']:
+            # update() skips post_save; the cached attempt must not let the student resume
+            transaction.on_commit(lambda: EligibilityService.forget_attempt(meta.student_id, meta.exam_id))
+        return summary
+
+
+class ProctoringEvidenceService:
+    """
+    Content-addressed store for proctoring captures.
+
+    The request checks the size, declared type and image header, hashes the upload
+    (streamed in chunks) and, for frames not seen before, parks the raw bytes and
+    queues exams.tasks.process_proctoring_evidence once the request commits; frames
+    still waiting for a worker are queued again. The worker downscales to MAX_PIXELS
+    on the long edge as WebP and renders a thumbnail, so identical frames cost one file
+    and large captures never stay on disk.
+    """
+
+    MAX_PIXELS = getattr(settings, 'PROCTORING_EVIDENCE_MAX_PIXELS', 1280)
+    THUMBNAIL_PIXELS = getattr(settings, 'PROCTORING_THUMBNAIL_PIXELS', 160)
+    QUALITY = getattr(settings, 'PROCTORING_EVIDENCE_QUALITY', 70)
+    MAX_UPLOAD_BYTES = getattr(settings, 'PROCTORING_EVIDENCE_MAX_UPLOAD_BYTES', 10 * 1024 * 1024)
+    CONTENT_TYPES = getattr(settings, 'PROCTORING_EVIDENCE_CONTENT_TYPES', ('image/jpeg', 'image/png', 'image/webp'))
+    # Pillow format names matching CONTENT_TYPES
+    FORMATS = {'JPEG', 'PNG', 'WEBP'}
+
+    @classmethod
+    def validate_upload(cls, upload):
+        """Returns an error message for uploads that must not be stored, else None."""
+        if upload.size > cls.MAX_UPLOAD_BYTES:
+            return f"photo must be at most {cls.MAX_UPLOAD_BYTES // (1024 * 1024)} MB."
+        if upload.content_type not in cls.CONTENT_TYPES:
+            return "photo must be a JPEG, PNG or WebP image."
+        try:
+            # Reads the header only; the pixels are decoded by the worker
+            image_format = Image.open(upload).format
+        except (OSError, Image.DecompressionBombError):
+            image_format = None
+        finally:
+            upload.seek(0)
+        if image_format not in cls.FORMATS:
+            return "photo must be a JPEG, PNG or WebP image."
+        return None
+
+    @staticmethod
+    def digest(upload):
+        sha = hashlib.sha256()
+        for chunk in upload.chunks():
+            sha.update(chunk)
+        upload.seek(0)
+        return sha.hexdigest()
+
+    @classmethod
+    def store_upload(cls, upload):
+        """Returns the ProctoringEvidence for the upload, queuing processing for new frames."""
+        from .tasks import process_proctoring_evidence
+
+        sha256 = cls.digest(upload)
+        evidence, created = ProctoringEvidence.objects.get_or_create(sha256=sha256)
+        if not evidence.is_processed:
+            if not evidence.raw_upload:
+                # New frame, or an earlier request failed before the bytes were parked
+                evidence.raw_upload.save(sha256, upload, save=True)
+            transaction.on_commit(lambda: process_proctoring_evidence.delay(sha256))
+        return evidence
+
+    @staticmethod
+    def _encode(image, max_pixels, quality):
+        copy = image.copy()
+        copy.thumbnail((max_pixels, max_pixels), Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        copy.save(buffer, format='WEBP', quality=quality, method=4)
+        return copy.size, ContentFile(buffer.getvalue())
+
+    @classmethod
+    def process(cls, sha256):
+        """Worker side: raw upload -> capped WebP + thumbnail; the raw file is deleted."""
+        evidence = ProctoringEvidence.objects.filter(sha256=sha256, is_processed=False).first()
+        if evidence is None or not evidence.raw_upload:
+            return False
+
+        with evidence.raw_upload.open('rb') as raw:
+            image = ImageOps.exif_transpose(Image.open(raw)).convert('RGB')
+
+        (evidence.width, evidence.height), full = cls._encode(image, cls.MAX_PIXELS, cls.QUALITY)
+        _, thumb = cls._encode(image, cls.THUMBNAIL_PIXELS, cls.QUALITY)
+        evidence.image.save(f'{sha256}.webp', full, save=False)
+        evidence.thumbnail.save(f'{sha256}.webp', thumb, save=False)
+        evidence.raw_upload.delete(save=False)
+        evidence.is_processed = True
+        evidence.save()
+        return True
+
+
+class ProctoringDashboardService:
+    """
+    Per-exam invigilator aggregates, shared by every web, websocket and worker process.
+
+    Counters (active and disqualified attempts, violations per type and per attempt)
+    live in the shared cache, are bumped atomically by the write paths (attempt start
+    and close, violation ingest) and are seeded from the database with one pass when
+    missing. Ingest also keeps the set of in-progress attempts within NEAR_MARGIN of the
+    exam's limit, so building a frame reads only the cache. Every update bumps a
+    revision and notifies the exam's channel-layer group at most once per TICK_SECONDS;
+    consumers re-check the revision a tick after each frame, so invigilators get at most
+    one frame per second and still see the last change.
+    """
+
+    TIMEOUT = getattr(settings, 'PROCTORING_DASHBOARD_TIMEOUT', 60 * 60 * 6)
+    TICK_SECONDS = int(getattr(settings, 'PROCTORING_DASHBOARD_TICK_SECONDS', 1))
+    NEAR_MARGIN = getattr(settings, 'PROCTORING_NEAR_THRESHOLD_MARGIN', 1)
+    NEAR_LIMIT = 50
+
+    @staticmethod
+    def _key(exam_id, name):
+        return f'exams:dashboard:{exam_id}:{name}'
+
+    @staticmethod
+    def group_name(exam_id):
+        return f'proctoring_dashboard_{exam_id}'
+
+    @classmethod
+    def _incr(cls, key, delta=1):
+        cache.add(key, 0, cls.TIMEOUT)
+        return cache.incr(key, delta)
+
+    @classmethod
+    def _touch(cls, exam_id):
+        cls._incr(cls._key(exam_id, 'rev'))
+        # Updates within one tick share a notification; the consumers' follow-up check
+        # picks up the ones that were not announced
+        if not cache.add(cls._key(exam_id, 'notified'), 1, cls.TICK_SECONDS):
+            return
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+        try:
+            async_to_sync(channel_layer.group_send)(cls.group_name(exam_id), {'type': 'dashboard.update'})
+        except Exception:
+            # The counters are already updated; invigilators catch up on the next change
+            logger.exception("Could not notify the proctoring dashboard of exam %s.", exam_id)
+
+    @classmethod
+    def revision(cls, exam_id):
+        return cache.get(cls._key(exam_id, 'rev'))
+
+    @classmethod
+    def _attempt_key(cls, exam_id, attempt_id):
+        return cls._key(exam_id, f'attempt:{attempt_id}:violations')
+
+    @classmethod
+    def _update_near(cls, exam_id, add=(), remove=()):
+        """Adds/removes attempt ids in the exam's near-threshold set (rare: on entry and close)."""
+        key = cls._key(exam_id, 'near')
+        members = cache.get(key) or set()
+        if set(add) <= members and not members & set(remove):
+            return
+        lock_key = f'{key}:lock'
+        for _ in range(50):
+            if cache.add(lock_key, 1, 5):
+                break
+            time.sleep(0.01)
+        try:
+            members = cache.get(key) or set()
+            cache.set(key, (members | set(add)) - set(remove), cls.TIMEOUT)
+        finally:
+            cache.delete(lock_key)
+
+    @classmethod
+    def ensure_seeded(cls, exam_id):
+        """Builds the counters from the database if the cache does not hold them."""
+        if cache.get(cls._key(exam_id, 'seeded')):
+            return
+        exam = Exam.objects.filter(pk=exam_id).values('max_allowed_violations').first()
+        if exam is None:
+            return
+
+        statuses = dict(
+            ExamAttempt.objects.filter(exam_id=exam_id).values_list('status').annotate(n=Count('id'))
+        )
+        by_type = dict(
+            SecurityViolation.objects.filter(attempt__exam_id=exam_id)
+            .values_list('violation_type').annotate(n=Count('id'))
+        )
+        flagged = dict(
+            ExamAttempt.objects.filter(exam_id=exam_id, status='IN_PROGRESS', total_violations__gt=0)
+            .values_list('id', 'total_violations')
+        )
+
+        values = {
+            cls._key(exam_id, 'active'): statuses.get('IN_PROGRESS', 0),
+            cls._key(exam_id, 'disqualified'): statuses.get('DISQUALIFIED', 0),
+            cls._key(exam_id, 'near'): {
+                a_id for a_id, n in flagged.items() if n >= exam['max_allowed_violations'] - cls.NEAR_MARGIN
+            },
+            cls._key(exam_id, 'seeded'): 1,
+        }
+        for violation_type in ViolationIngestService.VIOLATION_TYPES:
+            values[cls._key(exam_id, f'type:{violation_type}')] = by_type.get(violation_type, 0)
+        for a_id, n in flagged.items():
+            values[cls._attempt_key(exam_id, a_id)] = n
+        cache.set_many(values, cls.TIMEOUT)
+        cls._touch(exam_id)
+
+    @classmethod
+    def record_attempt_started(cls, exam_id):
+        cls._incr(cls._key(exam_id, 'active'))
+        cls._touch(exam_id)
+
+    @classmethod
+    def record_attempt_closed(cls, exam_id, attempt_id, status):
+        """A submitted, expired or disqualified attempt (closed through ExamAttempt.save())."""
+        cls._incr(cls._key(exam_id, 'active'), -1)
+        if status == 'DISQUALIFIED':
+            cls._incr(cls._key(exam_id, 'disqualified'))
+        cls._update_near(exam_id, remove=[attempt_id])
+        cache.delete(cls._attempt_key(exam_id, attempt_id))
+        cls._touch(exam_id)
+
+    @classmethod
+    def record_violations(cls, exam_id, attempt_id, max_allowed, counts, disqualified):
+        """Applies one ingested batch ({violation_type: n}) of an attempt to the exam's counters."""
+        for violation_type, count in counts.items():
+            cls._incr(cls._key(exam_id, f'type:{violation_type}'), count)
+        total = cls._incr(cls._attempt_key(exam_id, attempt_id), sum(counts.values()))
+        if disqualified:
+            cls._incr(cls._key(exam_id, 'active'), -1)
+            cls._incr(cls._key(exam_id, 'disqualified'))
+            cls._update_near(exam_id, remove=[attempt_id])
+            cache.delete(cls._attempt_key(exam_id, attempt_id))
+        elif total >= max_allowed - cls.NEAR_MARGIN:
+            cls._update_near(exam_id, add=[attempt_id])
+        cls._touch(exam_id)
+
+    @classmethod
+    def near_threshold(cls, exam_id):
+        """In-progress attempts within NEAR_MARGIN of the limit, worst first. Returns (rows, count)."""
+        members = cache.get(cls._key(exam_id, 'near')) or set()
+        keys = {cls._attempt_key(exam_id, a_id): a_id for a_id in members}
+        totals = {keys[key]: n for key, n in cache.get_many(list(keys)).items()}
+        rows = sorted(totals.items(), key=lambda row: (-row[1], row[0]))[:cls.NEAR_LIMIT]
+        return rows, len(members)
+
+    @classmethod
+    def snapshot(cls, exam_id):
+        """The frame sent to invigilators."""
+        type_keys = {t: cls._key(exam_id, f'type:{t}') for t in sorted(ViolationIngestService.VIOLATION_TYPES)}
+        names = ['active', 'disqualified', 'rev']
+        values = cache.get_many([cls._key(exam_id, name) for name in names] + list(type_keys.values()))
+        near, near_count = cls.near_threshold(exam_id)
+        return {
+            'type': 'dashboard',
+            'exam_id': exam_id,
+            'revision': values.get(cls._key(exam_id, 'rev')),
+            'active_attempts': values.get(cls._key(exam_id, 'active'), 0),
+            'disqualified': values.get(cls._key(exam_id, 'disqualified'), 0),
+            'violations_by_type': {t: values.get(key, 0) for t, key in type_keys.items()},
+            'near_threshold': [{'attempt_id': a, 'violations': n} for a, n in near],
+            'near_threshold_count': near_count,
+        }
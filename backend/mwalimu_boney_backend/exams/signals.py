@@ -0,0 +1,50 @@
+# FILE: exams/signals.py
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from users.models import UserProfile
+from .models import Exam, ExamAttempt, ExamRegistration
+from .services import EligibilityService, ProctoringDashboardService
+
+
+@receiver([post_save, post_delete], sender=ExamRegistration)
+def invalidate_registration_eligibility(sender, instance, **kwargs):
+    """Shortlisting/rejection changes what the student may start."""
+    EligibilityService.bump_generation('student', instance.student_id)
+
+
+@receiver(post_save, sender=UserProfile)
+def invalidate_profile_eligibility(sender, instance, **kwargs):
+    """Whitelist or assessment number changes affect every exam of the student."""
+    EligibilityService.bump_generation('student', instance.user_id)
+
+
+@receiver(post_save, sender=Exam)
+def invalidate_exam_eligibility(sender, instance, **kwargs):
+    """Rescheduling an exam changes its start window for every candidate."""
+    EligibilityService.bump_generation('exam', instance.pk)
+
+
+@receiver(post_save, sender=ExamAttempt)
+def count_started_attempt(sender, instance, created, **kwargs):
+    """New attempts show up as active on the invigilator dashboard."""
+    if created:
+        transaction.on_commit(lambda: ProctoringDashboardService.record_attempt_started(instance.exam_id))
+
+
+@receiver(post_save, sender=ExamAttempt)
+def count_closed_attempt(sender, instance, **kwargs):
+    """Submitted, expired or disqualified attempts leave the active count and the near list."""
+    if getattr(instance, '_closed_now', False):
+        exam_id, attempt_id, attempt_status = instance.exam_id, instance.pk, instance.status
+        transaction.on_commit(
+            lambda: ProctoringDashboardService.record_attempt_closed(exam_id, attempt_id, attempt_status)
+        )
+
+
+@receiver([post_save, post_delete], sender=ExamAttempt)
+def forget_cached_attempt(sender, instance, created=False, **kwargs):
+    """A submitted, closed or deleted attempt must not be resumed from the start cache."""
+    if not created:
+        transaction.on_commit(lambda: EligibilityService.forget_attempt(instance.student_id, instance.exam_id))
@@ -0,0 +1,16 @@
+# FILE: exams/tasks.py
+
+import logging
+from celery import shared_task
+from .services import ProctoringEvidenceService
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def process_proctoring_evidence(sha256):
+    """Downscales a freshly uploaded proctoring capture off the request path."""
+    processed = ProctoringEvidenceService.process(sha256)
+    if processed:
+        logger.info("Processed proctoring evidence %s.", sha256[:12])
+    return processed
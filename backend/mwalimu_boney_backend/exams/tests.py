@@ -1,3 +1,325 @@
-from django.test import TestCase
+# FILE: exams/tests.py
 
-# Create your tests here.
+import io
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from PIL import Image
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from school.models import School
+from school.services.geofence import GeofenceService
+from users.models import UserProfile
+from .models import AssessmentNumberSequence, Exam, ExamAttempt, ExamRegistration, ProctoringEvidence, SecurityViolation
+from .services import AssessmentNumberAllocator, ProctoringDashboardService, ProctoringEvidenceService
+
+
+class ExamStartEligibilityTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.school = School.objects.create(name="Ndakaru")
+        now = timezone.now()
+        self.exam = Exam.objects.create(
+            school=self.school, title="KCPE Mock", start_time=now - timedelta(minutes=5), end_time=now + timedelta(hours=2)
+        )
+        self.student = User.objects.create_user(username="candidate", password="password")
+        UserProfile.objects.create(user=self.student, role='STUDENT', school=self.school, assessment_number='AS-1-0001')
+        self.registration = ExamRegistration.objects.create(student=self.student, exam=self.exam, status='SHORTLISTED')
+        self.client.force_authenticate(user=self.student)
+
+    def _start(self):
+        return self.client.post(f'/exams/start/{self.exam.id}/', {'assessment_number': 'AS-1-0001'}, format='json')
+
+    def test_repeated_starts_are_served_from_the_snapshot(self):
+        first = self._start()
+        self.assertEqual(first.status_code, 200)
+        # Eligibility and the open attempt both come from the cache
+        with self.assertNumQueries(0):
+            second = self._start()
+        self.assertEqual(second.data['attempt_id'], first.data['attempt_id'])
+
+    def test_a_finished_attempt_is_not_resumed_from_the_cache(self):
+        attempt = ExamAttempt.objects.get(pk=self._start().data['attempt_id'])
+        with self.captureOnCommitCallbacks(execute=True):
+            attempt.status = 'SUBMITTED'
+            attempt.save()
+
+        response = self._start()
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.data['detail'], "You have already finished this exam.")
+
+    def test_shortlist_and_whitelist_changes_invalidate_the_snapshot(self):
+        self.assertEqual(self._start().status_code, 200)
+
+        self.registration.status = 'REJECTED'
+        self.registration.save()
+        self.assertEqual(self._start().status_code, 403)
+
+        self.registration.status = 'SHORTLISTED'
+        self.registration.save()
+        profile = self.student.profile
+        profile.is_whitelisted = False
+        profile.save()
+        self.assertEqual(self._start().status_code, 403)
+
+    def test_exam_window_is_enforced(self):
+        self.exam.start_time = timezone.now() + timedelta(hours=1)
+        self.exam.save()
+        response = self._start()
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.data['detail'], "This exam has not started yet.")
+
+
+class AssessmentNumberAllocationTests(APITestCase):
+
+    def setUp(self):
+        AssessmentNumberAllocator._blocks.clear()
+        self.school = School.objects.create(name="Kisumu Day")
+        now = timezone.now()
+        self.exam = Exam.objects.create(
+            school=self.school, title="Form 4 Mock", start_time=now, end_time=now + timedelta(hours=2)
+        )
+
+    def test_registrations_get_unique_check_digit_numbers(self):
+        numbers = []
+        for index in range(5):
+            student = User.objects.create_user(username=f"registrant{index}", password="password")
+            UserProfile.objects.create(user=student, role='STUDENT', school=self.school)
+            self.client.force_authenticate(user=student)
+            response = self.client.post(f'/exams/register/{self.exam.id}/')
+            self.assertEqual(response.status_code, 201)
+            numbers.append(response.data['assessment_number'])
+
+        self.assertEqual(len(set(numbers)), 5)
+        self.assertTrue(all(AssessmentNumberAllocator.is_valid(number) for number in numbers))
+        self.assertFalse(AssessmentNumberAllocator.is_valid(numbers[0][:-1] + str((int(numbers[0][-1]) + 1) % 10)))
+        # One block reservation served every registration
+        self.assertEqual(
+            AssessmentNumberSequence.objects.get(school=self.school).next_value,
+            1 + AssessmentNumberAllocator.BLOCK_SIZE,
+        )
+
+
+class BulkShortlistTests(APITestCase):
+
+    def setUp(self):
+        self.school = School.objects.create(name="Moi Forces")
+        now = timezone.now()
+        self.exam = Exam.objects.create(
+            school=self.school, title="County Mock", start_time=now, end_time=now + timedelta(hours=2)
+        )
+        admin = User.objects.create_user(username="registrar", password="password")
+        UserProfile.objects.create(user=admin, role='SCHOOL_ADMIN', school=self.school)
+        self.client.force_authenticate(user=admin)
+
+        self.registrations = []
+        for index in range(4):
+            student = User.objects.create_user(username=f"applicant{index}", password="password")
+            UserProfile.objects.create(user=student, role='STUDENT', school=self.school)
+            self.registrations.append(ExamRegistration.objects.create(student=student, exam=self.exam))
+
+    def test_shortlist_by_ids_and_filter(self):
+        url = f'/exams/admin/shortlist/bulk/{self.exam.id}/'
+        ids = [r.id for r in self.registrations[:2]] + [999999]
+        response = self.client.post(url, {'status': 'SHORTLISTED', 'registration_ids': ids}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual(response.data['not_found'], 1)
+
+        response = self.client.post(
+            url, {'status': 'REJECTED', 'shortlist_reason': "Fees", 'filter': {'status': 'REGISTERED'}}, format='json'
+        )
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual(ExamRegistration.objects.filter(exam=self.exam, status='SHORTLISTED').count(), 2)
+        self.assertEqual(ExamRegistration.objects.filter(exam=self.exam, status='REJECTED').count(), 2)
+
+    def test_other_schools_cannot_shortlist(self):
+        outsider = User.objects.create_user(username="outsider", password="password")
+        UserProfile.objects.create(user=outsider, role='SCHOOL_ADMIN', school=School.objects.create(name="Other"))
+        self.client.force_authenticate(user=outsider)
+        response = self.client.post(
+            f'/exams/admin/shortlist/bulk/{self.exam.id}/', {'status': 'SHORTLISTED', 'filter': {}}, format='json'
+        )
+        self.assertEqual(response.status_code, 403)
+
+
+class ViolationIngestTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        school = School.objects.create(name="Alliance")
+        now = timezone.now()
+        exam = Exam.objects.create(
+            school=school, title="Final", start_time=now, end_time=now + timedelta(hours=2), max_allowed_violations=2
+        )
+        self.student = User.objects.create_user(username="examinee", password="password")
+        self.attempt = ExamAttempt.objects.create(student=self.student, exam=exam)
+        self.client.force_authenticate(user=self.student)
+        self.url = f'/exams/attempts/{self.attempt.id}/violations/'
+        self.base = timezone.now() - timedelta(minutes=1)
+
+    def _event(self, violation_type, seconds):
+        return {'violation_type': violation_type, 'occurred_at': (self.base + timedelta(seconds=seconds)).isoformat()}
+
+    def test_bursts_are_deduplicated_and_counted(self):
+        events = [self._event('BROWSER_TAB_CHANGE', s) for s in (0, 1, 2)] + [self._event('LOCATION_DRIFT', 1)]
+        response = self.client.post(self.url, {'events': events}, format='json')
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['accepted'], 2)
+        self.assertEqual(response.data['duplicates'], 2)
+        self.attempt.refresh_from_db()
+        self.assertEqual(self.attempt.total_violations, 2)
+        self.assertEqual(self.attempt.status, 'IN_PROGRESS')
+
+        # The third distinct violation crosses max_allowed_violations
+        response = self.client.post(self.url, {'events': [self._event('BROWSER_TAB_CHANGE', 30)]}, format='json')
+        self.assertTrue(response.data['disqualified'])
+        self.attempt.refresh_from_db()
+        self.assertEqual(self.attempt.status, 'DISQUALIFIED')
+        self.assertEqual(SecurityViolation.objects.filter(attempt=self.attempt).count(), 3)
+
+        response = self.client.post(self.url, {'events': [self._event('BROWSER_TAB_CHANGE', 50)]}, format='json')
+        self.assertEqual(response.status_code, 409)
+
+    def test_positions_outside_the_geofence_add_location_drift(self):
+        school = self.attempt.exam.school
+        school.official_lat, school.official_lon, school.geo_fence_radius_m = Decimal("-1.286400"), Decimal("36.817200"), 50
+        school.save()
+        event = {**self._event('BROWSER_TAB_CHANGE', 0), 'latitude': -1.2870, 'longitude': 36.8172}
+
+        response = self.client.post(self.url, {'events': [event]}, format='json')
+        self.assertEqual(response.data['outside_fence'], 1)
+        self.assertEqual(response.data['accepted'], 2)
+        self.assertTrue(SecurityViolation.objects.filter(attempt=self.attempt, violation_type='LOCATION_DRIFT').exists())
+
+        inside, distance = GeofenceService.check_exam_room(self.attempt.exam)[self.attempt.id]
+        self.assertFalse(inside)
+        self.assertAlmostEqual(distance, 66.7, places=1)
+
+    def test_identical_captures_share_one_downscaled_evidence_file(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (3000, 2000), 'navy').save(buffer, format='PNG')
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+
+        with override_settings(MEDIA_ROOT=media_root.name), self.captureOnCommitCallbacks() as callbacks:
+            for _ in range(2):
+                photo = SimpleUploadedFile("frame.png", buffer.getvalue(), content_type="image/png")
+                response = self.client.post(
+                    f'/exams/attempts/{self.attempt.id}/evidence/',
+                    {'photo': photo, 'violation_type': 'THIRD_PARTY_ACCESS'}, format='multipart'
+                )
+                self.assertEqual(response.status_code, 202)
+
+            self.assertEqual(ProctoringEvidence.objects.count(), 1)
+            evidence = ProctoringEvidence.objects.get()
+            self.assertTrue(ProctoringEvidenceService.process(evidence.sha256))
+
+        # Callbacks are collected when the block exits: a processing task per upload
+        # (the frame was still unprocessed on the second one) and one dashboard update
+        # for the accepted violation
+        self.assertEqual(len(callbacks), 3)
+        evidence.refresh_from_db()
+        self.assertEqual((evidence.width, evidence.height), (1280, 853))
+        self.assertFalse(evidence.raw_upload)
+        self.assertTrue(evidence.thumbnail.name.endswith('.webp'))
+        self.assertEqual(SecurityViolation.objects.filter(evidence=evidence).count(), 1)
+
+    def test_invalid_captures_and_closed_attempts_store_nothing(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        url = f'/exams/attempts/{self.attempt.id}/evidence/'
+
+        with override_settings(MEDIA_ROOT=media_root.name):
+            fake = SimpleUploadedFile("frame.png", b"not an image", content_type="image/png")
+            response = self.client.post(url, {'photo': fake}, format='multipart')
+            self.assertEqual(response.status_code, 400)
+
+            buffer = io.BytesIO()
+            Image.new('RGB', (8, 8), 'red').save(buffer, format='PNG')
+            self.attempt.status = 'SUBMITTED'
+            self.attempt.save()
+            photo = SimpleUploadedFile("frame.png", buffer.getvalue(), content_type="image/png")
+            response = self.client.post(url, {'photo': photo}, format='multipart')
+            self.assertEqual(response.status_code, 409)
+
+        self.assertFalse(ProctoringEvidence.objects.exists())
+        self.assertEqual(os.listdir(media_root.name), [])
+
+
+class ProctoringDashboardTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        school = School.objects.create(name="Starehe")
+        now = timezone.now()
+        self.exam = Exam.objects.create(
+            school=school, title="Mock", start_time=now, end_time=now + timedelta(hours=2), max_allowed_violations=1
+        )
+        self.student = User.objects.create_user(username="watched", password="password")
+        self.attempt = ExamAttempt.objects.create(student=self.student, exam=self.exam)
+        self.client.force_authenticate(user=self.student)
+
+    def _report(self, seconds):
+        occurred_at = (timezone.now() - timedelta(minutes=1) + timedelta(seconds=seconds)).isoformat()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                f'/exams/attempts/{self.attempt.id}/violations/',
+                {'events': [{'violation_type': 'BROWSER_TAB_CHANGE', 'occurred_at': occurred_at}]}, format='json'
+            )
+
+    def test_ingest_updates_the_seeded_aggregates(self):
+        ProctoringDashboardService.ensure_seeded(self.exam.id)
+        self.assertEqual(ProctoringDashboardService.snapshot(self.exam.id)['active_attempts'], 1)
+
+        self._report(0)
+        frame = ProctoringDashboardService.snapshot(self.exam.id)
+        self.assertEqual(frame['violations_by_type']['BROWSER_TAB_CHANGE'], 1)
+        self.assertEqual(frame['near_threshold'], [{'attempt_id': self.attempt.id, 'violations': 1}])
+
+        revision = frame['revision']
+        self._report(30)
+        frame = ProctoringDashboardService.snapshot(self.exam.id)
+        self.assertGreater(frame['revision'], revision)
+        self.assertEqual((frame['active_attempts'], frame['disqualified']), (0, 1))
+        self.assertEqual(frame['near_threshold'], [])
+
+    def test_submitted_attempts_leave_the_active_count_and_near_list(self):
+        ProctoringDashboardService.ensure_seeded(self.exam.id)
+        self._report(0)
+        with self.assertNumQueries(0):
+            frame = ProctoringDashboardService.snapshot(self.exam.id)
+        self.assertEqual(frame['near_threshold_count'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.attempt.status = 'SUBMITTED'
+            self.attempt.save()
+            # A second close of the same attempt is not counted again
+            ExamAttempt.objects.get(pk=self.attempt.pk).save()
+        frame = ProctoringDashboardService.snapshot(self.exam.id)
+        self.assertEqual((frame['active_attempts'], frame['disqualified']), (0, 0))
+        self.assertEqual((frame['near_threshold'], frame['near_threshold_count']), ([], 0))
+
+    def test_seeding_restores_the_near_list(self):
+        ExamAttempt.objects.filter(pk=self.attempt.pk).update(total_violations=1)
+        ProctoringDashboardService.ensure_seeded(self.exam.id)
+        frame = ProctoringDashboardService.snapshot(self.exam.id)
+        self.assertEqual(frame['near_threshold'], [{'attempt_id': self.attempt.id, 'violations': 1}])
+
+    def test_updates_are_announced_to_the_exam_group(self):
+        layer = get_channel_layer()
+        channel = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)(ProctoringDashboardService.group_name(self.exam.id), channel)
+
+        self._report(0)
+        self.assertEqual(async_to_sync(layer.receive)(channel)['type'], 'dashboard.update')
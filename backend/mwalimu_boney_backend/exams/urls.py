@@ -7,7 +7,10 @@ from .views import (
     StudentRegistrationListView,
     ExamRegistrationListAdminView,
     ExamRegistrationShortlistView,
+    ExamRegistrationBulkShortlistView,
     ExamStartView,
+    AttemptViolationIngestView,
+    AttemptEvidenceUploadView,
 )
 
 urlpatterns = [
@@ -36,6 +39,16 @@ urlpatterns = [
          ExamStartView.as_view(), 
          name='exam_start'),
 
+    # POST: Batched proctoring violation events for the student's attempt
+    path('attempts/<int:attempt_id>/violations/', 
+         AttemptViolationIngestView.as_view(), 
+         name='attempt_violations'),
+
+    # POST: Proctoring capture (multipart "photo") recorded as a violation with evidence
+    path('attempts/<int:attempt_id>/evidence/', 
+         AttemptEvidenceUploadView.as_view(), 
+         name='attempt_evidence'),
+
     # --- Admin/Teacher Shortlisting Workflow ---
     
     # GET: List all students registered for a specific exam (Admin/Teacher view)
@@ -47,4 +60,9 @@ urlpatterns = [
     path('admin/shortlist/<int:pk>/', 
          ExamRegistrationShortlistView.as_view(), 
          name='admin_registration_shortlist'),
+
+    # POST: Shortlist/Reject many registrations of an exam (ids, filter or CSV)
+    path('admin/shortlist/bulk/<int:exam_id>/', 
+         ExamRegistrationBulkShortlistView.as_view(), 
+         name='admin_registration_bulk_shortlist'),
 ]
\ No newline at end of file
@@ -4,12 +4,20 @@ from rest_framework import generics, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
+from django.utils import timezone
 from users.models import User # Import the base User model
 
-from .models import Exam, ExamRegistration
+from .models import Exam, ExamAttempt, ExamRegistration
 from .serializers import ExamRegistrationSerializer, ExamSerializer, ExamStartInputSerializer
 from users.models import UserProfile # Needed to access assessment_number
+from assessment.services.admission_service import AdmissionController
+from .services import (
+    AssessmentNumberAllocator, EligibilityService, ProctoringEvidenceService, ShortlistService, ViolationIngestService,
+)
+
+# Shared per-exam concurrency budget for ExamStartView
+exam_start_admission = AdmissionController('exams')
 
 # --- 1. List Available Exams for Registration ---
 class ExamListView(generics.ListAPIView):
@@ -46,10 +54,11 @@ class ExamRegisterView(APIView):
         
         # 1. Generate Assessment Number if Missing
         if not profile.assessment_number:
-            # NOTE: Implement a robust service for generation (e.g., using UUIDs or sequencing)
-            new_assessment_number = self._generate_unique_assessment_number(profile.school.id)
-            profile.assessment_number = new_assessment_number
-            profile.save()
+            if profile.school_id is None:
+                return Response({"detail": "Your profile is not linked to a school."}, 
+                                status=status.HTTP_400_BAD_REQUEST)
+            # Sequence-backed and collision-free; no uniqueness retry needed
+            new_assessment_number = AssessmentNumberAllocator.assign(profile)
             message = f"Registration successful! Your unique Assessment Number is: {new_assessment_number}. Please save it."
         else:
             message = "Registration successful. You have already received your Assessment Number."
@@ -64,12 +73,6 @@ class ExamRegisterView(APIView):
         return Response({"detail": message, "assessment_number": profile.assessment_number}, 
                         status=status.HTTP_201_CREATED)
     
-    # Placeholder method - Implement this in a service file for real security
-    def _generate_unique_assessment_number(self, school_id):
-        # Example generation: SCHOOLCODE + TIMESTAMP_HEX
-        import time
-        return f"AS-{school_id}-{hex(int(time.time()))}"
-
 
 # --- 3. List Student's Own Registrations ---
 class StudentRegistrationListView(generics.ListAPIView):
@@ -119,6 +122,52 @@ class ExamRegistrationShortlistView(generics.UpdateAPIView):
     
 
 
+# --- 5b. Admin Bulk Shortlisting (ids, filter or CSV) ---
+class ExamRegistrationBulkShortlistView(APIView):
+    """
+    Shortlists or rejects many registrations of one exam in a single update.
+
+    Body: {"status": "SHORTLISTED" | "REJECTED", "shortlist_reason": "...", plus one of
+    "registration_ids": [...], "filter": {"status": "REGISTERED", "class_id": 4}, or a
+    multipart "file" CSV with a registration_id or assessment_number column}.
+    """
+    permission_classes = [IsAuthenticated] # Implement IsAdminOrTeacher permission
+
+    def post(self, request, exam_id):
+        new_status = request.data.get('status')
+        if new_status not in ShortlistService.STATUSES:
+            return Response({"detail": "status must be SHORTLISTED, REJECTED or REGISTERED."}, 
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # One tenant check for the whole batch: the exam must belong to the admin's school
+        profile = request.user.profile
+        if profile.role == 'STUDENT' or not Exam.objects.filter(pk=exam_id, school_id=profile.school_id).exists():
+            return Response({"detail": "Not authorized to modify this exam's registrations."}, 
+                            status=status.HTTP_403_FORBIDDEN)
+
+        registration_ids = assessment_numbers = filters = None
+        upload = request.FILES.get('file')
+        if upload is not None:
+            registration_ids, assessment_numbers = ShortlistService.read_csv(upload)
+        elif 'registration_ids' in request.data:
+            raw_ids = request.data.get('registration_ids')
+            if not isinstance(raw_ids, list) or not all(str(i).isdigit() for i in raw_ids):
+                return Response({"detail": "registration_ids must be a list of ids."}, 
+                                status=status.HTTP_400_BAD_REQUEST)
+            registration_ids = [int(i) for i in raw_ids]
+        elif isinstance(request.data.get('filter'), dict):
+            filters = request.data['filter']
+        else:
+            return Response({"detail": "Provide registration_ids, filter or a CSV file."}, 
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        counts = ShortlistService.update_status(
+            exam_id, new_status, request.data.get('shortlist_reason', ''),
+            registration_ids=registration_ids, assessment_numbers=assessment_numbers, filters=filters,
+        )
+        return Response(counts, status=status.HTTP_200_OK)
+
+
 # --- 6. Exam Start View (Enforcing Security and Registration) ---
 class ExamStartView(APIView):
     """
@@ -128,45 +177,139 @@ class ExamStartView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, exam_id):
-        serializer = ExamStartInputSerializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
+        # Admission control: a bounded number of starts run at once, the rest queue FIFO
+        ticket = exam_start_admission.parse_ticket(request, exam_id)
+        with exam_start_admission.admit(exam_id, ticket) as admission:
+            if not admission.admitted:
+                return Response(exam_start_admission.queued_response_data(admission, request, exam_id),
+                                status=status.HTTP_429_TOO_MANY_REQUESTS,
+                                headers={'Retry-After': str(admission.retry_after)})
+
+            serializer = ExamStartInputSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
         
-        entered_assessment_number = serializer.validated_data['assessment_number']
-        user = request.user
+            entered_assessment_number = serializer.validated_data['assessment_number']
+            user = request.user
+
+            # Profile, whitelist, registration and exam window in one (cached) read
+            eligibility = EligibilityService.get_snapshot(user.id, exam_id)
         
-        # 1. Assessment Number Validation
-        if user.profile.assessment_number != entered_assessment_number:
-            return Response({"detail": "Invalid assessment number provided."}, 
-                            status=status.HTTP_403_FORBIDDEN)
+            # 1. Assessment Number Validation
+            if eligibility['assessment_number'] != entered_assessment_number:
+                return Response({"detail": "Invalid assessment number provided."}, 
+                                status=status.HTTP_403_FORBIDDEN)
 
-        # 2. Whitelisting/Blacklisting Check
-        if not user.profile.is_whitelisted:
-            return Response({
-                "detail": "Assessment number is blacklisted due to administrative reasons (e.g., irregularities or fee status)."
-            }, status=status.HTTP_403_FORBIDDEN)
+            # 2. Whitelisting/Blacklisting Check
+            if not eligibility['is_whitelisted']:
+                return Response({
+                    "detail": "Assessment number is blacklisted due to administrative reasons (e.g., irregularities or fee status)."
+                }, status=status.HTTP_403_FORBIDDEN)
 
-        # 3. Shortlisting Check (Requires registration and SHORTLISTED status)
-        try:
-            registration = ExamRegistration.objects.get(
-                student=user,
-                exam_id=exam_id,
-                status='SHORTLISTED'
-            )
-        except ExamRegistration.DoesNotExist:
-            return Response({
-                "detail": "You are not shortlisted for this exam. Check registration status or contact admin."
-            }, status=status.HTTP_403_FORBIDDEN)
+            # 3. Shortlisting Check (Requires registration and SHORTLISTED status)
+            if eligibility['registration_status'] != 'SHORTLISTED':
+                return Response({
+                    "detail": "You are not shortlisted for this exam. Check registration status or contact admin."
+                }, status=status.HTTP_403_FORBIDDEN)
 
-        # 4. Check Exam Timing
-        exam = registration.exam
-        # (Add logic here to check if the current time is between exam.start_time and exam.end_time)
+            # 4. Check Exam Timing
+            now = timezone.now()
+            if now < eligibility['exam_start']:
+                return Response({"detail": "This exam has not started yet."}, 
+                                status=status.HTTP_403_FORBIDDEN)
+            if now > eligibility['exam_end']:
+                return Response({"detail": "This exam has already ended."}, 
+                                status=status.HTTP_403_FORBIDDEN)
         
-        # If all checks pass, create the ExamAttempt record and proceed
-        # Example:
-        # attempt = ExamAttempt.objects.create(student=user, exam=exam)
+            # If all checks pass, resume the open ExamAttempt or create one
+            latest = EligibilityService.get_latest_attempt(user.id, exam_id)
+            if latest is None:
+                attempt_id = ExamAttempt.objects.create(student=user, exam_id=exam_id).id
+                EligibilityService.remember_attempt(user.id, exam_id, attempt_id)
+            elif latest['status'] == 'IN_PROGRESS':
+                attempt_id = latest['id']
+            else:
+                return Response({"detail": "You have already finished this exam."}, 
+                                status=status.HTTP_403_FORBIDDEN)
         
-        return Response({
-            "detail": "All security and registration checks passed. Exam is starting.",
-            "exam_title": exam.title
-            # "attempt_id": attempt.id
-        }, status=status.HTTP_200_OK)
\ No newline at end of file
+            return Response({
+                "detail": "All security and registration checks passed. Exam is starting.",
+                "exam_title": eligibility['exam_title'],
+                "attempt_id": attempt_id
+            }, status=status.HTTP_200_OK)
+
+
+# --- 7. Proctoring Telemetry Ingestion ---
+class AttemptViolationIngestView(APIView):
+    """
+    Accepts a batch of security violation events for the student's own attempt:
+    {"events": [{"violation_type": "BROWSER_TAB_CHANGE", "occurred_at": "...",
+                 "latitude": -1.28, "longitude": 36.82}, ...]}
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, attempt_id):
+        meta = ViolationIngestService.attempt_meta(attempt_id)
+        if meta is None or meta.student_id != request.user.id:
+            return Response({"detail": "Attempt not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        raw_events = request.data.get('events')
+        if not isinstance(raw_events, list):
+            return Response({"detail": "events must be a list."}, status=status.HTTP_400_BAD_REQUEST)
+
+        events, errors = ViolationIngestService.parse_events(raw_events)
+        summary = ViolationIngestService.ingest(attempt_id, meta, events)
+        if summary is None:
+            return Response({"detail": "This attempt is no longer in progress."}, 
+                            status=status.HTTP_409_CONFLICT)
+
+        summary['errors'] = errors
+        return Response(summary, status=status.HTTP_202_ACCEPTED)
+
+
+class AttemptEvidenceUploadView(APIView):
+    """
+    Multipart upload of a proctoring capture ("photo") with an optional violation_type
+    (default FACE_MISMATCH). The frame is stored content-addressed and processed by a
+    worker; the violation is recorded through the same path as batched telemetry.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, attempt_id):
+        meta = ViolationIngestService.attempt_meta(attempt_id)
+        if meta is None or meta.student_id != request.user.id:
+            return Response({"detail": "Attempt not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        photo = request.FILES.get('photo')
+        if photo is None:
+            return Response({"detail": "photo is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        events, errors = ViolationIngestService.parse_events([{
+            'violation_type': request.data.get('violation_type', 'FACE_MISMATCH'),
+            'latitude': request.data.get('latitude'),
+            'longitude': request.data.get('longitude'),
+        }])
+        if errors:
+            return Response(errors[0], status=status.HTTP_400_BAD_REQUEST)
+
+        upload_error = ProctoringEvidenceService.validate_upload(photo)
+        if upload_error:
+            return Response({"photo": upload_error}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Nothing is stored for attempts that can no longer record violations
+        if not ExamAttempt.objects.filter(pk=attempt_id, status='IN_PROGRESS').exists():
+            return Response({"detail": "This attempt is no longer in progress."}, 
+                            status=status.HTTP_409_CONFLICT)
+
+        with transaction.atomic():
+            evidence = ProctoringEvidenceService.store_upload(photo)
+            events[0]['evidence_id'] = evidence.pk
+            summary = ViolationIngestService.ingest(attempt_id, meta, events)
+            if summary is None:
+                # Closed meanwhile: drop the evidence row and its queued processing
+                transaction.set_rollback(True)
+        if summary is None:
+            return Response({"detail": "This attempt is no longer in progress."}, 
+                            status=status.HTTP_409_CONFLICT)
+
+        summary['evidence'] = evidence.pk
+        return Response(summary, status=status.HTTP_202_ACCEPTED)
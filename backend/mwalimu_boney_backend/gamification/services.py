@@ -40,6 +40,31 @@ class XPService:
             
         return points
 
+    @staticmethod
+    def award_xp_batch(user, action_counts):
+        """
+        Awards XP for several actions at once ({action_key: count}), e.g. an offline
+        sync: one profile update, one aggregated XPLog row per action and one badge check.
+        """
+        logs = [
+            XPLog(user=user, amount=XPService.XP_POINTS[action_key] * count, reason=action_key)
+            for action_key, count in action_counts.items()
+            if count and XPService.XP_POINTS.get(action_key)
+        ]
+        if not logs:
+            return 0
+        points = sum(log.amount for log in logs)
+
+        with transaction.atomic():
+            profile = UserProfile.objects.select_for_update().get(user=user)
+            profile.xp += points
+            profile.save(update_fields=['xp'])
+
+            XPLog.objects.bulk_create(logs)
+            XPService._check_badges(user, profile)
+
+        return points
+
     @staticmethod
     def _check_badges(user, profile):
         # Find badges the user hasn't earned yet, but now qualifies for
@@ -1,4 +1,9 @@
 # FILE: mwalimu_boney_backend/__init__.py 
 
 # import mwalimu_boney_backend.admin 
-# OR: import .admin (if mwalimu_boney_backend is the app name)
\ No newline at end of file
+# OR: import .admin (if mwalimu_boney_backend is the app name)
+
+# Load the Celery app whenever Django starts so @shared_task binds to it
+from .celery import app as celery_app
+
+__all__ = ("celery_app",)
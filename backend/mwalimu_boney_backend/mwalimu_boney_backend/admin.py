@@ -1,11 +1,12 @@
 # FILE: mwalimu_boney_backend/admin.py (Centralized Admin Configuration)
 
 from django.contrib import admin
+from django.utils.html import format_html
 
 # --- Import ALL Models from ALL Apps ---
 
 # EXAMS App Models
-from exams.models import Exam, ExamRegistration, ExamAttempt, SecurityViolation
+from exams.models import Exam, ExamRegistration, ExamAttempt, ProctoringEvidence, SecurityViolation
 
 # COMMUNICATIONS App Models
 from communications.models import Announcement, Conversation, Message
@@ -68,10 +69,35 @@ class ExamAttemptAdmin(admin.ModelAdmin):
 @admin.register(SecurityViolation)
 class SecurityViolationAdmin(admin.ModelAdmin):
     list_display = (
-        'attempt', 'violation_type', 'timestamp', 'is_reviewed'
+        'attempt', 'violation_type', 'timestamp', 'evidence_thumbnail', 'is_reviewed'
     )
     list_filter = ('violation_type', 'is_reviewed')
     list_editable = ('is_reviewed',)
+    # attempt.__str__ reads the student and exam; the thumbnail reads the evidence row
+    list_select_related = ('attempt__student', 'attempt__exam', 'evidence')
+    raw_id_fields = ('attempt', 'evidence')
+    readonly_fields = ('evidence_preview',)
+
+    @admin.display(description='Evidence')
+    def evidence_thumbnail(self, obj):
+        if obj.evidence and obj.evidence.thumbnail:
+            return format_html(
+                '<a href="{}" target="_blank"><img src="{}" width="80" loading="lazy"></a>',
+                obj.evidence.image.url, obj.evidence.thumbnail.url,
+            )
+        return 'Processing…' if obj.evidence_id else '-'
+
+    @admin.display(description='Evidence image')
+    def evidence_preview(self, obj):
+        if obj.evidence and obj.evidence.image:
+            return format_html('<img src="{}" style="max-width: 640px">', obj.evidence.image.url)
+        return '-'
+
+
+@admin.register(ProctoringEvidence)
+class ProctoringEvidenceAdmin(admin.ModelAdmin):
+    list_display = ('sha256', 'width', 'height', 'is_processed', 'created_at')
+    list_filter = ('is_processed',)
 
 
 # =========================================================================
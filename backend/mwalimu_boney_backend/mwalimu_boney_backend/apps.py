@@ -6,6 +6,9 @@ class MwalimuBoneyBackendConfig(AppConfig):
     name = 'mwalimu_boney_backend'
 
     def ready(self):
+        # Deployment checks for settings the performance features depend on
+        import mwalimu_boney_backend.checks  # noqa: F401
+
         # Import centralized admin registrations after apps are ready.
         # Use a try/except to avoid breaking startup if admin module has issues.
         try:
@@ -17,6 +17,8 @@ import communications.routing  # Import the routing file you will create for the
 
 # Import the routing file you will create for the chat app
 import chat.routing 
+import assessment.routing
+import exams.routing
 
 # os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'your_project_name.settings')
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
@@ -26,8 +28,10 @@ application = ProtocolTypeRouter({
     # WebSocket handling
     "websocket": AuthMiddlewareStack(
         URLRouter(
-            chat.routing.websocket_urlpatterns,
-            communications.routing.websocket_urlpatterns
+            chat.routing.websocket_urlpatterns
+            + communications.routing.websocket_urlpatterns
+            + assessment.routing.websocket_urlpatterns
+            + exams.routing.websocket_urlpatterns
         )
     ),
 })
\ No newline at end of file
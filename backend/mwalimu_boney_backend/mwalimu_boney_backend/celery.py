@@ -0,0 +1,14 @@
+# mwalimu_boney_backend/celery.py
+
+import os
+from celery import Celery
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mwalimu_boney_backend.settings")
+
+app = Celery("mwalimu_boney_backend")
+
+# Read every CELERY_* setting (broker, beat schedule, ...) from Django settings
+app.config_from_object("django.conf:settings", namespace="CELERY")
+
+# Picks up tasks.py in every installed app (assessment, ai_features, ...)
+app.autodiscover_tasks()
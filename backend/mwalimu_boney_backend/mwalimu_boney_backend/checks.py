@@ -0,0 +1,38 @@
+# mwalimu_boney_backend/checks.py
+
+from django.conf import settings
+from django.core.checks import Warning, register
+
+# Backends whose data is private to one process
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """Cache-held counters (eligibility generations, admission queues, dashboards) must be shared."""
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    if backend in PROCESS_LOCAL_CACHES:
+        return [Warning(
+            f"The default cache ({backend}) is local to each process.",
+            hint="Configure a shared backend such as RedisCache; otherwise invalidations and "
+                 "counters written by one worker are invisible to the others.",
+            id='mwalimu.W001',
+        )]
+    return []
+
+
+@register(deploy=True)
+def check_heartbeat_store(app_configs, **kwargs):
+    """The flush_lesson_heartbeats beat task can only drain a shared heartbeat store."""
+    if not getattr(settings, 'HEARTBEAT_REDIS_URL', None):
+        return [Warning(
+            "HEARTBEAT_REDIS_URL is not set, so heartbeats are buffered in each web process.",
+            hint="The flush_lesson_heartbeats beat task runs in a Celery worker and finds "
+                 "nothing to flush; only each web process's own flush thread writes the "
+                 "seconds, and they are lost when the process exits. Set HEARTBEAT_REDIS_URL.",
+            id='mwalimu.W002',
+        )]
+    return []
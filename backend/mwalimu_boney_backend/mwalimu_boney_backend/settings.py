@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 from datetime import timedelta # Don't forget this import at the top
+from celery.schedules import crontab
 import os
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -76,24 +77,6 @@ MIDDLEWARE = [
 ]
 
 
-# Configure GDAL
-import os
-
-# 1. Path to your QGIS bin directory
-QGIS_BIN = r'C:\Program Files\QGIS 3.44.5\bin'
-
-if os.path.exists(QGIS_BIN):
-    # This is critical for Python 3.8+ on Windows
-    os.add_dll_directory(QGIS_BIN)
-    
-    # Force these specific variables
-    GDAL_LIBRARY_PATH = os.path.join(QGIS_BIN, 'gdal312.dll')
-    GEOS_LIBRARY_PATH = os.path.join(QGIS_BIN, 'geos_c.dll')
-    
-    # Data folders
-    os.environ['PROJ_LIB'] = r'C:\Program Files\QGIS 3.44.5\share\proj'
-    os.environ['GDAL_DATA'] = r'C:\Program Files\QGIS 3.44.5\share\gdal'
-
 # During development, allow all origins for simplicity. 
 # In production, change this to a specific list of domains (e.g., 'http://yourreactapp.com')
 CORS_ALLOW_ALL_ORIGINS = True
@@ -198,6 +181,20 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Eligibility snapshots, admission queues, proctoring dashboard aggregates and their
+# invalidation counters are shared by every web, websocket and worker process, so the
+# cache must be shared too (see the cache check in mwalimu_boney_backend.checks)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('CACHE_REDIS_URL', 'redis://127.0.0.1:6379/2'),
+    },
+}
+
+# Runs the test suite against process-local cache and channel layer backends
+# (see mwalimu_boney_backend.test_runner), so tests need no Redis server
+TEST_RUNNER = 'mwalimu_boney_backend.test_runner.LocalServicesTestRunner'
+
 WSGI_APPLICATION = "mwalimu_boney_backend.wsgi.application"
 
 # 2. Specify the ASGI application
@@ -266,4 +263,112 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'Africa/Nairobi' # Or your local timezone
-CELERY_ENABLE_UTC = False
\ No newline at end of file
+CELERY_ENABLE_UTC = False
+
+# --- EXAM DELIVERY ---
+# Compiled answer keys are kept in a per-process LRU in front of the Django cache,
+# keyed by Exam.version so edits to questions never serve a stale key.
+ANSWER_KEY_LOCAL_CACHE_SIZE = 256
+ANSWER_KEY_CACHE_TIMEOUT = 60 * 60 * 6 # 6 hours
+
+# Exam start admission control (per exam): concurrent starts allowed, queue key lifetime
+# and the rough seconds one start takes (used for retry-after hints)
+EXAM_START_CONCURRENCY = 50
+EXAM_START_QUEUE_TTL = 15 * 60
+EXAM_START_SERVICE_SECONDS = 0.25
+# With no start admitted or finished for this long, the queue skips abandoned tickets
+EXAM_START_QUEUE_STALL_SECONDS = 30
+
+# ExamStartView eligibility snapshots (invalidated by signals, so this is only a ceiling)
+EXAM_ELIGIBILITY_CACHE_TIMEOUT = 60 * 10
+# School geofence centres (lat, lon, radius) cached per school
+GEOFENCE_CACHE_TIMEOUT = 60 * 60
+
+# Repeats of the same proctoring violation type within this window count once
+VIOLATION_DEDUPE_SECONDS = 5
+# Proctoring captures are stored once per identical frame as WebP capped at this
+# long-edge size, plus a thumbnail for the admin review list
+PROCTORING_EVIDENCE_MAX_PIXELS = 1280
+PROCTORING_THUMBNAIL_PIXELS = 160
+PROCTORING_EVIDENCE_QUALITY = 70
+# Captures larger than this or in another format are rejected before anything is stored
+PROCTORING_EVIDENCE_MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+PROCTORING_EVIDENCE_CONTENT_TYPES = ('image/jpeg', 'image/png', 'image/webp')
+# Invigilator dashboard: at most one frame per exam every N (whole) seconds, pushed
+# through the channel layer group of the exam; attempts within the margin of
+# max_allowed_violations are listed as near the threshold
+PROCTORING_DASHBOARD_TICK_SECONDS = 1
+PROCTORING_NEAR_THRESHOLD_MARGIN = 1
+# Assessment numbers each worker process reserves per round trip to the sequence table
+ASSESSMENT_NUMBER_BLOCK_SIZE = 100
+
+# Pre-serialized question papers (one JSON file per exam version)
+PAPER_SNAPSHOT_ROOT = BASE_DIR / 'paper_snapshots'
+PAPER_SNAPSHOT_CACHE_TIMEOUT = 60 * 60 * 6
+
+# WebSocket answer autosave: buffered answers are flushed every N seconds in upserts
+# of at most AUTOSAVE_MAX_BATCH rows. Buffered in this Redis database (in process
+# memory when unset); set it whenever web and websocket workers run as separate
+# processes so a REST submit sees answers buffered by the socket
+AUTOSAVE_REDIS_URL = os.environ.get('AUTOSAVE_REDIS_URL')
+AUTOSAVE_FLUSH_SECONDS = 3
+AUTOSAVE_MAX_BATCH = 2000
+
+# Submissions are accepted until an attempt's deadline plus this grace period;
+# afterwards the sweeper grades the autosaved answers
+ATTEMPT_DEADLINE_GRACE_SECONDS = 30
+# Outbox digests claimed by a drain worker that never finished are retried after this
+OUTBOX_CLAIM_SECONDS = 10 * 60
+
+# Item analysis reports are cached per exam version and completed-attempt count
+ITEM_ANALYSIS_CACHE_TIMEOUT = 60 * 15
+
+# --- COURSE PROGRESS ---
+# Per-course lesson counts behind the completion percentage; dropped when lessons
+# are added or removed
+COURSE_CONTENT_COUNT_CACHE_TIMEOUT = 60 * 60 * 24
+# Rendered student dashboard summaries; dropped whenever the summary row changes
+PROGRESS_SUMMARY_CACHE_TIMEOUT = 60 * 60
+# Rows per bulk upsert in the nightly ProgressMetric rollup
+PROGRESS_METRIC_CHUNK_SIZE = 2000
+# Upper bound on lesson completions accepted in one offline sync request
+LESSON_SYNC_MAX_ITEMS = 500
+# Time-on-lesson heartbeats are buffered in this Redis database (in process memory
+# when unset) and merged into LessonCompletion every HEARTBEAT_FLUSH_SECONDS. The beat
+# task only flushes the Redis store; check --deploy warns when it is unset (W002)
+HEARTBEAT_REDIS_URL = os.environ.get('HEARTBEAT_REDIS_URL')
+# How long a "lesson belongs to the student's school" answer is reused by heartbeats
+HEARTBEAT_SCOPE_CACHE_TIMEOUT = 60 * 60
+HEARTBEAT_FLUSH_SECONDS = 30
+# Most seconds credited per (student, lesson) in any window of this many seconds
+HEARTBEAT_MAX_SECONDS = 120
+HEARTBEAT_MAX_BATCH = 1000
+
+# --- CELERY BEAT SCHEDULE ---
+CELERY_BEAT_SCHEDULE = {
+    # Teacher notifications are batched into one digest per exam per minute
+    'drain-assessment-notification-outbox': {
+        'task': 'assessment.tasks.drain_notification_outbox',
+        'schedule': 60.0,
+    },
+    # Question papers are frozen ahead of each exam's start_time
+    'prebuild-question-papers': {
+        'task': 'assessment.tasks.prebuild_question_papers',
+        'schedule': 5 * 60.0,
+    },
+    # Abandoned attempts are auto-submitted once their deadline has passed
+    'sweep-expired-attempts': {
+        'task': 'assessment.tasks.sweep_expired_attempts',
+        'schedule': 60.0,
+    },
+    # Yesterday's ProgressMetric values, after the day's activity has settled
+    'rollup-progress-metrics': {
+        'task': 'progress.tasks.rollup_progress_metrics',
+        'schedule': crontab(hour=1, minute=30),
+    },
+    # Buffered time-on-lesson heartbeats are merged into LessonCompletion
+    'flush-lesson-heartbeats': {
+        'task': 'progress.tasks.flush_lesson_heartbeats',
+        'schedule': float(HEARTBEAT_FLUSH_SECONDS),
+    },
+}
@@ -0,0 +1,23 @@
+# mwalimu_boney_backend/test_runner.py
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+# Single-process stand-ins for the shared Redis cache and channel layer
+TEST_SERVICE_SETTINGS = {
+    'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    'CHANNEL_LAYERS': {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+}
+
+
+class LocalServicesTestRunner(DiscoverRunner):
+    """DiscoverRunner that swaps the Redis-backed services for in-process ones while tests run."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._service_settings = override_settings(**TEST_SERVICE_SETTINGS)
+        self._service_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._service_settings.disable()
+        super().teardown_test_environment(**kwargs)
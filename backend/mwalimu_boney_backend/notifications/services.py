@@ -0,0 +1,31 @@
+# notifications/services.py
+
+import logging
+from django.conf import settings
+from django.core.mail import send_mail
+
+logger = logging.getLogger(__name__)
+
+
+class CommunicationService:
+    """
+    Delivers a message to one user over the requested channels.
+
+    EMAIL goes through Django's configured mail backend. WA and SMS have no provider
+    configured yet; they are logged and skipped so callers can already request them.
+    Delivery errors are raised to the caller, which decides whether to retry.
+    """
+
+    @staticmethod
+    def notify(user, subject, content, channels=('EMAIL',)):
+        """Returns the channels the message was actually sent on."""
+        sent = []
+        for channel in channels:
+            if channel == 'EMAIL':
+                if not user.email:
+                    continue
+                send_mail(subject, content, settings.DEFAULT_FROM_EMAIL, [user.email])
+                sent.append(channel)
+            else:
+                logger.debug("No %s provider configured; skipped message to user %s.", channel, user.pk)
+        return sent
@@ -0,0 +1,27 @@
+# progress/management/commands/rebuild_progress_summaries.py
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from progress.services import ProgressSummaryService
+from school.models import School
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the dashboard StudentProgressSummary rows for every student in a school."
+
+    def add_arguments(self, parser):
+        parser.add_argument('school_id', type=int, help="ID of the school whose summaries should be rebuilt.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        school_id = options['school_id']
+        if not School.objects.filter(pk=school_id).exists():
+            raise CommandError(f"School {school_id} does not exist.")
+
+        # Three grouped aggregates for the whole school, written back in upsert batches
+        with transaction.atomic():
+            rebuilt = ProgressSummaryService.rebuild_school(school_id, batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt progress summaries for {rebuilt} students in school {school_id}."
+        ))
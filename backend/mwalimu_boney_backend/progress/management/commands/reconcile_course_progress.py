@@ -0,0 +1,60 @@
+# progress/management/commands/reconcile_course_progress.py
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from courses.models import Lesson
+from courses.services import CourseService
+from progress.models import CourseProgress, LessonCompletion
+
+
+class Command(BaseCommand):
+    help = (
+        "Recounts CourseProgress.lessons_completed from LessonCompletion rows and recomputes "
+        "completion percentages, optionally limited to one course or school."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, help="Only reconcile progress in this course.")
+        parser.add_argument('--school', type=int, help="Only reconcile progress in this school's courses.")
+
+    def handle(self, *args, **options):
+        progresses = CourseProgress.objects.all()
+        if options['course']:
+            progresses = progresses.filter(course_id=options['course'])
+        if options['school']:
+            progresses = progresses.filter(course__school_id=options['school'])
+
+        completed = (
+            LessonCompletion.objects
+            .filter(student_id=OuterRef('student_id'), lesson__course_id=OuterRef('course_id'), is_completed=True)
+            .order_by().values('student_id')
+            .annotate(n=Count('id')).values('n')
+        )
+        actual = Coalesce(Subquery(completed, output_field=IntegerField()), 0)
+
+        course_ids = set(progresses.values_list('course_id', flat=True).distinct())
+        lesson_counts = dict.fromkeys(course_ids, 0)
+        lesson_counts.update(
+            Lesson.objects.filter(course_id__in=course_ids)
+            .values_list('course_id').annotate(n=Count('id'))
+        )
+
+        with transaction.atomic():
+            drifted = progresses.annotate(actual=actual).exclude(lessons_completed=F('actual')).count()
+            # One correlated UPDATE for the counters, then one UPDATE per course for percentages
+            progresses.update(lessons_completed=actual)
+            for course_id, total in lesson_counts.items():
+                progresses.filter(course_id=course_id).update(
+                    completion_percentage=CourseService.percentage_expression(F('lessons_completed'), total)
+                )
+
+        cache.set_many(
+            {CourseService.requirements_key(course_id): {'lessons': total} for course_id, total in lesson_counts.items()},
+            CourseService.CONTENT_COUNT_TIMEOUT,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Reconciled {len(course_ids)} courses; {drifted} progress counters had drifted."
+        ))
@@ -0,0 +1,20 @@
+# Generated by Django 6.0 on 2026-10-18 15:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("progress", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="courseprogress",
+            name="lessons_completed",
+            field=models.PositiveIntegerField(
+                default=0, help_text="Counter of completed lessons; the percentage is derived from it."
+            ),
+        ),
+    ]
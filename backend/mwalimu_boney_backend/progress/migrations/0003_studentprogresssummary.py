@@ -0,0 +1,39 @@
+# Generated by Django 6.0 on 2026-10-18 16:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("progress", "0002_courseprogress_lessons_completed"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StudentProgressSummary",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("courses_enrolled", models.PositiveIntegerField(default=0)),
+                ("courses_completed", models.PositiveIntegerField(default=0)),
+                ("quiz_attempts", models.PositiveIntegerField(default=0)),
+                ("quiz_score_total", models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ("time_spent_seconds", models.PositiveBigIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "student",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="progress_summary",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Student Progress Summaries",
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 16:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("courses", "0002_course_school_course_teacher_announcement_and_more"),
+        ("progress", "0003_studentprogresssummary"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name="progressmetric",
+            constraint=models.UniqueConstraint(
+                fields=("student", "course", "metric_type", "calculated_on"),
+                name="unique_progress_metric_per_day",
+            ),
+        ),
+    ]
@@ -34,6 +34,10 @@ class CourseProgress(models.Model):
         default=0.00,
         help_text="Calculated based on completed lessons/quizzes."
     )
+    lessons_completed = models.PositiveIntegerField(
+        default=0,
+        help_text="Counter of completed lessons; the percentage is derived from it."
+    )
     
     # Timing
     enrollment_date = models.DateTimeField(auto_now_add=True)
@@ -147,9 +151,44 @@ class ProgressMetric(models.Model):
     class Meta:
         ordering = ['-calculated_on']
         verbose_name_plural = "Progress Metrics"
+        constraints = [
+            # One value per metric per day; the nightly rollup upserts on this key
+            models.UniqueConstraint(
+                fields=['student', 'course', 'metric_type', 'calculated_on'],
+                name='unique_progress_metric_per_day',
+            ),
+        ]
         
     def __str__(self):
         return f"{self.student.username} - {self.metric_type} on {self.calculated_on}"
 
 
 
+
+
+# FILE: progress/models.py (Continuation)
+
+class StudentProgressSummary(models.Model):
+    """
+    Materialized dashboard KPIs for one student, kept current incrementally by the
+    progress write paths (see progress.services.ProgressSummaryService).
+    """
+
+    student = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='progress_summary'
+    )
+    courses_enrolled = models.PositiveIntegerField(default=0)
+    courses_completed = models.PositiveIntegerField(default=0)
+    quiz_attempts = models.PositiveIntegerField(default=0)
+    # Sum of QuizAttempt.percentage_score; the average is derived from it
+    quiz_score_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    time_spent_seconds = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "Student Progress Summaries"
+
+    def __str__(self):
+        return f"Progress summary for {self.student.username}"
@@ -0,0 +1,658 @@
+# FILE: progress/services.py
+
+import logging
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+from decimal import Decimal
+from itertools import chain
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models import Avg, Case, Count, F, Q, Subquery, Sum, Value, When
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from courses.models import Lesson
+from courses.services import CourseService
+from gamification.services import XPService
+from .models import CourseProgress, LessonCompletion, ProgressMetric, QuizAttempt, StudentProgressSummary
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+
+class ProgressSummaryService:
+    """
+    Per-student dashboard KPIs for OverallProgressSummaryView.
+
+    StudentProgressSummary holds running totals that the progress write paths adjust
+    with F() updates in their own transaction; the rendered summary is cached per
+    student and dropped after commit, so a dashboard load is one cache lookup. Rows
+    are (re)built from the source tables with grouped aggregates, either lazily for a
+    student without a row or per school by the rebuild_progress_summaries command.
+    """
+
+    CACHE_TIMEOUT = getattr(settings, 'PROGRESS_SUMMARY_CACHE_TIMEOUT', 60 * 60)
+    FIELDS = ['courses_enrolled', 'courses_completed', 'quiz_attempts', 'quiz_score_total', 'time_spent_seconds']
+
+    @staticmethod
+    def cache_key(student_id):
+        return f'progress:summary:{student_id}'
+
+    @staticmethod
+    def render(row):
+        """Dashboard payload from summary values (a dict with FIELDS)."""
+        attempts = row['quiz_attempts']
+        average = Decimal(row['quiz_score_total']) / attempts if attempts else Decimal(0)
+        return {
+            "total_courses_enrolled": row['courses_enrolled'],
+            "courses_completed": row['courses_completed'],
+            "average_quiz_score": round(average, 2),
+            "total_hours_spent": round(Decimal(row['time_spent_seconds']) / 3600, 2),
+        }
+
+    @classmethod
+    def get(cls, student_id):
+        key = cls.cache_key(student_id)
+        data = cache.get(key)
+        if data is None:
+            row = StudentProgressSummary.objects.filter(student_id=student_id).values(*cls.FIELDS).first()
+            if row is None:
+                cls.rebuild_students([student_id])
+                row = StudentProgressSummary.objects.filter(student_id=student_id).values(*cls.FIELDS).first()
+            data = cls.render(row)
+            cache.set(key, data, cls.CACHE_TIMEOUT)
+        return data
+
+    @classmethod
+    def apply(cls, student_id, **deltas):
+        """
+        Adds the deltas (field=amount) to the student's summary. Call it inside the
+        transaction that wrote the source rows; a missing summary row is built from
+        those rows instead, which already include the change.
+        """
+        updates = {field: F(field) + amount for field, amount in deltas.items() if amount}
+        if not updates:
+            return
+        if not StudentProgressSummary.objects.filter(student_id=student_id).update(**updates):
+            cls.rebuild_students([student_id])
+        transaction.on_commit(lambda: cache.delete(cls.cache_key(student_id)))
+
+    @classmethod
+    def apply_many(cls, field, amounts):
+        """
+        Adds {student_id: amount} to one field of many summaries in a single UPDATE.
+        Students without a summary row are skipped; their row is built from the source
+        tables on first read.
+        """
+        amounts = {student_id: amount for student_id, amount in amounts.items() if amount}
+        if not amounts:
+            return
+        StudentProgressSummary.objects.filter(student_id__in=amounts).update(**{
+            field: F(field) + Case(
+                *(When(student_id=student_id, then=Value(amount)) for student_id, amount in amounts.items()),
+                default=Value(0),
+            )
+        })
+        keys = [cls.cache_key(student_id) for student_id in amounts]
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+    @classmethod
+    def rebuild_students(cls, student_ids, batch_size=1000):
+        """Recomputes the summaries of the given students from the source tables."""
+        return cls._rebuild(Q(student_id__in=student_ids), list(student_ids), batch_size)
+
+    @classmethod
+    def rebuild_school(cls, school_id, batch_size=1000):
+        """Recomputes the summaries of every student in a school with grouped aggregates."""
+        student_filter = Q(student__profile__school_id=school_id)
+        student_ids = list(
+            get_user_model().objects.filter(profile__school_id=school_id, profile__role='STUDENT')
+            .values_list('id', flat=True)
+        )
+        return cls._rebuild(student_filter, student_ids, batch_size)
+
+    @classmethod
+    def _rebuild(cls, student_filter, student_ids, batch_size):
+        rows = {
+            student_id: StudentProgressSummary(student_id=student_id) for student_id in student_ids
+        }
+
+        courses = (
+            CourseProgress.objects.filter(student_filter).order_by().values('student_id')
+            .annotate(enrolled=Count('id'), completed=Count('id', filter=Q(status='COMPLETED')))
+        )
+        for row in courses:
+            summary = rows.setdefault(row['student_id'], StudentProgressSummary(student_id=row['student_id']))
+            summary.courses_enrolled = row['enrolled']
+            summary.courses_completed = row['completed']
+
+        quizzes = (
+            QuizAttempt.objects.filter(student_filter).order_by().values('student_id')
+            .annotate(attempts=Count('id'), total=Sum('percentage_score'))
+        )
+        for row in quizzes:
+            summary = rows.setdefault(row['student_id'], StudentProgressSummary(student_id=row['student_id']))
+            summary.quiz_attempts = row['attempts']
+            summary.quiz_score_total = row['total'] or 0
+
+        time_spent = (
+            LessonCompletion.objects.filter(student_filter).order_by().values('student_id')
+            .annotate(seconds=Sum('time_spent_seconds'))
+        )
+        for row in time_spent:
+            summary = rows.setdefault(row['student_id'], StudentProgressSummary(student_id=row['student_id']))
+            summary.time_spent_seconds = row['seconds'] or 0
+
+        StudentProgressSummary.objects.bulk_create(
+            list(rows.values()),
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['student'],
+            update_fields=cls.FIELDS,
+        )
+        keys = [cls.cache_key(student_id) for student_id in rows]
+        transaction.on_commit(lambda: cache.delete_many(keys))
+        return len(rows)
+
+
+class ProgressMetricRollupService:
+    """
+    Nightly ProgressMetric values for every (student, course) pair, one school at a time.
+
+    Each metric type is one grouped query over the school's courses:
+      AVG_QUIZ_SCORE   mean QuizAttempt.percentage_score (quiz -> question -> exam -> course)
+      TIME_SPENT_WEEK  hours logged on lessons completed in the trailing seven days
+      COURSE_PACE      lessons completed per week since enrollment
+    Rows are streamed into chunked bulk_create upserts on the
+    (student, course, metric_type, calculated_on) key, so re-running a day overwrites it.
+    """
+
+    CHUNK_SIZE = getattr(settings, 'PROGRESS_METRIC_CHUNK_SIZE', 2000)
+
+    @staticmethod
+    def _average_quiz_scores(school_id):
+        rows = (
+            QuizAttempt.objects.filter(quiz__exam__course__school_id=school_id)
+            .order_by().values_list('student_id', 'quiz__exam__course_id')
+            .annotate(value=Avg('percentage_score'))
+        )
+        for student_id, course_id, value in rows.iterator():
+            yield student_id, course_id, 'AVG_QUIZ_SCORE', round(Decimal(value), 2)
+
+    @staticmethod
+    def _time_spent_week(school_id, day):
+        week_start = timezone.make_aware(datetime.combine(day - timedelta(days=6), datetime.min.time()))
+        week_end = timezone.make_aware(datetime.combine(day + timedelta(days=1), datetime.min.time()))
+        rows = (
+            LessonCompletion.objects.filter(
+                lesson__course__school_id=school_id,
+                completion_date__gte=week_start,
+                completion_date__lt=week_end,
+            )
+            .order_by().values_list('student_id', 'lesson__course_id')
+            .annotate(seconds=Sum('time_spent_seconds'))
+        )
+        for student_id, course_id, seconds in rows.iterator():
+            yield student_id, course_id, 'TIME_SPENT_WEEK', round(Decimal(seconds or 0) / 3600, 2)
+
+    @staticmethod
+    def _course_pace(school_id, day):
+        rows = (
+            CourseProgress.objects.filter(course__school_id=school_id)
+            .values_list('student_id', 'course_id', 'lessons_completed', 'enrollment_date')
+        )
+        for student_id, course_id, completed, enrolled_at in rows.iterator():
+            days_enrolled = max(1, (day - timezone.localdate(enrolled_at)).days)
+            yield student_id, course_id, 'COURSE_PACE', round(Decimal(completed * 7) / days_enrolled, 2)
+
+    @classmethod
+    def _write(cls, metrics):
+        ProgressMetric.objects.bulk_create(
+            metrics,
+            update_conflicts=True,
+            unique_fields=['student', 'course', 'metric_type', 'calculated_on'],
+            update_fields=['value'],
+        )
+
+    @classmethod
+    def rollup_school(cls, school_id, day):
+        """Upserts every metric of the school's (student, course) pairs for the day. Returns rows written."""
+        written = 0
+        chunk = []
+        sources = chain(
+            cls._average_quiz_scores(school_id),
+            cls._time_spent_week(school_id, day),
+            cls._course_pace(school_id, day),
+        )
+        for student_id, course_id, metric_type, value in sources:
+            chunk.append(ProgressMetric(
+                student_id=student_id, course_id=course_id, metric_type=metric_type,
+                value=value, calculated_on=day,
+            ))
+            if len(chunk) >= cls.CHUNK_SIZE:
+                cls._write(chunk)
+                written += len(chunk)
+                chunk = []
+        if chunk:
+            cls._write(chunk)
+            written += len(chunk)
+        return written
+
+
+class LessonSyncService:
+    """
+    Batch sync of lesson completions recorded offline by the student app.
+
+    Items are (lesson_id, completed_at, time_spent_seconds). The whole batch costs a
+    fixed number of queries plus one UPDATE and one completion check per touched
+    course (and an insert per newly enrolled course): lessons and existing rows are
+    read with one query each, completions are
+    upserted in one statement, each CourseProgress counter moves once and the XP for
+    the batch is awarded as one aggregated XPLog batch.
+    """
+
+    MAX_ITEMS = getattr(settings, 'LESSON_SYNC_MAX_ITEMS', 500)
+    # A single lesson visit longer than this is treated as a client clock/timer bug
+    MAX_SECONDS_PER_ITEM = 60 * 60 * 6
+
+    @classmethod
+    def parse_items(cls, raw_items):
+        """Validates raw item dicts. Returns ({lesson_id: item}, errors); repeats of a lesson are merged."""
+        now = timezone.now()
+        items, errors = {}, []
+        for index, raw in enumerate(raw_items):
+            raw = raw if isinstance(raw, dict) else {}
+            try:
+                lesson_id = int(raw['lesson_id'])
+                seconds = int(raw.get('time_spent_seconds') or 0)
+                completed_at = parse_datetime(str(raw.get('completed_at') or '')) or now
+            except (KeyError, TypeError, ValueError):
+                errors.append({'index': index, 'detail': 'Invalid lesson_id, completed_at or time_spent_seconds.'})
+                continue
+            if not 0 <= seconds <= cls.MAX_SECONDS_PER_ITEM:
+                errors.append({'index': index, 'detail': 'time_spent_seconds is out of range.'})
+                continue
+            if timezone.is_naive(completed_at):
+                completed_at = timezone.make_aware(completed_at)
+            # Client clocks may run ahead; never accept timestamps from the future
+            completed_at = min(completed_at, now)
+
+            item = items.get(lesson_id)
+            if item is None:
+                items[lesson_id] = {'index': index, 'completed_at': completed_at, 'seconds': seconds}
+            else:
+                item['completed_at'] = min(item['completed_at'], completed_at)
+                item['seconds'] += seconds
+        return items, errors
+
+    @classmethod
+    def sync(cls, user, items, errors):
+        """Applies parsed items for the user. Returns the summary sent back to the client."""
+        # Only lessons of the student's own school; other ids are reported like unknown ones
+        profile = getattr(user, 'profile', None)
+        lesson_courses = dict(
+            Lesson.objects.filter(id__in=items, course__school_id=getattr(profile, 'school_id', None))
+            .values_list('id', 'course_id')
+        )
+        for lesson_id in items.keys() - lesson_courses.keys():
+            errors.append({'index': items.pop(lesson_id)['index'], 'detail': 'Lesson not found.'})
+        errors.sort(key=lambda error: error['index'])
+        if not items:
+            return {'synced': 0, 'newly_completed': 0, 'courses_completed': [], 'xp_awarded': 0, 'errors': errors}
+
+        course_ids = set(lesson_courses.values())
+        with transaction.atomic():
+            # Ensure CourseProgress exists for every touched course
+            progress_ids = dict(
+                CourseProgress.objects.filter(student=user, course_id__in=course_ids).values_list('course_id', 'id')
+            )
+            # get_or_create per new course: a concurrent request may enroll the student
+            # first, and only rows inserted here count as enrollments
+            enrolled = 0
+            for course_id in course_ids - progress_ids.keys():
+                progress, created = CourseProgress.objects.get_or_create(
+                    student=user, course_id=course_id, defaults={'status': 'ENROLLED'}
+                )
+                progress_ids[course_id] = progress.id
+                enrolled += created
+
+            # Lock existing rows so time_spent_seconds is added to, not overwritten
+            existing = {
+                row[0]: row[1:] for row in
+                LessonCompletion.objects.select_for_update().filter(student=user, lesson_id__in=items)
+                .values_list('lesson_id', 'is_completed', 'completion_date', 'time_spent_seconds')
+            }
+
+            completions = []
+            newly_completed = Counter()
+            for lesson_id, item in items.items():
+                course_id = lesson_courses[lesson_id]
+                was_completed, completion_date, seconds = existing.get(lesson_id, (False, None, 0))
+                if not was_completed:
+                    newly_completed[course_id] += 1
+                    completion_date = item['completed_at']
+                completions.append(LessonCompletion(
+                    student=user,
+                    lesson_id=lesson_id,
+                    course_progress_id=progress_ids[course_id],
+                    is_completed=True,
+                    completion_date=completion_date,
+                    time_spent_seconds=seconds + item['seconds'],
+                ))
+            LessonCompletion.objects.bulk_create(
+                completions,
+                update_conflicts=True,
+                unique_fields=['student', 'lesson'],
+                update_fields=['is_completed', 'completion_date', 'time_spent_seconds'],
+            )
+
+            now = timezone.now()
+            completed_courses = []
+            for course_id, count in newly_completed.items():
+                CourseService.record_lessons_completed(progress_ids[course_id], course_id, count)
+                if CourseService.is_course_complete(user, course_id):
+                    completed_courses.append(course_id)
+            if completed_courses:
+                completed_courses = list(
+                    CourseProgress.objects.filter(student=user, course_id__in=completed_courses)
+                    .exclude(status='COMPLETED').values_list('course_id', flat=True)
+                )
+                CourseProgress.objects.filter(student=user, course_id__in=completed_courses).update(
+                    status='COMPLETED', completion_date=now
+                )
+
+            ProgressSummaryService.apply(
+                user.id,
+                courses_enrolled=enrolled,
+                courses_completed=len(completed_courses),
+                time_spent_seconds=sum(item['seconds'] for item in items.values()),
+            )
+
+            xp_awarded = 0
+            try:
+                # Savepoint: a failed award must not poison the outer transaction
+                with transaction.atomic():
+                    xp_awarded = XPService.award_xp_batch(user, {
+                        'LESSON_COMPLETE': sum(newly_completed.values()),
+                        'COURSE_COMPLETE': len(completed_courses),
+                    })
+            except Exception:
+                # Log the failure but allow the core progress update to succeed
+                logger.exception("Gamification failed to award XP for an offline sync.")
+
+        return {
+            'synced': len(items),
+            'newly_completed': sum(newly_completed.values()),
+            'courses_completed': sorted(completed_courses),
+            'xp_awarded': xp_awarded,
+            'errors': errors,
+        }
+
+
+class LocalHeartbeatStore:
+    """In-process stand-in for RedisHeartbeatStore (development, tests, single-process deploys)."""
+
+    def __init__(self):
+        self._pending = Counter()
+        self._lock = threading.Lock()
+
+    def add(self, student_id, lesson_id, seconds):
+        with self._lock:
+            self._pending[(student_id, lesson_id)] += seconds
+
+    def drain(self):
+        with self._lock:
+            drained, self._pending = self._pending, Counter()
+        return dict(drained)
+
+    def restore(self, pending):
+        with self._lock:
+            self._pending.update(pending)
+
+
+class RedisHeartbeatStore:
+    """Seconds per (student, lesson) in one Redis hash, shared by every web process."""
+
+    KEY = 'progress:heartbeats'
+
+    def __init__(self, url):
+        self.client = redis.Redis.from_url(url)
+
+    def add(self, student_id, lesson_id, seconds):
+        self.client.hincrby(self.KEY, f'{student_id}:{lesson_id}', seconds)
+
+    def drain(self):
+        # RENAME is atomic: increments arriving during the flush go to a fresh hash
+        flushing = f'{self.KEY}:flushing:{uuid.uuid4().hex}'
+        try:
+            self.client.rename(self.KEY, flushing)
+        except redis.ResponseError:
+            return {}  # Nothing buffered
+        raw = self.client.hgetall(flushing)
+        self.client.delete(flushing)
+        pending = {}
+        for field, seconds in raw.items():
+            student_id, lesson_id = field.decode().split(':')
+            pending[(int(student_id), int(lesson_id))] = int(seconds)
+        return pending
+
+    def restore(self, pending):
+        pipeline = self.client.pipeline()
+        for (student_id, lesson_id), seconds in pending.items():
+            pipeline.hincrby(self.KEY, f'{student_id}:{lesson_id}', seconds)
+        pipeline.execute()
+
+
+class HeartbeatBuffer:
+    """
+    Write-behind buffer for time-on-lesson heartbeats.
+
+    A heartbeat only increments a counter for its (student, lesson), in Redis when
+    HEARTBEAT_REDIS_URL is set and in process memory otherwise, so the lesson page
+    never waits on the database. flush() drains the counters and merges them into
+    LessonCompletion.time_spent_seconds with one CASE/F() UPDATE per batch, creating
+    missing rows (and their CourseProgress) first for lessons of the student's school.
+    The view rejects lessons outside the student's school (checked once per pair and
+    cached) and credits at most HEARTBEAT_MAX_SECONDS per (student, lesson) and window,
+    so a client cannot claim more time than passes. The Celery beat task
+    flush_lesson_heartbeats flushes the Redis store; the in-process store is flushed by
+    a daemon thread in the process that buffered it, never by the beat task.
+    """
+
+    def __init__(self, store=None, flush_seconds=None, max_batch=None, window_seconds=None):
+        self.flush_seconds = flush_seconds or getattr(settings, 'HEARTBEAT_FLUSH_SECONDS', 30)
+        self.max_batch = max_batch or getattr(settings, 'HEARTBEAT_MAX_BATCH', 1000)
+        self.window_seconds = window_seconds or getattr(settings, 'HEARTBEAT_MAX_SECONDS', 120)
+        self._store = store
+        self._flusher = None
+        self._flusher_lock = threading.Lock()
+
+    @staticmethod
+    def _window_key(student_id, lesson_id):
+        return f'progress:heartbeats:window:{student_id}:{lesson_id}'
+
+    def allowance(self, student_id, lesson_id, seconds):
+        """
+        How many of the heartbeat's seconds fit the (student, lesson) window: at most
+        window_seconds are credited per window_seconds of wall time. 0 when used up.
+        """
+        key = self._window_key(student_id, lesson_id)
+        cache.add(key, 0, self.window_seconds)
+        try:
+            credited = cache.incr(key, seconds)
+        except ValueError:
+            # The window expired between add() and incr()
+            cache.set(key, seconds, self.window_seconds)
+            credited = seconds
+        return max(0, seconds - max(0, credited - self.window_seconds))
+
+    @staticmethod
+    def _scope_key(student_id, lesson_id):
+        return f'progress:heartbeats:scope:{student_id}:{lesson_id}'
+
+    def lesson_in_school(self, student_id, lesson_id):
+        """True if the lesson belongs to a course of the student's school; cached per pair."""
+        key = self._scope_key(student_id, lesson_id)
+        allowed = cache.get(key)
+        if allowed is None:
+            student_school = get_user_model().objects.filter(pk=student_id).values('profile__school_id')[:1]
+            allowed = Lesson.objects.filter(pk=lesson_id, course__school_id=Subquery(student_school)).exists()
+            cache.set(key, allowed, getattr(settings, 'HEARTBEAT_SCOPE_CACHE_TIMEOUT', 60 * 60))
+        return allowed
+
+    @property
+    def store(self):
+        if self._store is None:
+            url = getattr(settings, 'HEARTBEAT_REDIS_URL', None)
+            if url and redis is None:
+                logger.warning("HEARTBEAT_REDIS_URL is set but redis is not installed; buffering in process.")
+            self._store = RedisHeartbeatStore(url) if url and redis is not None else LocalHeartbeatStore()
+        return self._store
+
+    def record(self, student_id, lesson_id, seconds):
+        self.store.add(student_id, lesson_id, seconds)
+        if isinstance(self.store, LocalHeartbeatStore):
+            self.ensure_flusher()
+
+    def ensure_flusher(self):
+        """Starts the periodic flush thread for the in-process store (once per process)."""
+        with self._flusher_lock:
+            if self._flusher is None or not self._flusher.is_alive():
+                self._flusher = threading.Thread(target=self._flush_forever, name='lesson-heartbeats', daemon=True)
+                self._flusher.start()
+
+    def _flush_forever(self):
+        while True:
+            time.sleep(self.flush_seconds)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Heartbeat flush failed; seconds stay buffered until the next flush.")
+            finally:
+                connections.close_all()
+
+    def flush(self):
+        """Merges all buffered seconds into LessonCompletion. Returns the number of (student, lesson) pairs."""
+        pending = self.store.drain()
+        if not pending:
+            return 0
+        items = list(pending.items())
+        flushed = 0
+        try:
+            for start in range(0, len(items), self.max_batch):
+                batch = dict(items[start:start + self.max_batch])
+                self._apply(batch)
+                flushed += len(batch)
+        except Exception:
+            # Hand back whatever was not written; the next flush retries it
+            self.store.restore(dict(items[flushed:]))
+            raise
+        return flushed
+
+    @staticmethod
+    def _pair_filter(pairs):
+        lessons_by_student = {}
+        for student_id, lesson_id in pairs:
+            lessons_by_student.setdefault(student_id, []).append(lesson_id)
+        condition = Q()
+        for student_id, lesson_ids in lessons_by_student.items():
+            condition |= Q(student_id=student_id, lesson_id__in=lesson_ids)
+        return condition
+
+    @classmethod
+    def _completion_ids(cls, pairs):
+        rows = LessonCompletion.objects.filter(cls._pair_filter(pairs)).values_list('student_id', 'lesson_id', 'id')
+        return {(student_id, lesson_id): pk for student_id, lesson_id, pk in rows}
+
+    @classmethod
+    def _create_missing(cls, pairs):
+        """
+        Creates empty LessonCompletion rows (and CourseProgress) for pairs of existing
+        students and lessons of a course in the student's own school; heartbeats for
+        any other lesson never enroll the student and are dropped.
+        """
+        lessons = {
+            lesson_id: (course_id, school_id) for lesson_id, course_id, school_id in
+            Lesson.objects.filter(id__in={lesson_id for _, lesson_id in pairs})
+            .values_list('id', 'course_id', 'course__school_id')
+        }
+        student_schools = dict(
+            get_user_model().objects.filter(id__in={student_id for student_id, _ in pairs})
+            .values_list('id', 'profile__school_id')
+        )
+        pairs = [
+            (s, l) for s, l in pairs
+            if l in lessons and student_schools.get(s) is not None and lessons[l][1] == student_schools[s]
+        ]
+        if not pairs:
+            return Counter()
+        lesson_courses = {lesson_id: course_id for lesson_id, (course_id, _) in lessons.items()}
+
+        wanted = {(student_id, lesson_courses[lesson_id]) for student_id, lesson_id in pairs}
+        progress_filter = Q()
+        for student_id, course_id in wanted:
+            progress_filter |= Q(student_id=student_id, course_id=course_id)
+        progress_ids = {
+            (student_id, course_id): pk for student_id, course_id, pk in
+            CourseProgress.objects.filter(progress_filter).values_list('student_id', 'course_id', 'id')
+        }
+        enrolled = Counter(student_id for student_id, course_id in wanted - progress_ids.keys())
+        if enrolled:
+            CourseProgress.objects.bulk_create(
+                [CourseProgress(student_id=s, course_id=c) for s, c in wanted - progress_ids.keys()],
+                ignore_conflicts=True,
+            )
+            progress_ids = {
+                (student_id, course_id): pk for student_id, course_id, pk in
+                CourseProgress.objects.filter(progress_filter).values_list('student_id', 'course_id', 'id')
+            }
+
+        LessonCompletion.objects.bulk_create(
+            [
+                LessonCompletion(
+                    student_id=student_id, lesson_id=lesson_id,
+                    course_progress_id=progress_ids[(student_id, lesson_courses[lesson_id])],
+                )
+                for student_id, lesson_id in pairs
+            ],
+            ignore_conflicts=True,
+        )
+        return enrolled
+
+    @classmethod
+    def _apply(cls, batch):
+        with transaction.atomic():
+            ids = cls._completion_ids(batch)
+            missing = batch.keys() - ids.keys()
+            enrolled = Counter()
+            if missing:
+                enrolled = cls._create_missing(missing)
+                ids = cls._completion_ids(batch)
+
+            if not ids:
+                return
+            # Heartbeats for deleted lessons or students, or other schools' lessons, are dropped here
+            LessonCompletion.objects.filter(pk__in=ids.values()).update(
+                time_spent_seconds=F('time_spent_seconds') + Case(
+                    *(When(pk=pk, then=Value(batch[pair])) for pair, pk in ids.items()),
+                    default=Value(0),
+                )
+            )
+
+            seconds_by_student = Counter()
+            for student_id, lesson_id in ids:
+                seconds_by_student[student_id] += batch[(student_id, lesson_id)]
+            ProgressSummaryService.apply_many('time_spent_seconds', seconds_by_student)
+            ProgressSummaryService.apply_many('courses_enrolled', enrolled)
+
+
+# Process-wide heartbeat buffer shared by every request
+heartbeat_buffer = HeartbeatBuffer()
@@ -0,0 +1,50 @@
+# FILE: progress/tasks.py
+
+import logging
+import time
+from datetime import date, timedelta
+from celery import shared_task
+from django.utils import timezone
+from school.models import School
+from .services import ProgressMetricRollupService, heartbeat_buffer
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def rollup_progress_metrics(day=None):
+    """
+    Nightly ProgressMetric rollup for every school. Defaults to yesterday, the last
+    complete day; pass an ISO date to backfill.
+    """
+    day = date.fromisoformat(day) if day else timezone.localdate() - timedelta(days=1)
+    started = time.monotonic()
+    written = 0
+    for school_id in School.objects.order_by('id').values_list('id', flat=True):
+        school_started = time.monotonic()
+        rows = ProgressMetricRollupService.rollup_school(school_id, day)
+        written += rows
+        logger.debug(
+            "Rolled up %d progress metrics for school %d in %.2fs.", rows, school_id, time.monotonic() - school_started
+        )
+
+    elapsed = time.monotonic() - started
+    logger.info(
+        "Rolled up %d progress metrics for %s in %.1fs (%.0f rows/s).",
+        written, day, elapsed, written / elapsed if elapsed else 0,
+    )
+    return written
+
+
+@shared_task
+def flush_lesson_heartbeats():
+    """
+    Merges buffered time-on-lesson seconds into LessonCompletion. Only the Redis store
+    (HEARTBEAT_REDIS_URL) is shared with the worker; without it this task finds nothing
+    and each web process flushes its own buffer from a thread.
+    """
+    started = time.monotonic()
+    flushed = heartbeat_buffer.flush()
+    if flushed:
+        logger.info("Flushed heartbeats for %d lessons in %.2fs.", flushed, time.monotonic() - started)
+    return flushed
@@ -1,3 +1,245 @@
-from django.test import TestCase
+# FILE: progress/tests.py
 
-# Create your tests here.
+import io
+from decimal import Decimal
+from unittest.mock import patch
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from courses.models import Course, Lesson
+from courses.services import CourseService
+from school.models import School
+from users.models import UserProfile
+from .models import CourseProgress, LessonCompletion, ProgressMetric, StudentProgressSummary
+from .services import HeartbeatBuffer, LocalHeartbeatStore, ProgressMetricRollupService, heartbeat_buffer
+
+
+class CourseCompletionCounterTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        school = School.objects.create(name="Kakamega")
+        self.course = Course.objects.create(title="Biology", school=school)
+        self.lessons = [Lesson.objects.create(course=self.course, title=f"Cell {i}", content="", order=i) for i in range(3)]
+        self.student = User.objects.create_user(username="learner", password="password")
+        UserProfile.objects.create(user=self.student, role='STUDENT', school=school)
+        self.client.force_authenticate(user=self.student)
+
+    def _toggle(self, lesson):
+        return self.client.post(f'/progress/lessons/toggle/{lesson.id}/')
+
+    def test_percentage_follows_the_counter(self):
+        self._toggle(self.lessons[0])
+        self._toggle(self.lessons[0])
+        progress = CourseProgress.objects.get(student=self.student, course=self.course)
+        self.assertEqual((progress.lessons_completed, progress.completion_percentage), (1, Decimal('33.33')))
+
+        # Adding a lesson drops the cached count, so the next completion uses four lessons
+        Lesson.objects.create(course=self.course, title="Cell 3", content="", order=3)
+        self._toggle(self.lessons[1])
+        progress.refresh_from_db()
+        self.assertEqual((progress.lessons_completed, progress.completion_percentage), (2, Decimal('50.00')))
+
+    def test_lesson_changes_recompute_stored_percentages(self):
+        self._toggle(self.lessons[0])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Lesson.objects.create(course=self.course, title="Cell 3", content="", order=3)
+        progress = CourseProgress.objects.get(student=self.student, course=self.course)
+        self.assertEqual((progress.lessons_completed, progress.completion_percentage), (1, Decimal('25.00')))
+
+        # Deleting the completed lesson takes its completion with it
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lessons[0].delete()
+        progress.refresh_from_db()
+        self.assertEqual((progress.lessons_completed, progress.completion_percentage), (0, Decimal('0.00')))
+
+    def test_reconcile_repairs_drifted_counters(self):
+        self._toggle(self.lessons[0])
+        CourseProgress.objects.update(lessons_completed=3, completion_percentage=Decimal('100'))
+
+        call_command('reconcile_course_progress', course=self.course.id, stdout=io.StringIO())
+
+        progress = CourseProgress.objects.get(student=self.student, course=self.course)
+        self.assertEqual((progress.lessons_completed, progress.completion_percentage), (1, Decimal('33.33')))
+
+    def test_completion_check_is_one_query(self):
+        for lesson in self.lessons[:2]:
+            self._toggle(lesson)
+        CourseService.requirement_counts(self.course.id)
+        with self.assertNumQueries(1):
+            self.assertFalse(CourseService.is_course_complete(self.student, self.course.id))
+
+        self._toggle(self.lessons[2])
+        progress = CourseProgress.objects.get(student=self.student, course=self.course)
+        self.assertEqual((progress.status, progress.completion_percentage), ('COMPLETED', Decimal('100.00')))
+
+
+class ProgressSummaryTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        school = School.objects.create(name="Maseno")
+        self.school = school
+        self.courses = [Course.objects.create(title=f"Course {i}", school=school) for i in range(2)]
+        self.lessons = [Lesson.objects.create(course=course, title="Intro", content="") for course in self.courses]
+        self.student = User.objects.create_user(username="summarised", password="password")
+        UserProfile.objects.create(user=self.student, role='STUDENT', school=school)
+        self.client.force_authenticate(user=self.student)
+
+    def _toggle(self, lesson):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/progress/lessons/toggle/{lesson.id}/')
+
+    def test_summary_is_maintained_incrementally_and_cached(self):
+        self._toggle(self.lessons[0])
+        response = self.client.get('/progress/summary/')
+        self.assertEqual(response.data['total_courses_enrolled'], 1)
+        self.assertEqual(response.data['courses_completed'], 1)
+
+        self._toggle(self.lessons[1])
+        response = self.client.get('/progress/summary/')
+        self.assertEqual(response.data['total_courses_enrolled'], 2)
+
+        # The toggle dropped the cached summary; the first GET re-cached it
+        with self.assertNumQueries(0):
+            repeated = self.client.get('/progress/summary/')
+        self.assertEqual(repeated.data, response.data)
+
+        StudentProgressSummary.objects.all().delete()
+        call_command('rebuild_progress_summaries', self.school.id, stdout=io.StringIO())
+        summary = StudentProgressSummary.objects.get(student=self.student)
+        self.assertEqual((summary.courses_enrolled, summary.courses_completed), (2, 2))
+
+
+class ProgressMetricRollupTests(APITestCase):
+
+    def test_rollup_upserts_one_row_per_metric_and_day(self):
+        school = School.objects.create(name="Kapsabet")
+        course = Course.objects.create(title="Chemistry", school=school)
+        student = User.objects.create_user(username="paced", password="password")
+        CourseProgress.objects.create(student=student, course=course, lessons_completed=3)
+        day = timezone.localdate()
+
+        self.assertEqual(ProgressMetricRollupService.rollup_school(school.id, day), 1)
+        CourseProgress.objects.update(lessons_completed=4)
+        ProgressMetricRollupService.rollup_school(school.id, day)
+
+        metric = ProgressMetric.objects.get(student=student, course=course, metric_type='COURSE_PACE')
+        # Enrolled today: counted as one day, so four lessons is a pace of 28 per week
+        self.assertEqual(metric.value, Decimal('28.00'))
+        self.assertEqual(ProgressMetric.objects.count(), 1)
+
+
+class LessonSyncTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        school = School.objects.create(name="Chavakali")
+        self.course = Course.objects.create(title="Physics", school=school)
+        self.lessons = [Lesson.objects.create(course=self.course, title=f"Unit {i}", content="", order=i) for i in range(3)]
+        self.student = User.objects.create_user(username="offline", password="password")
+        self.profile = UserProfile.objects.create(user=self.student, role='STUDENT', school=school)
+        self.client.force_authenticate(user=self.student)
+
+    def test_batch_completes_course_once(self):
+        completions = [
+            {'lesson_id': lesson.id, 'completed_at': '2026-10-01T08:00:00Z', 'time_spent_seconds': 120}
+            for lesson in self.lessons
+        ]
+        completions += [{'lesson_id': self.lessons[0].id, 'time_spent_seconds': 30}, {'lesson_id': 999999}]
+        response = self.client.post('/progress/lessons/sync/', {'completions': completions}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['synced'], 3)
+        self.assertEqual(response.data['newly_completed'], 3)
+        self.assertEqual(response.data['courses_completed'], [self.course.id])
+        self.assertEqual(response.data['errors'], [{'index': 4, 'detail': 'Lesson not found.'}])
+        self.assertEqual(response.data['xp_awarded'], 3 * 50 + 500)
+
+        progress = CourseProgress.objects.get(student=self.student, course=self.course)
+        self.assertEqual((progress.lessons_completed, progress.status), (3, 'COMPLETED'))
+        self.assertEqual(LessonCompletion.objects.get(lesson=self.lessons[0]).time_spent_seconds, 150)
+
+        # Re-syncing only adds time; nothing is completed or awarded twice
+        response = self.client.post('/progress/lessons/sync/', {'completions': completions[:1]}, format='json')
+        self.assertEqual((response.data['newly_completed'], response.data['xp_awarded']), (0, 0))
+        self.assertEqual(LessonCompletion.objects.get(lesson=self.lessons[0]).time_spent_seconds, 270)
+
+
+    def test_lessons_of_another_school_are_not_found(self):
+        other_course = Course.objects.create(title="Physics", school=School.objects.create(name="Kakamega"))
+        foreign = Lesson.objects.create(course=other_course, title="Unit 1", content="", order=1)
+        completions = [{'lesson_id': foreign.id}, {'lesson_id': self.lessons[0].id}]
+        response = self.client.post('/progress/lessons/sync/', {'completions': completions}, format='json')
+
+        self.assertEqual(response.data['synced'], 1)
+        self.assertEqual(response.data['errors'], [{'index': 0, 'detail': 'Lesson not found.'}])
+        self.assertFalse(CourseProgress.objects.filter(student=self.student, course=other_course).exists())
+        self.assertFalse(LessonCompletion.objects.filter(lesson=foreign).exists())
+
+    def test_failed_xp_award_keeps_the_synced_progress(self):
+        def fail(*args, **kwargs):
+            # A database error inside the award must not roll back the sync
+            User.objects.create(username="offline")
+
+        completions = [{'lesson_id': lesson.id} for lesson in self.lessons[:2]]
+        with patch('progress.services.XPService.award_xp_batch', side_effect=fail):
+            response = self.client.post('/progress/lessons/sync/', {'completions': completions}, format='json')
+
+        self.assertEqual((response.data['newly_completed'], response.data['xp_awarded']), (2, 0))
+        self.assertEqual(CourseProgress.objects.get(student=self.student).lessons_completed, 2)
+        self.assertEqual(StudentProgressSummary.objects.get(student=self.student).courses_enrolled, 1)
+
+class LessonHeartbeatTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        school = School.objects.create(name="Friends Kamusinga")
+        course = Course.objects.create(title="Geography", school=school)
+        self.lessons = [Lesson.objects.create(course=course, title=f"Map {i}", content="", order=i) for i in range(2)]
+        self.student = User.objects.create_user(username="reader", password="password")
+        UserProfile.objects.create(user=self.student, role='STUDENT', school=school)
+        self.client.force_authenticate(user=self.student)
+
+        store = patch.object(heartbeat_buffer, '_store', LocalHeartbeatStore())
+        store.start()
+        self.addCleanup(store.stop)
+        flusher = patch.object(HeartbeatBuffer, 'ensure_flusher')
+        flusher.start()
+        self.addCleanup(flusher.stop)
+
+    def _beat(self, lesson, seconds):
+        return self.client.post(f'/progress/lessons/{lesson.id}/heartbeat/', {'seconds': seconds}, format='json')
+
+    def test_heartbeats_are_buffered_and_merged_in_one_flush(self):
+        self.client.post(f'/progress/lessons/toggle/{self.lessons[0].id}/')
+
+        # The lesson's school is checked once per lesson, then every heartbeat is cache-only
+        with self.assertNumQueries(2):
+            for lesson, seconds in ((self.lessons[0], 30), (self.lessons[1], 45)):
+                self.assertEqual(self._beat(lesson, seconds).status_code, 202)
+        with self.assertNumQueries(0):
+            self.assertEqual(self._beat(self.lessons[0], 30).status_code, 202)
+        self.assertEqual(self._beat(self.lessons[0], 100000).status_code, 400)
+
+        self.assertEqual(heartbeat_buffer.flush(), 2)
+        first, second = (LessonCompletion.objects.get(student=self.student, lesson=lesson) for lesson in self.lessons)
+        self.assertEqual((first.time_spent_seconds, first.is_completed), (60, True))
+        self.assertEqual((second.time_spent_seconds, second.is_completed), (45, False))
+        self.assertEqual(heartbeat_buffer.flush(), 0)
+
+    def test_heartbeats_are_rate_limited_and_scoped_to_the_school(self):
+        self.assertEqual(self._beat(self.lessons[0], 100).data['buffered'], 100)
+        self.assertEqual(self._beat(self.lessons[0], 100).data['buffered'], 20)
+        self.assertEqual(self._beat(self.lessons[0], 30).status_code, 429)
+
+        other_school = School.objects.create(name="Kenya High")
+        foreign = Lesson.objects.create(course=Course.objects.create(title="Art", school=other_school), title="Ink", content="")
+        self.assertEqual(self._beat(foreign, 30).status_code, 404)
+
+        self.assertEqual(heartbeat_buffer.flush(), 1)
+        self.assertEqual(LessonCompletion.objects.get(student=self.student, lesson=self.lessons[0]).time_spent_seconds, 120)
+        self.assertFalse(CourseProgress.objects.filter(student=self.student, course=foreign.course).exists())
@@ -4,6 +4,8 @@ from django.urls import path
 from .views import (
     CourseProgressListView,
     LessonCompletionToggleView,
+    LessonCompletionSyncView,
+    LessonHeartbeatView,
     OverallProgressSummaryView,
     TeacherCourseProgressList,
     QuizAttemptCreateView,
@@ -23,6 +25,16 @@ urlpatterns = [
          LessonCompletionToggleView.as_view(), 
          name='lesson_completion_toggle'),
          
+    # POST: Batch of lesson completions recorded while the student app was offline
+    path('lessons/sync/',
+         LessonCompletionSyncView.as_view(),
+         name='lesson_completion_sync'),
+
+    # POST: Periodic time-on-lesson heartbeat from the lesson page (buffered)
+    path('lessons/<int:lesson_id>/heartbeat/',
+         LessonHeartbeatView.as_view(),
+         name='lesson_heartbeat'),
+
     # GET: High-level KPIs and summary data for the student dashboard
     path('summary/', 
          OverallProgressSummaryView.as_view(), 
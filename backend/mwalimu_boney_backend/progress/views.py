@@ -2,10 +2,13 @@
 
 # FILE: progress/views.py
 
+import logging
 from rest_framework import generics, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from django.conf import settings
 from django.db.models import Avg, Sum, Count, F
 from django.utils import timezone
 from django.db import transaction
@@ -13,6 +16,7 @@ from courses.models import Course, Lesson # Needed for context
 from gamification.services import XPService # Assuming the XP service exists
 from courses.services import CourseService # Assuming a service to handle course progress logic
 from .models import CourseProgress, LessonCompletion, QuizAttempt, ProgressMetric
+from .services import LessonSyncService, ProgressSummaryService, heartbeat_buffer
 from .serializers import (
     CourseProgressSerializer, 
     LessonCompletionSerializer, 
@@ -21,6 +25,11 @@ from .serializers import (
     ProgressMetricSerializer
 )
 
+logger = logging.getLogger(__name__)
+
+# A single heartbeat may not claim more time than this
+HEARTBEAT_MAX_SECONDS = getattr(settings, 'HEARTBEAT_MAX_SECONDS', 120)
+
 # --- 1. Course Progress List/Detail (Student's Dashboard) ---
 class CourseProgressListView(generics.ListAPIView):
     """Lists all courses the student is enrolled in with their overall progress."""
@@ -52,11 +61,13 @@ class LessonCompletionToggleView(APIView):
         with transaction.atomic():
             
             # Ensure CourseProgress exists
-            course_progress, _ = CourseProgress.objects.get_or_create(
+            course_progress, enrolled = CourseProgress.objects.get_or_create(
                 student=user,
-                course=lesson.course,
+                course_id=lesson.course_id,
                 defaults={'status': 'ENROLLED'}
             )
+            if enrolled:
+                ProgressSummaryService.apply(user.id, courses_enrolled=1)
 
             completion, created = LessonCompletion.objects.get_or_create(
                 student=user,
@@ -73,36 +84,39 @@ class LessonCompletionToggleView(APIView):
                 completion.completion_date = timezone.now()
                 completion.save()
                 
-                # 2. Recalculate and update CourseProgress (Service needed here)
-                # Example: RecalculateCourseProgressService.recalculate(course_progress)
-                course_progress.last_activity = timezone.now()
-                course_progress.save()
+                # 2. Bump the completed-lesson counter and refresh the percentage
+                CourseService.record_lesson_completed(course_progress)
                 
                 # --- Gamification Trigger ---
                 try:
-                    # Award XP for Lesson Completion
-                    XPService.award_xp(
-                        user=user, 
-                        action_key='LESSON_COMPLETE', 
-                        context_id=lesson.id
-                    )
-                    
-                    # Check for Course Completion
-                    if CourseService.is_course_complete(user, lesson.course.id):
+                    # Savepoint: a failure here must not break the outer transaction
+                    with transaction.atomic():
+                        # Award XP for Lesson Completion
                         XPService.award_xp(
                             user=user, 
-                            action_key='COURSE_COMPLETE', 
-                            context_id=lesson.course.id
+                            action_key='LESSON_COMPLETE', 
+                            context_id=lesson.id
                         )
-                        # Mark the CourseProgress status as COMPLETED
-                        course_progress.status = 'COMPLETED'
-                        course_progress.completion_date = timezone.now()
-                        course_progress.save()
+                    
+                        # Check for Course Completion
+                        if CourseService.is_course_complete(user, lesson.course_id):
+                            XPService.award_xp(
+                                user=user, 
+                                action_key='COURSE_COMPLETE', 
+                                context_id=lesson.course_id
+                            )
+                            # Mark the CourseProgress status as COMPLETED
+                            newly_completed = course_progress.status != 'COMPLETED'
+                            course_progress.status = 'COMPLETED'
+                            course_progress.completion_date = timezone.now()
+                            # update_fields keeps the in-memory counter from overwriting the F() update
+                            course_progress.save(update_fields=['status', 'completion_date', 'last_activity'])
+                            if newly_completed:
+                                ProgressSummaryService.apply(user.id, courses_completed=1)
                         
-                except Exception as e:
+                except Exception:
                     # Log the failure but allow the core progress update to succeed
-                    print(f"Gamification failed to award XP: {e}") 
-                    # Consider logging this with Django's logging module instead of print
+                    logger.exception("Gamification failed to award XP for lesson %s.", lesson.id)
                     
                 return Response({
                     "detail": f"Lesson '{lesson.title}' marked as completed. XP awarded.",
@@ -115,31 +129,77 @@ class LessonCompletionToggleView(APIView):
                 "is_completed": True
             }, status=status.HTTP_200_OK)
 
+# --- 2b. Offline Batch Sync of Lesson Completions ---
+class LessonCompletionSyncView(APIView):
+    """
+    Accepts lesson completions recorded offline by the student app:
+    {"completions": [{"lesson_id": 4, "completed_at": "...", "time_spent_seconds": 310}, ...]}
+    Every touched course is recalculated once and XP is awarded for the whole batch.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        raw_items = request.data.get('completions')
+        if not isinstance(raw_items, list):
+            return Response({"detail": "completions must be a list."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(raw_items) > LessonSyncService.MAX_ITEMS:
+            return Response(
+                {"detail": f"At most {LessonSyncService.MAX_ITEMS} completions per sync."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        items, errors = LessonSyncService.parse_items(raw_items)
+        summary = LessonSyncService.sync(request.user, items, errors)
+        return Response({'received': len(raw_items), **summary}, status=status.HTTP_200_OK)
+
+# --- 2c. Time-on-Lesson Heartbeats ---
+class LessonHeartbeatView(APIView):
+    """
+    Receives the lesson page's periodic heartbeat: {"seconds": 30}.
+    Seconds are only buffered (see HeartbeatBuffer); the token is verified without a
+    user lookup, and whether the lesson belongs to the student's school is checked once
+    per (student, lesson) and then cached, so repeated heartbeats never touch the
+    database. Lessons of other schools are a 404. Each (student, lesson) is credited at
+    most HEARTBEAT_MAX_SECONDS per HEARTBEAT_MAX_SECONDS of wall time.
+    """
+    authentication_classes = [JWTStatelessUserAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, lesson_id):
+        try:
+            seconds = int(request.data.get('seconds'))
+        except (TypeError, ValueError):
+            seconds = 0
+        if not 0 < seconds <= HEARTBEAT_MAX_SECONDS:
+            return Response(
+                {"detail": f"seconds must be between 1 and {HEARTBEAT_MAX_SECONDS}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        student_id = int(request.user.id)
+        if not heartbeat_buffer.lesson_in_school(student_id, lesson_id):
+            return Response({"detail": "Lesson not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        # Never credit more time per lesson than actually passes
+        seconds = heartbeat_buffer.allowance(student_id, lesson_id, seconds)
+        if not seconds:
+            return Response(
+                {"detail": "Too many heartbeats for this lesson; retry later."},
+                status=status.HTTP_429_TOO_MANY_REQUESTS
+            )
+
+        heartbeat_buffer.record(student_id, lesson_id, seconds)
+        return Response({"buffered": seconds}, status=status.HTTP_202_ACCEPTED)
+
 # --- 3. Overall Student Progress Summary ---
 class OverallProgressSummaryView(APIView):
     """Provides key performance indicators (KPIs) for the student's dashboard."""
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        user = request.user
-        
-        total_courses = CourseProgress.objects.filter(student=user).count()
-        completed_courses = CourseProgress.objects.filter(student=user, status='COMPLETED').count()
-        
-        # Calculate average quiz score across all attempts
-        avg_quiz_score = QuizAttempt.objects.filter(student=user).aggregate(Avg('percentage_score'))['percentage_score__avg'] or 0
-        
-        # Calculate total time spent (using LessonCompletion metric)
-        total_time_spent = LessonCompletion.objects.filter(student=user).aggregate(Sum('time_spent_seconds'))['time_spent_seconds__sum'] or 0
-
-        # Serialize results (using a simple dictionary or a dedicated serializer)
-        data = {
-            "total_courses_enrolled": total_courses,
-            "courses_completed": completed_courses,
-            "average_quiz_score": round(avg_quiz_score, 2),
-            "total_hours_spent": round(total_time_spent / 3600, 2), # Convert seconds to hours
-        }
-        
+        # Materialized per-student summary; one cache lookup on the hot path
+        data = ProgressSummaryService.get(request.user.id)
+
         serializer = OverallProgressSummarySerializer(data=data)
         serializer.is_valid(raise_exception=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
@@ -183,7 +243,11 @@ class QuizAttemptCreateView(generics.CreateAPIView):
         # and the resulting score data passed here.
         
         # Ensure the student field is set correctly
-        serializer.save(student=self.request.user)
+        with transaction.atomic():
+            attempt = serializer.save(student=self.request.user)
+            ProgressSummaryService.apply(
+                attempt.student_id, quiz_attempts=1, quiz_score_total=attempt.percentage_score
+            )
 
 # --- 6. Progress Metrics View (Teacher/Admin Trend Analysis) ---
 class ProgressMetricListView(generics.ListAPIView):
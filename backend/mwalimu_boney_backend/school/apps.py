@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class SchoolConfig(AppConfig):
     name = "school"
+
+    def ready(self):
+        # Registers the geofence cache invalidation receiver
+        import school.signals
@@ -1,7 +1,6 @@
 # schools/models.py (New App)
 from django.db import models
 from django.contrib.auth.models import User
-from django.contrib.gis.db import models as geomodels # Requires PostGIS setup
 
 
 class School(models.Model):
@@ -0,0 +1,107 @@
+# school/services/geofence.py
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import OuterRef, Subquery
+from school.models import School
+
+# Mean Earth radius (IUGG) in metres
+EARTH_RADIUS_M = 6371008.8
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Great-circle distance in metres. Accepts scalars or NumPy arrays (broadcast)."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(value, dtype=np.float64)) for value in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class GeofenceService:
+    """
+    Point-in-radius checks against a school's testing-centre fence
+    (School.official_lat/official_lon/geo_fence_radius_m) without GDAL/GEOS.
+
+    Fence centres are cached per school (dropped by school.signals when the school
+    changes) and distances are computed with vectorized haversine, so a whole exam
+    room is checked in one NumPy call.
+    """
+
+    CACHE_TIMEOUT = getattr(settings, 'GEOFENCE_CACHE_TIMEOUT', 60 * 60)
+
+    @staticmethod
+    def cache_key(school_id):
+        return f'school:geofence:{school_id}'
+
+    @classmethod
+    def get_fence(cls, school_id):
+        """(lat, lon, radius_m) of the school's fence, or None if no centre is configured."""
+        key = cls.cache_key(school_id)
+        fence = cache.get(key)
+        if fence is None:
+            row = (
+                School.objects.filter(pk=school_id)
+                .values_list('official_lat', 'official_lon', 'geo_fence_radius_m').first()
+            )
+            # Cache "no fence" as an empty tuple so unconfigured schools are not re-queried
+            fence = (float(row[0]), float(row[1]), row[2]) if row and row[0] is not None and row[1] is not None else ()
+            cache.set(key, fence, cls.CACHE_TIMEOUT)
+        return fence or None
+
+    @classmethod
+    def invalidate(cls, school_id):
+        cache.delete(cls.cache_key(school_id))
+
+    @classmethod
+    def check_many(cls, school_id, latitudes, longitudes):
+        """
+        Batch mode: returns (inside, distances_m) arrays for the given positions. Without a
+        configured fence every position counts as inside (distance NaN).
+        """
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        fence = cls.get_fence(school_id)
+        if fence is None:
+            return np.ones(latitudes.shape, dtype=bool), np.full(latitudes.shape, np.nan)
+
+        centre_lat, centre_lon, radius_m = fence
+        distances = haversine_m(latitudes, longitudes, centre_lat, centre_lon)
+        return distances <= radius_m, distances
+
+    @classmethod
+    def check(cls, school_id, latitude, longitude):
+        """Single position: (inside, distance_m)."""
+        inside, distances = cls.check_many(school_id, [latitude], [longitude])
+        return bool(inside[0]), float(distances[0])
+
+    @classmethod
+    def check_exam_room(cls, exam):
+        """
+        Checks the latest reported position of every in-progress attempt of a secure
+        exam (exams.Exam) in one call. Returns {attempt_id: (inside, distance_m)}; empty
+        when the exam does not enforce location checks.
+        """
+        from exams.models import SecurityViolation
+
+        if not exam.enforce_location_check:
+            return {}
+
+        # The newest positioned violation of each attempt, picked in SQL
+        positioned = SecurityViolation.objects.filter(latitude__isnull=False, longitude__isnull=False)
+        newest = positioned.filter(attempt_id=OuterRef('attempt_id')).order_by('-timestamp', '-pk').values('pk')[:1]
+        rows = (
+            positioned
+            .filter(attempt__exam=exam, attempt__status='IN_PROGRESS', pk=Subquery(newest))
+            .values_list('attempt_id', 'latitude', 'longitude')
+        )
+        latest = {attempt_id: (float(latitude), float(longitude)) for attempt_id, latitude, longitude in rows}
+        if not latest:
+            return {}
+
+        attempt_ids = list(latest)
+        positions = np.array([latest[attempt_id] for attempt_id in attempt_ids])
+        inside, distances = cls.check_many(exam.school_id, positions[:, 0], positions[:, 1])
+        return {
+            attempt_id: (bool(flag), float(distance))
+            for attempt_id, flag, distance in zip(attempt_ids, inside, distances)
+        }
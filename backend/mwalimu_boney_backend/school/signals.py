@@ -0,0 +1,12 @@
+# school/signals.py
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import School
+from .services.geofence import GeofenceService
+
+
+@receiver([post_save, post_delete], sender=School)
+def invalidate_geofence(sender, instance, **kwargs):
+    """The fence centre or radius may have moved."""
+    GeofenceService.invalidate(instance.pk)
@@ -1,9 +1,12 @@
 # schools/tests.py (for Multi-Tenancy Scoping)
 
+from decimal import Decimal
+from django.core.cache import cache
 from rest_framework.test import APITestCase
 from users.models import User, UserProfile
 from school.models import School, Class
 from courses.models import Course
+from school.services.geofence import GeofenceService
 
 class MultiTenancySecurityTests(APITestCase):
 
@@ -51,3 +54,24 @@ class MultiTenancySecurityTests(APITestCase):
         self.assertEqual(response.status_code, 401) # Unauthorized
 
 # Additional tests can be added for Teachers, Admins, and Parents similarly.
+
+
+class GeofenceTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.school = School.objects.create(
+            name="Centre", official_lat=Decimal("-1.286400"), official_lon=Decimal("36.817200"), geo_fence_radius_m=50
+        )
+
+    def test_batch_check_and_cache_invalidation(self):
+        inside, distances = GeofenceService.check_many(self.school.id, [-1.2864, -1.2870], [36.8172, 36.8172])
+        self.assertEqual(inside.tolist(), [True, False])
+        self.assertAlmostEqual(distances[1], 66.7, places=1)
+
+        # The centre is cached; moving the fence invalidates it
+        with self.assertNumQueries(0):
+            GeofenceService.check(self.school.id, -1.2864, 36.8172)
+        self.school.official_lat = Decimal("-1.287000")
+        self.school.save()
+        self.assertTrue(GeofenceService.check(self.school.id, -1.2870, 36.8172)[0])